@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 from datetime import datetime, timedelta
 import os
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 from aidants_connect.postgres_url import turn_psql_url_into_param
@@ -26,6 +27,15 @@ FC_AS_FI_CALLBACK_URL = os.environ["FC_AS_FI_CALLBACK_URL"]
 FC_AS_FI_ID = os.environ["FC_AS_FI_ID"]
 FC_AS_FI_SECRET = os.environ["FC_AS_FI_SECRET"]
 FC_AS_FI_HASH_SALT = os.environ["FC_AS_FI_HASH_SALT"]
+FC_AS_FI_TOKEN_DIGEST_KEY = os.environ["FC_AS_FI_TOKEN_DIGEST_KEY"]
+if not FC_AS_FI_TOKEN_DIGEST_KEY:
+    raise ImproperlyConfigured("FC_AS_FI_TOKEN_DIGEST_KEY must not be empty.")
+# Also look up `Connection` secrets hashed with `make_password`, which costs a
+# PBKDF2 hash on every unknown secret: turn it off once the connections created
+# before the switch have expired.
+FC_AS_FI_LEGACY_TOKEN_LOOKUP = (
+    False if os.getenv("FC_AS_FI_LEGACY_TOKEN_LOOKUP") == "False" else True
+)
 FC_AS_FI_LOGOUT_REDIRECT_URI = os.environ["FC_AS_FI_LOGOUT_REDIRECT_URI"]
 
 # FC as FS
@@ -33,8 +43,27 @@ FC_AS_FS_BASE_URL = os.environ["FC_AS_FS_BASE_URL"]
 FC_AS_FS_ID = os.environ["FC_AS_FS_ID"]
 FC_AS_FS_SECRET = os.environ["FC_AS_FS_SECRET"]
 FC_AS_FS_CALLBACK_URL = os.environ["FC_AS_FS_CALLBACK_URL"]
+# Outbound calls to FranceConnect, timeouts in seconds
+FC_AS_FS_CONNECT_TIMEOUT = float(os.getenv("FC_AS_FS_CONNECT_TIMEOUT", 3))
+FC_AS_FS_READ_TIMEOUT = float(os.getenv("FC_AS_FS_READ_TIMEOUT", 10))
+FC_AS_FS_MAX_RETRIES = int(os.getenv("FC_AS_FS_MAX_RETRIES", 2))
+FC_AS_FS_POOL_SIZE = int(os.getenv("FC_AS_FS_POOL_SIZE", 10))
+# Circuit breaker on the calls to FranceConnect, durations in seconds
+FC_AS_FS_BREAKER_STORAGE = os.getenv("FC_AS_FS_BREAKER_STORAGE", "redis")
+FC_AS_FS_BREAKER_FAILURE_RATE = float(os.getenv("FC_AS_FS_BREAKER_FAILURE_RATE", 0.5))
+FC_AS_FS_BREAKER_MIN_CALLS = int(os.getenv("FC_AS_FS_BREAKER_MIN_CALLS", 10))
+FC_AS_FS_BREAKER_WINDOW = int(os.getenv("FC_AS_FS_BREAKER_WINDOW", 60))
+FC_AS_FS_BREAKER_OPEN_DURATION = int(os.getenv("FC_AS_FS_BREAKER_OPEN_DURATION", 30))
 
 FC_CONNECTION_AGE = int(os.environ["FC_CONNECTION_AGE"])
+# Where the `Connection` objects are kept: "orm" or "redis" (uses REDIS_URL)
+CONNECTION_STORE = os.getenv("CONNECTION_STORE", "orm")
+# Seconds an expired connection stays in Redis, so that it answers with a 408
+CONNECTION_STORE_RETENTION = int(os.getenv("CONNECTION_STORE_RETENTION", 3600))
+# Daily partitions of the `Connection` table, on PostgreSQL 11 and above
+CONNECTION_PARTITIONS_DAYS_AHEAD = int(os.getenv("CONNECTION_PARTITIONS_DAYS_AHEAD", 7))
+# Monthly partitions of the `Journal` table, once converted by `partition_journal`
+JOURNAL_PARTITIONS_MONTHS_AHEAD = int(os.getenv("JOURNAL_PARTITIONS_MONTHS_AHEAD", 3))
 
 if os.environ.get("FC_AS_FS_TEST_PORT"):
     FC_AS_FS_TEST_PORT = int(os.environ["FC_AS_FS_TEST_PORT"])
@@ -45,6 +74,15 @@ else:
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 
+# Archive of the old journal entries, see the `archive_journal` command.
+# Once removed from the journal, the entries are only kept there: it must be on
+# a durable volume, never in the application directory. Unset, nothing is archived.
+JOURNAL_ARCHIVE_DIR = os.getenv("JOURNAL_ARCHIVE_DIR")
+JOURNAL_ARCHIVE_AFTER_MONTHS = int(os.getenv("JOURNAL_ARCHIVE_AFTER_MONTHS", 12))
+
+# Number of usagers listed per page of `usagers/`
+USAGERS_PAGE_SIZE = int(os.getenv("USAGERS_PAGE_SIZE", 50))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -275,6 +313,16 @@ MANDAT_TEMPLATE_PATH = (
     "templates/aidants_connect_web/mandat_templates/20200511_mandat.html"
 )
 ATTESTATION_SALT = os.getenv("ATTESTATION_SALT", "")
+# QR codes only depend on the attestation hash, they can be cached for long
+QRCODE_CACHE_TIMEOUT = int(os.getenv("QRCODE_CACHE_TIMEOUT", 30 * 24 * 60 * 60))
+
+# Cache shared by the web processes, in a table created by `createcachetable`
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "aidants_connect_cache",
+    }
+}
 
 # Magic Auth
 MAGICAUTH_EMAIL_FIELD = "email"
@@ -380,6 +428,41 @@ CELERY_RESULT_SERIALIZER = JSON_SERIALIZER
 CELERY_TASK_SERIALIZER = JSON_SERIALIZER
 CELERY_ACCEPT_CONTENT = [JSON_CONTENT_TYPE]
 
+# Public statistics
+STATISTIQUES_REFRESH_INTERVAL = timedelta(
+    minutes=int(os.getenv("STATISTIQUES_REFRESH_INTERVAL", 60))
+)
+STATISTIQUES_SNAPSHOTS_KEPT = int(os.getenv("STATISTIQUES_SNAPSHOTS_KEPT", 24))
+
+# Journal daily rollup
+JOURNAL_ROLLUP_INTERVAL = timedelta(
+    minutes=int(os.getenv("JOURNAL_ROLLUP_INTERVAL", 15))
+)
+
+# Connection partitions maintenance
+CONNECTION_PARTITIONS_INTERVAL = timedelta(
+    minutes=int(os.getenv("CONNECTION_PARTITIONS_INTERVAL", 60))
+)
+
+CELERY_BEAT_SCHEDULE = {
+    "refresh-statistiques": {
+        "task": "aidants_connect_web.tasks.refresh_statistiques",
+        "schedule": STATISTIQUES_REFRESH_INTERVAL,
+    },
+    "rollup-journal": {
+        "task": "aidants_connect_web.tasks.rollup_journal",
+        "schedule": JOURNAL_ROLLUP_INTERVAL,
+    },
+    "manage-connection-partitions": {
+        "task": "aidants_connect_web.tasks.manage_connection_partitions",
+        "schedule": CONNECTION_PARTITIONS_INTERVAL,
+    },
+    "create-journal-partitions": {
+        "task": "aidants_connect_web.tasks.create_journal_partitions",
+        "schedule": timedelta(days=1),
+    },
+}
+
 # COVID-19 changes
 ETAT_URGENCE_2020_LAST_DAY = datetime.strptime(
     os.getenv("ETAT_URGENCE_2020_LAST_DAY"), "%d/%m/%Y %H:%M:%S %z"
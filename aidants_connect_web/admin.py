@@ -1,5 +1,14 @@
-from django.contrib.admin import ModelAdmin, TabularInline
+from django.contrib.admin import ModelAdmin, SimpleListFilter, TabularInline
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import get_fields_from_path
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
+from django.core.exceptions import ValidationError
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.forms import Media
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 
 from django_celery_beat.admin import (
     ClockedScheduleAdmin,
@@ -25,11 +34,14 @@ from nested_admin import NestedModelAdmin, NestedTabularInline
 from tabbed_admin import TabbedModelAdmin
 
 from aidants_connect_web.forms import AidantChangeForm, AidantCreationForm
+from aidants_connect_web.journal_export import CONTENT_TYPES, EXPORT_FORMATS
 from aidants_connect_web.models import (
     Aidant,
     Autorisation,
     Connection,
     Journal,
+    JournalArchiveRemoval,
+    JournalDailyRollup,
     Mandat,
     Organisation,
     Usager,
@@ -58,6 +70,100 @@ class VisibleToStaff:
         return self.has_module_permission(request)
 
 
+class AutocompleteFilter(SimpleListFilter):
+    """
+    A filter on the foreign key at `field_path`, whose value is searched through
+    the autocomplete view of the related model admin rather than picked among
+    all the related objects.
+    """
+
+    template = "admin/autocomplete_filter.html"
+    field_path = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.field = get_fields_from_path(model, self.field_path)[-1]
+        self.title = self.field.verbose_name
+        # The parameter of the default filter, for the existing links to work
+        self.parameter_name = (
+            f"{self.field_path}__{self.field.target_field.name}__exact"
+        )
+        self.admin_site = model_admin.admin_site
+        super().__init__(request, params, model, model_admin)
+
+    def lookups(self, request, model_admin):
+        # Only the selected object is looked up, to display its name.
+        if self.value() is None:
+            return ()
+        try:
+            related_objects = self.field.related_model.objects.filter(pk=self.value())
+            return [(related.pk, str(related)) for related in related_objects]
+        except (ValueError, ValidationError):
+            return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        try:
+            return queryset.filter(**{self.parameter_name: self.value()})
+        except (ValueError, ValidationError) as e:
+            raise IncorrectLookupParameters(e)
+
+    def choices(self, changelist):
+        yield {
+            "selected": self.value() is None,
+            "query_string": changelist.get_query_string(remove=[self.parameter_name]),
+            "parameter_name": self.parameter_name,
+            "autocomplete_url": AutocompleteSelect(
+                self.field.remote_field, self.admin_site
+            ).get_url(),
+            "lookup_choices": self.lookup_choices,
+        }
+
+    @classmethod
+    def get_media(cls, model, admin_site) -> Media:
+        field = get_fields_from_path(model, cls.field_path)[-1]
+        return AutocompleteSelect(field.remote_field, admin_site).media + Media(
+            js=("js/admin_autocomplete_filter.js",)
+        )
+
+
+class OrganisationAutocompleteFilter(AutocompleteFilter):
+    field_path = "organisation"
+
+
+class UsagerAutocompleteFilter(AutocompleteFilter):
+    field_path = "usager"
+
+
+class AidantAutocompleteFilter(AutocompleteFilter):
+    field_path = "aidant"
+
+
+class AidantOrganisationAutocompleteFilter(AutocompleteFilter):
+    field_path = "aidant__organisation"
+
+
+def count_related(queryset, field_name: str):
+    """
+    :return: the number of objects of `queryset` whose `field_name` is the
+    annotated object, as a subquery: joining several relations to count them
+    would count the product of their rows.
+    """
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field_name: OuterRef("pk")})
+            .order_by()
+            .values(field_name)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
 class StaticDeviceStaffAdmin(VisibleToStaff, StaticDeviceAdmin):
     pass
 
@@ -70,6 +176,20 @@ class OrganisationAdmin(VisibleToStaff, ModelAdmin):
     list_display = ("name", "address", "admin_num_active_aidants", "admin_num_mandats")
     search_fields = ("name",)
 
+    def get_queryset(self, request):
+        # The annotations take the place of the `Organisation` cached properties,
+        # sparing two queries per listed organisation.
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                num_active_aidants=count_related(
+                    Aidant.objects.active(), "organisation"
+                ),
+                num_mandats=count_related(Mandat.objects.all(), "organisation"),
+            )
+        )
+
 
 class AidantAdmin(VisibleToStaff, DjangoUserAdmin):
     def get_form(self, request, obj=None, **kwargs):
@@ -144,7 +264,7 @@ class UsagerMandatInline(VisibleToStaff, NestedTabularInline):
 
 class UsagerAdmin(NestedModelAdmin, TabbedModelAdmin):
     list_display = ("__str__", "email", "creation_date")
-    search_fields = ("given_name", "family_name", "email")
+    search_fields = ("email",)
 
     tab_infos = (None, {"fields": ("given_name", "family_name", "email")})
 
@@ -152,6 +272,13 @@ class UsagerAdmin(NestedModelAdmin, TabbedModelAdmin):
 
     tabs = [("Informations", tab_infos), ("Mandats", tab_mandats)]
 
+    def get_search_results(self, request, queryset, search_term):
+        # Names are searched through `usager_name_search_idx`, emails by the
+        # default `search_fields` lookup.
+        if not search_term or "@" in search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.search(search_term), False
+
 
 class MandatAutorisationInline(VisibleToStaff, TabularInline):
     model = Autorisation
@@ -171,7 +298,8 @@ class MandatAdmin(VisibleToStaff, ModelAdmin):
         "admin_is_active",
         "is_remote",
     )
-    list_filter = ("organisation",)
+    list_filter = (OrganisationAutocompleteFilter, UsagerAutocompleteFilter)
+    list_select_related = ("usager", "organisation")
     search_fields = ("usager__given_name", "usager__family_name", "organisation__name")
 
     fields = (
@@ -188,6 +316,16 @@ class MandatAdmin(VisibleToStaff, ModelAdmin):
 
     inlines = (MandatAutorisationInline,)
 
+    @property
+    def media(self):
+        return super().media + OrganisationAutocompleteFilter.get_media(
+            self.model, self.admin_site
+        )
+
+    def get_queryset(self, request):
+        # Spares the query of `Mandat.is_active` per listed mandat.
+        return super().get_queryset(request).with_is_active()
+
 
 class ConnectionAdmin(ModelAdmin):
     list_display = ("id", "usager", "aidant", "complete")
@@ -195,9 +333,95 @@ class ConnectionAdmin(ModelAdmin):
 
 class JournalAdmin(ModelAdmin):
     list_display = ("id", "action", "aidant", "creation_date")
-    list_filter = ("action", "aidant")
+    list_filter = (
+        "action",
+        AidantOrganisationAutocompleteFilter,
+        AidantAutocompleteFilter,
+    )
     search_fields = ("action", "aidant")
     ordering = ("-creation_date",)
+    date_hierarchy = "creation_date"
+    actions = ("export_as_csv", "export_as_jsonl")
+
+    @property
+    def media(self):
+        return super().media + AidantAutocompleteFilter.get_media(
+            self.model, self.admin_site
+        )
+
+    def lookup_allowed(self, lookup, value):
+        # Only the field names of `list_filter` allow lookups across relations.
+        return lookup == "aidant__organisation__id__exact" or super().lookup_allowed(
+            lookup, value
+        )
+
+    def has_export_permission(self, request):
+        return request.user.has_perm("aidants_connect_web.view_journal")
+
+    def _export(self, queryset, export_format: str):
+        response = StreamingHttpResponse(
+            EXPORT_FORMATS[export_format](queryset),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="journal_{timezone.now():%Y%m%d_%H%M%S}'
+            f'.{export_format}"'
+        )
+        return response
+
+    def export_as_csv(self, request, queryset):
+        return self._export(queryset, "csv")
+
+    export_as_csv.short_description = "Exporter en CSV"
+    export_as_csv.allowed_permissions = ("export",)
+
+    def export_as_jsonl(self, request, queryset):
+        return self._export(queryset, "jsonl")
+
+    export_as_jsonl.short_description = "Exporter en JSON Lines"
+    export_as_jsonl.allowed_permissions = ("export",)
+
+
+class JournalDailyRollupAdmin(VisibleToStaff, ModelAdmin):
+    list_display = ("day", "organisation", "action", "demarche", "count")
+    list_filter = ("action", "demarche", "organisation")
+    date_hierarchy = "day"
+    readonly_fields = list_display
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class JournalArchiveRemovalAdmin(VisibleToStaff, ModelAdmin):
+    list_display = (
+        "month",
+        "entry_count",
+        "archive_name",
+        "removed_by",
+        "removal_date",
+    )
+    date_hierarchy = "month"
+    readonly_fields = (
+        "month",
+        "entry_count",
+        "last_entry_id",
+        "archive_name",
+        "archive_sha256",
+        "removed_by",
+        "removal_date",
+    )
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 # Display the following tables in the admin
@@ -206,6 +430,8 @@ admin_site.register(Aidant, AidantAdmin)
 admin_site.register(Usager, UsagerAdmin)
 admin_site.register(Mandat, MandatAdmin)
 admin_site.register(Journal, JournalAdmin)
+admin_site.register(JournalDailyRollup, JournalDailyRollupAdmin)
+admin_site.register(JournalArchiveRemoval, JournalArchiveRemovalAdmin)
 admin_site.register(Connection, ConnectionAdmin)
 
 admin_site.register(MagicToken)
@@ -6,3 +6,6 @@ class AidantConnectWebConfig(AppConfig):
 
     def ready(self):
         import aidants_connect_web.signals  # noqa
+        from aidants_connect_web.mandat_templates import get_mandat_template_hashes
+
+        get_mandat_template_hashes()
@@ -0,0 +1,256 @@
+import logging
+from threading import Lock
+import time
+
+import redis
+
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger()
+
+
+class CircuitBreakerOpen(Exception):
+    pass
+
+
+class MemoryCircuitBreakerStorage:
+    """
+    State of a circuit breaker kept in the current process, for tests and for
+    deployments running a single worker.
+    """
+
+    errors = ()
+
+    def __init__(self):
+        self.lock = Lock()
+        self.expiries = {}
+        self.counters = {}
+        self.transition_counts = {}
+
+    def _is_set(self, key: str) -> bool:
+        expiry = self.expiries.get(key)
+        return expiry is not None and (expiry is True or expiry > time.monotonic())
+
+    def add_call(self, bucket: int, failed: bool, ttl: int) -> tuple:
+        with self.lock:
+            self.counters = {
+                key: value for key, value in self.counters.items() if key[0] == bucket
+            }
+            calls = self.counters.get((bucket, "calls"), 0) + 1
+            failures = self.counters.get((bucket, "failures"), 0) + int(failed)
+            self.counters[(bucket, "calls")] = calls
+            self.counters[(bucket, "failures")] = failures
+        return calls, failures
+
+    def get_flags(self) -> tuple:
+        with self.lock:
+            return self._is_set("tripped"), self._is_set("open")
+
+    def trip(self, open_duration: int) -> bool:
+        with self.lock:
+            newly_tripped = not self._is_set("tripped")
+            self.expiries["tripped"] = True
+            self.expiries["open"] = time.monotonic() + open_duration
+            self.expiries.pop("trial", None)
+        return newly_tripped
+
+    def acquire_trial(self, ttl: int) -> bool:
+        with self.lock:
+            if self._is_set("trial"):
+                return False
+            self.expiries["trial"] = time.monotonic() + ttl
+        return True
+
+    def reset(self, bucket: int):
+        with self.lock:
+            self.expiries.clear()
+            self.counters.clear()
+
+    def count_transition(self, transition: str):
+        with self.lock:
+            self.transition_counts[transition] = (
+                self.transition_counts.get(transition, 0) + 1
+            )
+
+    def get_transition_counts(self) -> dict:
+        with self.lock:
+            return dict(self.transition_counts)
+
+
+class RedisCircuitBreakerStorage:
+    """
+    State of a circuit breaker shared by every worker through Redis.
+    Failures are counted per fixed window, in keys expiring on their own. The
+    changes of state are counted in the `<prefix>:transitions` hash, which
+    monitoring can read with `HGETALL`.
+    """
+
+    errors = (redis.RedisError,)
+
+    def __init__(self, url: str, prefix: str):
+        self.redis = redis.Redis.from_url(
+            url, socket_timeout=0.5, socket_connect_timeout=0.5
+        )
+        self.prefix = prefix
+
+    def _key(self, *parts) -> str:
+        return ":".join([self.prefix, *map(str, parts)])
+
+    def add_call(self, bucket: int, failed: bool, ttl: int) -> tuple:
+        calls_key = self._key("calls", bucket)
+        failures_key = self._key("failures", bucket)
+        pipeline = self.redis.pipeline()
+        pipeline.incr(calls_key)
+        pipeline.expire(calls_key, ttl)
+        if failed:
+            pipeline.incr(failures_key)
+            pipeline.expire(failures_key, ttl)
+        else:
+            pipeline.get(failures_key)
+        results = pipeline.execute()
+        return results[0], int(results[2] or 0)
+
+    def get_flags(self) -> tuple:
+        tripped, is_open = self.redis.mget(self._key("tripped"), self._key("open"))
+        return tripped is not None, is_open is not None
+
+    def trip(self, open_duration: int) -> bool:
+        pipeline = self.redis.pipeline()
+        pipeline.set(self._key("tripped"), 1, nx=True)
+        pipeline.set(self._key("open"), 1, ex=open_duration)
+        pipeline.delete(self._key("trial"))
+        newly_tripped, _, _ = pipeline.execute()
+        return bool(newly_tripped)
+
+    def acquire_trial(self, ttl: int) -> bool:
+        return bool(self.redis.set(self._key("trial"), 1, nx=True, ex=ttl))
+
+    def reset(self, bucket: int):
+        self.redis.delete(
+            self._key("tripped"),
+            self._key("open"),
+            self._key("trial"),
+            self._key("calls", bucket),
+            self._key("failures", bucket),
+        )
+
+    def count_transition(self, transition: str):
+        self.redis.hincrby(self._key("transitions"), transition)
+
+    def get_transition_counts(self) -> dict:
+        return {
+            transition.decode(): int(count)
+            for transition, count in self.redis.hgetall(
+                self._key("transitions")
+            ).items()
+        }
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service for `open_duration` seconds once at least
+    `min_calls` calls were made in a `window` of seconds and `failure_rate` of
+    them failed. The breaker is then open, calls fail at once.
+    When `open_duration` is over, the breaker is half-open: a single trial call
+    goes through, closing the breaker when it succeeds, opening it again when
+    it fails.
+    Every change of state is logged and counted in the storage, see
+    `transition_counts`. When the storage itself is unreachable the breaker
+    stays out of the way and lets the calls through.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        name: str,
+        storage,
+        failure_rate: float,
+        min_calls: int,
+        window: int,
+        open_duration: int,
+    ):
+        self.name = name
+        self.storage = storage
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_duration = open_duration
+
+    @property
+    def state(self) -> str:
+        tripped, is_open = self.storage.get_flags()
+        if not tripped:
+            return self.CLOSED
+        return self.OPEN if is_open else self.HALF_OPEN
+
+    @property
+    def transition_counts(self) -> dict:
+        """
+        :return: the number of each change of state since the storage was
+        created, by "<previous> -> <current>" transition
+        """
+        return self.storage.get_transition_counts()
+
+    def before_call(self) -> bool:
+        """
+        :return: whether the call about to be made is the trial call of a
+        half-open breaker
+        :raise: CircuitBreakerOpen when the call must not be made
+        """
+        try:
+            state = self.state
+            if state == self.CLOSED:
+                return False
+            if state == self.HALF_OPEN and self.storage.acquire_trial(
+                self.open_duration
+            ):
+                self._record_transition(self.OPEN, self.HALF_OPEN)
+                return True
+        except self.storage.errors as error:
+            self._log_storage_error(error)
+            return False
+
+        raise CircuitBreakerOpen(f"{self.name} circuit breaker is {state}")
+
+    def record(self, success: bool, trial: bool = False):
+        try:
+            if trial:
+                if success:
+                    self.storage.reset(self._current_bucket())
+                    self._record_transition(self.HALF_OPEN, self.CLOSED)
+                else:
+                    self.storage.trip(self.open_duration)
+                    self._record_transition(self.HALF_OPEN, self.OPEN)
+                return
+
+            calls, failures = self.storage.add_call(
+                self._current_bucket(), not success, 2 * self.window
+            )
+            if (
+                not success
+                and calls >= self.min_calls
+                and failures / calls >= self.failure_rate
+                and self.storage.trip(self.open_duration)
+            ):
+                self._record_transition(
+                    self.CLOSED, self.OPEN, f"{failures}/{calls} calls failed"
+                )
+        except self.storage.errors as error:
+            self._log_storage_error(error)
+
+    def _current_bucket(self) -> int:
+        return int(time.time() // self.window)
+
+    def _record_transition(self, previous: str, current: str, reason: str = ""):
+        transition = f"{previous} -> {current}"
+        log.warning(
+            f"{self.name} circuit breaker: {transition}"
+            + (f" ({reason})" if reason else "")
+        )
+        self.storage.count_transition(transition)
+
+    def _log_storage_error(self, error: Exception):
+        log.warning(f"{self.name} circuit breaker storage unavailable: {error!r}")
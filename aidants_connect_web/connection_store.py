@@ -0,0 +1,163 @@
+from functools import lru_cache
+from math import ceil
+import time
+
+from django.conf import settings
+from django.core import serializers
+from django.utils import timezone
+
+import redis
+
+from aidants_connect_web.models import Connection
+from aidants_connect_web.utilities import generate_token_digest
+
+
+class ORMConnectionStore:
+    """
+    Connections as rows of the `Connection` table, deleted once expired by the
+    `delete_expired_connections` task.
+    """
+
+    def create(self, **fields) -> Connection:
+        return Connection.objects.create(**fields)
+
+    def save(self, connection: Connection):
+        connection.save()
+
+    def get(self, pk) -> Connection:
+        return Connection.objects.get(pk=pk)
+
+    def get_by_state(self, state: str) -> Connection:
+        return Connection.objects.get(state=state)
+
+    def get_by_code(self, code: str) -> Connection:
+        return Connection.objects.get_by_code(code)
+
+    def get_by_access_token(self, access_token: str) -> Connection:
+        return Connection.objects.get_by_access_token(access_token)
+
+    def delete_expired(self, batch_size: int = 1000, max_seconds: float = None) -> int:
+        """
+        Delete the expired connections by batches of `batch_size` ids, each in
+        its own short transaction, and stop starting new batches once
+        `max_seconds` have passed.
+        :return: the number of deleted connections
+        """
+        start = time.monotonic()
+        expired_connections = Connection.objects.expired()
+        deleted_count = 0
+        while True:
+            batch_ids = list(
+                expired_connections.order_by("id").values_list("id", flat=True)[
+                    :batch_size
+                ]
+            )
+            if not batch_ids:
+                break
+            batch_deleted_count, _ = Connection.objects.filter(
+                id__in=batch_ids
+            ).delete()
+            deleted_count += batch_deleted_count
+            if len(batch_ids) < batch_size or (
+                max_seconds is not None and time.monotonic() - start >= max_seconds
+            ):
+                break
+        return deleted_count
+
+    def count_expired(self) -> int:
+        return Connection.objects.expired().count()
+
+
+class RedisConnectionStore:
+    """
+    Connections serialized in Redis keys that expire on their own,
+    `CONNECTION_STORE_RETENTION` seconds after `expires_on` so that a late
+    request still gets a 408 rather than a 403.
+    The state, code and access token lookups go through index keys holding the
+    id of the connection.
+    Connections created before `CONNECTION_STORE` was set to "redis" are not
+    found: switch while no FranceConnect flow is in progress.
+    """
+
+    INDEXED_FIELDS = ("state", "code", "access_token")
+
+    def __init__(self, redis_client, prefix: str = "aidants_connect:connection"):
+        self.redis = redis_client
+        self.prefix = prefix
+
+    def _key(self, *parts) -> str:
+        return ":".join([self.prefix, *map(str, parts)])
+
+    def create(self, **fields) -> Connection:
+        connection = Connection(**fields)
+        self.save(connection)
+        return connection
+
+    def save(self, connection: Connection):
+        if connection.pk is None:
+            connection.pk = self.redis.incr(self._key("last_id"))
+
+        remaining_seconds = (connection.expires_on - timezone.now()).total_seconds()
+        ttl = max(ceil(remaining_seconds), 0) + settings.CONNECTION_STORE_RETENTION
+
+        pipeline = self.redis.pipeline()
+        pipeline.set(
+            self._key(connection.pk),
+            serializers.serialize("json", [connection]),
+            ex=ttl,
+        )
+        for field_name in self.INDEXED_FIELDS:
+            value = getattr(connection, field_name)
+            if value and value != Connection._meta.get_field(field_name).get_default():
+                pipeline.set(self._key(field_name, value), connection.pk, ex=ttl)
+        pipeline.execute()
+
+    def get(self, pk) -> Connection:
+        serialized_connection = self.redis.get(self._key(pk))
+        if serialized_connection is None:
+            raise Connection.DoesNotExist(f"Connection #{pk} does not exist.")
+        return next(serializers.deserialize("json", serialized_connection)).object
+
+    def get_by_state(self, state: str) -> Connection:
+        return self._get_by("state", state)
+
+    def get_by_code(self, code: str) -> Connection:
+        return self._get_by("code", generate_token_digest(code))
+
+    def get_by_access_token(self, access_token: str) -> Connection:
+        return self._get_by("access_token", generate_token_digest(access_token))
+
+    def _get_by(self, field_name: str, value: str) -> Connection:
+        """
+        :raise: Connection.DoesNotExist, also when the index key is stale
+        because the field changed since
+        """
+        pk = self.redis.get(self._key(field_name, value))
+        if pk is None:
+            raise Connection.DoesNotExist(f"No connection has this {field_name}.")
+        connection = self.get(int(pk))
+        if getattr(connection, field_name) != value:
+            raise Connection.DoesNotExist(f"No connection has this {field_name}.")
+        return connection
+
+    def delete_expired(self, batch_size: int = 1000, max_seconds: float = None) -> int:
+        # Redis deletes the expired keys by itself.
+        return 0
+
+    def count_expired(self) -> int:
+        return 0
+
+
+@lru_cache(maxsize=None)
+def get_redis_client():
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+def get_connection_store():
+    """
+    :return: the store of the `Connection` objects selected by the
+    `CONNECTION_STORE` setting: "orm" (default) or "redis".
+    """
+    if settings.CONNECTION_STORE == "redis":
+        return RedisConnectionStore(get_redis_client())
+    return ORMConnectionStore()
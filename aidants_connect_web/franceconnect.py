@@ -0,0 +1,148 @@
+from functools import lru_cache
+import logging
+import time
+
+from django.conf import settings
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from aidants_connect_web.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerOpen,
+    MemoryCircuitBreakerStorage,
+    RedisCircuitBreakerStorage,
+)
+
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger()
+
+
+class FranceConnectUnavailable(requests.RequestException):
+    pass
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """
+    :return: the breaker guarding the calls to FranceConnect, its state stored
+    as `FC_AS_FS_BREAKER_STORAGE` says: "redis" to share it between workers
+    through `REDIS_URL`, "memory" to keep it in the current process.
+    """
+    if settings.FC_AS_FS_BREAKER_STORAGE == "memory":
+        storage = MemoryCircuitBreakerStorage()
+    else:
+        storage = RedisCircuitBreakerStorage(
+            settings.REDIS_URL, prefix="aidants_connect:franceconnect_breaker"
+        )
+    return CircuitBreaker(
+        "FC as FS",
+        storage,
+        failure_rate=settings.FC_AS_FS_BREAKER_FAILURE_RATE,
+        min_calls=settings.FC_AS_FS_BREAKER_MIN_CALLS,
+        window=settings.FC_AS_FS_BREAKER_WINDOW,
+        open_duration=settings.FC_AS_FS_BREAKER_OPEN_DURATION,
+    )
+
+
+class FranceConnectClient:
+    """
+    HTTP client for the calls of Aidants Connect, as a FranceConnect service
+    provider (FC as FS), to FranceConnect.
+    Connections are kept alive in a pool and every call is bounded by
+    `FC_AS_FS_CONNECT_TIMEOUT` and `FC_AS_FS_READ_TIMEOUT`. Only the idempotent
+    calls are retried, at most `FC_AS_FS_MAX_RETRIES` times.
+    While FranceConnect keeps failing, the circuit breaker makes the calls fail
+    at once instead of waiting for the timeouts.
+    :raise: requests.RequestException when FranceConnect cannot be reached,
+    answers with a server error or with a body which is not JSON,
+    FranceConnectUnavailable when the circuit breaker is open
+    """
+
+    def __init__(self, circuit_breaker: CircuitBreaker = None):
+        self.circuit_breaker = circuit_breaker or get_circuit_breaker()
+        retry = Retry(
+            total=settings.FC_AS_FS_MAX_RETRIES,
+            backoff_factor=0.1,
+            status_forcelist=(502, 503, 504),
+            method_whitelist=frozenset(["GET"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_maxsize=settings.FC_AS_FS_POOL_SIZE, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept"] = "application/json"
+
+    def request_token(self, code: str) -> dict:
+        return self._request(
+            "POST",
+            "/token",
+            data={
+                "grant_type": "authorization_code",
+                "redirect_uri": f"{settings.FC_AS_FS_CALLBACK_URL}/callback",
+                "client_id": settings.FC_AS_FS_ID,
+                "client_secret": settings.FC_AS_FS_SECRET,
+                "code": code,
+            },
+        )
+
+    def request_user_info(self, access_token: str) -> dict:
+        return self._request(
+            "GET",
+            "/userinfo?schema=openid",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+
+    def _request(self, method: str, path: str, **kwargs) -> dict:
+        try:
+            trial = self.circuit_breaker.before_call()
+        except CircuitBreakerOpen as error:
+            log.warning(f"FC as FS - {method} {path} not attempted: {error}")
+            raise FranceConnectUnavailable(error)
+
+        start = time.monotonic()
+        try:
+            response = self.session.request(
+                method,
+                f"{settings.FC_AS_FS_BASE_URL}{path}",
+                timeout=(
+                    settings.FC_AS_FS_CONNECT_TIMEOUT,
+                    settings.FC_AS_FS_READ_TIMEOUT,
+                ),
+                **kwargs,
+            )
+        except requests.RequestException as error:
+            log.warning(
+                f"FC as FS - {method} {path} failed after "
+                f"{(time.monotonic() - start) * 1000:.0f} ms: {error!r}"
+            )
+            self.circuit_breaker.record(success=False, trial=trial)
+            raise
+
+        log.info(
+            f"FC as FS - {method} {path} returned {response.status_code} "
+            f"in {(time.monotonic() - start) * 1000:.0f} ms"
+        )
+        self.circuit_breaker.record(success=response.status_code < 500, trial=trial)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        try:
+            return response.json()
+        except ValueError as error:
+            raise requests.RequestException(
+                f"FC as FS - {method} {path} returned a non-JSON body",
+                response=response,
+            ) from error
+
+
+@lru_cache(maxsize=None)
+def get_franceconnect_client() -> FranceConnectClient:
+    """
+    :return: the client of this process, created on first use so that worker
+    processes do not share the sockets of their parent.
+    """
+    return FranceConnectClient()
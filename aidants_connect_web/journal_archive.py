@@ -0,0 +1,319 @@
+from datetime import datetime
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from aidants_connect_web.models import (
+    Journal,
+    JournalArchiveRemoval,
+    JournalDailyRollupCheckpoint,
+)
+from aidants_connect_web.partitioning import journal_partitioning
+
+
+class JournalArchiveError(Exception):
+    pass
+
+
+class JournalMonthArchive:
+    """
+    The journal entries of a calendar month (UTC), one serialized entry per
+    line of `journal_<YYYYMM>.jsonl.gz`. The file is only appended to, each
+    block of `BLOCK_SIZE` entries being a gzip member of its own.
+    The sidecar `journal_<YYYYMM>.index.json` holds, by usager, aidant and
+    attestation hash, the offset and size of the block and the id of each
+    archived entry, so that a lookup only reads and decompresses the blocks
+    holding the entries. It also holds the last archived id and the size and
+    SHA-256 of the archive file when it was written, so that an export
+    interrupted between the two files is rolled back by the next one.
+    `journal_index.json` lists the archived months of each usager, aidant and
+    attestation hash.
+    The archives are written to `JOURNAL_ARCHIVE_DIR`, which must be set.
+    """
+
+    INDEXED_FIELDS = ("usager", "aidant", "attestation_hash")
+
+    BLOCK_SIZE = 100
+
+    MONTHS_INDEX_NAME = "journal_index.json"
+
+    def __init__(self, month: datetime, directory: str = None):
+        self.start, self.end = journal_partitioning.get_bounds(month)
+        self.directory = directory or settings.JOURNAL_ARCHIVE_DIR
+        if not self.directory:
+            raise JournalArchiveError("JOURNAL_ARCHIVE_DIR is not set.")
+        self.name = f"journal_{self.start:%Y%m}.jsonl.gz"
+        self.path = os.path.join(self.directory, self.name)
+        self.index_path = os.path.join(
+            self.directory, f"journal_{self.start:%Y%m}.index.json"
+        )
+
+    @classmethod
+    def list(cls, directory: str = None) -> list:
+        """
+        :return: the archives of `directory`, oldest first
+        """
+        directory = directory or settings.JOURNAL_ARCHIVE_DIR
+        if not directory or not os.path.isdir(directory):
+            return []
+        months = sorted(
+            match.group(1)
+            for match in map(
+                re.compile(r"^journal_(\d{6})\.index\.json$").match,
+                os.listdir(directory),
+            )
+            if match
+        )
+        return [
+            cls(
+                datetime.strptime(month, "%Y%m").replace(tzinfo=timezone.utc), directory
+            )
+            for month in months
+        ]
+
+    @classmethod
+    def read_months_index(cls, directory: str = None) -> dict:
+        """
+        :return: the months (YYYYMM) archived by usager, aidant and attestation
+        hash in `directory`
+        """
+        directory = directory or settings.JOURNAL_ARCHIVE_DIR
+        path = directory and os.path.join(directory, cls.MONTHS_INDEX_NAME)
+        if not path or not os.path.exists(path):
+            return {field_name: {} for field_name in cls.INDEXED_FIELDS}
+        with open(path) as index_file:
+            return json.load(index_file)
+
+    def _add_to_months_index(self, values: dict):
+        months_index = self.read_months_index(self.directory)
+        month = f"{self.start:%Y%m}"
+        for field_name, field_values in values.items():
+            for value in field_values:
+                months = months_index[field_name].setdefault(value, [])
+                if month not in months:
+                    months.append(month)
+        _write_json(os.path.join(self.directory, self.MONTHS_INDEX_NAME), months_index)
+
+    def read_index(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {
+                "entry_count": 0,
+                "last_entry_id": 0,
+                "archive_size": 0,
+                "archive_sha256": None,
+                **{field_name: {} for field_name in self.INDEXED_FIELDS},
+            }
+        with open(self.index_path) as index_file:
+            return json.load(index_file)
+
+    def export(self, chunk_size: int = 1000) -> int:
+        """
+        Append the entries of the month written since the last export.
+        :return: the number of exported entries
+        """
+        index = self.read_index()
+        entries = (
+            Journal.objects.created_between(self.start, self.end)
+            .filter(id__gt=index["last_entry_id"])
+            .order_by("id")
+        )
+        if not entries.exists():
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path, "r+b") as archive_file:
+                archive_file.truncate(index["archive_size"])
+
+        exported_count = 0
+        exported_values = {field_name: set() for field_name in self.INDEXED_FIELDS}
+        with open(self.path, "ab") as archive_file:
+            block = []
+            for entry in entries.iterator(chunk_size=chunk_size):
+                block.append(entry)
+                if len(block) == self.BLOCK_SIZE:
+                    self._write_block(archive_file, block, index, exported_values)
+                    exported_count += len(block)
+                    block = []
+            if block:
+                self._write_block(archive_file, block, index, exported_values)
+                exported_count += len(block)
+
+        index["entry_count"] += exported_count
+        index["archive_size"] = os.path.getsize(self.path)
+        index["archive_sha256"] = self.get_sha256()
+        # The months index is written first: listing a month whose export was
+        # interrupted only costs a lookup finding nothing there.
+        self._add_to_months_index(exported_values)
+        _write_json(self.index_path, index)
+        return exported_count
+
+    def _write_block(self, archive_file, block: list, index: dict, values: dict):
+        """
+        Append `block` as a gzip member and index its entries.
+        """
+        lines = (
+            json.dumps(
+                serializers.serialize("python", [entry])[0], cls=DjangoJSONEncoder
+            )
+            + "\n"
+            for entry in block
+        )
+        compressed_block = gzip.compress("".join(lines).encode("utf-8"))
+        offset = archive_file.tell()
+        archive_file.write(compressed_block)
+
+        for entry in block:
+            for field_name in self.INDEXED_FIELDS:
+                value = getattr(entry, Journal._meta.get_field(field_name).attname)
+                if value is not None:
+                    index[field_name].setdefault(str(value), []).append(
+                        [offset, len(compressed_block), entry.id]
+                    )
+                    values[field_name].add(str(value))
+        index["last_entry_id"] = block[-1].id
+
+    def read_entries(self, ids=None):
+        """
+        :return: an iterator over the archived entries, as unsaved `Journal`
+        instances, limited to `ids` if given
+        """
+        if not os.path.exists(self.path):
+            return
+        with gzip.open(self.path, "rt", encoding="utf-8") as archive_file:
+            for line in archive_file:
+                serialized_entry = json.loads(line)
+                if ids is None or serialized_entry["pk"] in ids:
+                    yield next(
+                        serializers.deserialize("python", [serialized_entry])
+                    ).object
+
+    def read_ids(self):
+        """
+        :return: an iterator over the ids of the archived entries, read from the
+        archive file without deserializing the entries
+        """
+        if not os.path.exists(self.path):
+            return
+        with gzip.open(self.path, "rt", encoding="utf-8") as archive_file:
+            for line in archive_file:
+                yield json.loads(line)["pk"]
+
+    def find(self, field_name: str, value) -> list:
+        """
+        :return: the archived entries whose `field_name` is `value`, as unsaved
+        `Journal` instances, read from their blocks only
+        """
+        ids_by_block = {}
+        for offset, size, entry_id in self.read_index()[field_name].get(str(value), []):
+            ids_by_block.setdefault((offset, size), set()).add(entry_id)
+        if not ids_by_block:
+            return []
+
+        entries = []
+        with open(self.path, "rb") as archive_file:
+            for (offset, size), ids in sorted(ids_by_block.items()):
+                archive_file.seek(offset)
+                block = gzip.decompress(archive_file.read(size)).decode("utf-8")
+                for line in block.splitlines():
+                    serialized_entry = json.loads(line)
+                    if serialized_entry["pk"] in ids:
+                        entries.append(
+                            next(
+                                serializers.deserialize("python", [serialized_entry])
+                            ).object
+                        )
+        return entries
+
+    def get_sha256(self) -> str:
+        sha256 = hashlib.sha256()
+        with open(self.path, "rb") as archive_file:
+            for block in iter(lambda: archive_file.read(65536), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def remove_from_journal(self, removed_by: str) -> JournalArchiveRemoval:
+        """
+        Delete the entries of the month from the journal, once checked that
+        the archive file read back matches the SHA-256 of its last export and
+        that each entry is in it and counted in the daily rollup, and record
+        the removal.
+        :raise: JournalArchiveError when the archive does not match, or when an
+        entry is missing from it or from the rollup
+        """
+        archive_sha256 = self.get_sha256() if os.path.exists(self.path) else None
+        if not archive_sha256 or archive_sha256 != self.read_index()["archive_sha256"]:
+            raise JournalArchiveError(
+                f"{self.name} does not match the SHA-256 of its last export."
+            )
+
+        with transaction.atomic():
+            entries = Journal.objects.created_between(self.start, self.end)
+            journal_ids = set(entries.values_list("id", flat=True))
+            if not journal_ids:
+                raise JournalArchiveError(
+                    f"No entry of {self.start:%m/%Y} is left in the journal."
+                )
+
+            archived_ids = set(self.read_ids())
+            missing_count = len(journal_ids - archived_ids)
+            if missing_count:
+                raise JournalArchiveError(
+                    f"{missing_count} entries of {self.start:%m/%Y} are not archived "
+                    f"in {self.name}."
+                )
+
+            checkpoint = JournalDailyRollupCheckpoint.objects.filter(pk=1).first()
+            if not checkpoint or checkpoint.last_journal_id < max(journal_ids):
+                raise JournalArchiveError(
+                    f"Entries of {self.start:%m/%Y} are not rolled up yet."
+                )
+
+            # `Journal.delete` is disabled, the queryset deletes the rows at once.
+            entry_count, _ = entries.delete()
+            return JournalArchiveRemoval.objects.create(
+                month=self.start.date(),
+                entry_count=entry_count,
+                last_entry_id=max(journal_ids),
+                archive_name=self.name,
+                archive_sha256=archive_sha256,
+                removed_by=removed_by,
+            )
+
+
+def _write_json(path: str, value):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as json_file:
+        json.dump(value, json_file)
+    os.replace(temporary_path, path)
+
+
+def find_journal_entries(directory: str = None, **lookup) -> list:
+    """
+    :param lookup: a single usager, aidant or attestation_hash lookup
+    :return: the matching entries of the journal and of the archive, oldest
+    first, those of the archive as unsaved `Journal` instances
+    """
+    if len(lookup) != 1 or not set(lookup) <= set(JournalMonthArchive.INDEXED_FIELDS):
+        raise ValueError("Journal entries are found by usager, aidant or attestation")
+    ((field_name, value),) = lookup.items()
+
+    entries = {entry.id: entry for entry in Journal.objects.filter(**lookup)}
+    value = str(getattr(value, "pk", value))
+    months = JournalMonthArchive.read_months_index(directory)[field_name].get(value, [])
+    for month in sorted(months):
+        archive = JournalMonthArchive(
+            datetime.strptime(month, "%Y%m").replace(tzinfo=timezone.utc), directory
+        )
+        for entry in archive.find(field_name, value):
+            # An exported entry may still be in the journal.
+            entries.setdefault(entry.id, entry)
+    return sorted(entries.values(), key=lambda entry: entry.id)
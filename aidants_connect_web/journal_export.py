@@ -0,0 +1,152 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+
+from aidants_connect_web.journal_archive import find_journal_entries
+from aidants_connect_web.models import Aidant, Journal
+
+
+# The access tokens are left out: they are secrets, not audit information.
+EXPORTED_FIELDS = (
+    "id",
+    "creation_date",
+    "action",
+    "aidant_id",
+    "aidant__organisation_id",
+    "usager_id",
+    "demarche",
+    "duree",
+    "autorisation",
+    "attestation_hash",
+    "is_remote_mandat",
+    "additional_information",
+)
+
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+def filter_journal(
+    queryset=None,
+    aidant=None,
+    usager=None,
+    organisation=None,
+    action=None,
+    start=None,
+    end=None,
+):
+    """
+    :param start: the first included creation date
+    :param end: the first excluded creation date
+    :return: the journal entries matching all the given filters
+    """
+    if queryset is None:
+        queryset = Journal.objects.all()
+    if aidant is not None:
+        queryset = queryset.filter(aidant=aidant)
+    if usager is not None:
+        queryset = queryset.filter(usager=usager)
+    if organisation is not None:
+        queryset = queryset.filter(aidant__organisation=organisation)
+    if action is not None:
+        queryset = queryset.filter(action=action)
+    if start is not None:
+        queryset = queryset.created_since(start)
+    if end is not None:
+        queryset = queryset.filter(creation_date__lt=end)
+    return queryset
+
+
+def find_journal_rows(
+    aidant=None,
+    usager=None,
+    organisation=None,
+    action=None,
+    start=None,
+    end=None,
+    directory: str = None,
+) -> list:
+    """
+    Filter the entries of an aidant or of an usager as `filter_journal` does,
+    including those removed from the journal after being archived.
+    :return: the rows of `EXPORTED_FIELDS` of the matching entries, by id
+    """
+    if aidant is not None:
+        entries = find_journal_entries(directory, aidant=aidant)
+    elif usager is not None:
+        entries = find_journal_entries(directory, usager=usager)
+    else:
+        raise ValueError("Archived journal entries are found by aidant or usager")
+
+    organisation_ids = dict(
+        Aidant.objects.filter(
+            id__in={entry.aidant_id for entry in entries}
+        ).values_list("id", "organisation_id")
+    )
+    rows = []
+    for entry in entries:
+        organisation_id = organisation_ids.get(entry.aidant_id)
+        if (
+            (usager is not None and entry.usager_id != getattr(usager, "pk", usager))
+            or (
+                organisation is not None
+                and organisation_id != getattr(organisation, "pk", organisation)
+            )
+            or (action is not None and entry.action != action)
+            or (start is not None and entry.creation_date < start)
+            or (end is not None and entry.creation_date >= end)
+        ):
+            continue
+        rows.append(
+            tuple(
+                organisation_id
+                if field_name == "aidant__organisation_id"
+                else getattr(entry, field_name)
+                for field_name in EXPORTED_FIELDS
+            )
+        )
+    return rows
+
+
+def _iter_rows(entries, chunk_size: int):
+    """
+    :param entries: a queryset of journal entries, or rows of `EXPORTED_FIELDS`
+    """
+    if not isinstance(entries, QuerySet):
+        return iter(entries)
+    # On PostgreSQL, `iterator` reads through a server-side cursor, holding
+    # only `chunk_size` rows in memory at a time.
+    return (
+        entries.order_by("id")
+        .values_list(*EXPORTED_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Echo:
+    """A file-like object whose `write` returns the written value to `csv`."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(entries, chunk_size: int = 2000):
+    """
+    :return: an iterator over the CSV lines of the journal entries, header first
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORTED_FIELDS)
+    for row in _iter_rows(entries, chunk_size):
+        yield writer.writerow(row)
+
+
+def iter_jsonl(entries, chunk_size: int = 2000):
+    """
+    :return: an iterator over the journal entries as JSON Lines
+    """
+    for row in _iter_rows(entries, chunk_size):
+        yield json.dumps(dict(zip(EXPORTED_FIELDS, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+EXPORT_FORMATS = {"csv": iter_csv, "jsonl": iter_jsonl}
@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from aidants_connect_web.journal_archive import JournalArchiveError, JournalMonthArchive
+from aidants_connect_web.models import Journal
+from aidants_connect_web.partitioning import journal_partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports the closed months of the `Journal` to compressed archive files "
+        "and, with --remove, deletes the archived entries from the journal"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-old",
+            type=int,
+            default=None,
+            help="Number of months, besides the current one, kept out of the archive",
+        )
+        parser.add_argument(
+            "--remove",
+            action="store_true",
+            help="Delete the archived entries from the journal",
+        )
+        parser.add_argument(
+            "--removed-by", help="Name of the person responsible for the removal",
+        )
+
+    def handle(self, *args, **options):
+        if options["remove"] and not options["removed_by"]:
+            raise CommandError("--remove needs --removed-by.")
+        if not settings.JOURNAL_ARCHIVE_DIR:
+            raise CommandError(
+                "JOURNAL_ARCHIVE_DIR must be set to a directory on a durable volume."
+            )
+        months_old = options["months_old"]
+        if months_old is None:
+            months_old = settings.JOURNAL_ARCHIVE_AFTER_MONTHS
+
+        before, _ = journal_partitioning.get_bounds(timezone.now())
+        for _ in range(months_old):
+            before, _ = journal_partitioning.get_bounds(before - timedelta(days=1))
+
+        oldest = Journal.objects.aggregate(Min("creation_date"))["creation_date__min"]
+        if oldest is None:
+            return
+        month, _ = journal_partitioning.get_bounds(oldest)
+        while month < before:
+            archive = JournalMonthArchive(month)
+            exported_count = archive.export()
+            if exported_count:
+                self.stdout.write(f"{exported_count} entries added to {archive.name}.")
+            if options["remove"] and Journal.objects.created_in_month(month).exists():
+                try:
+                    removal = archive.remove_from_journal(options["removed_by"])
+                except JournalArchiveError as e:
+                    raise CommandError(str(e))
+                self.stdout.write(
+                    f"{removal.entry_count} entries of {archive.name} removed "
+                    f"from the journal."
+                )
+            _, month = journal_partitioning.get_bounds(month)
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from aidants_connect_web.models import Autorisation, AutorisationIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the `AutorisationIndex` entries with the active autorisations "
+        "they are computed from"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Recompute the differing entries and prune the expired ones",
+        )
+
+    def handle(self, *args, **options):
+        expected_demarches = {}
+        active_autorisations = (
+            Autorisation.objects.active()
+            .filter(mandat__isnull=False)
+            .values_list("mandat__organisation_id", "mandat__usager_id", "demarche")
+        )
+        for organisation_id, usager_id, demarche in active_autorisations.iterator():
+            expected_demarches.setdefault((organisation_id, usager_id), set()).add(
+                demarche
+            )
+
+        indexed_demarches = {
+            (entry.organisation_id, entry.usager_id): set(entry.get_active_demarches())
+            for entry in AutorisationIndex.objects.active().iterator()
+        }
+
+        differences = sorted(
+            pair
+            for pair in expected_demarches.keys() | indexed_demarches.keys()
+            if expected_demarches.get(pair) != indexed_demarches.get(pair)
+        )
+        for organisation_id, usager_id in differences:
+            pair = (organisation_id, usager_id)
+            self.stdout.write(
+                f"Organisation #{organisation_id}, usager #{usager_id}: "
+                f"expected {sorted(expected_demarches.get(pair, []))}, "
+                f"indexed {sorted(indexed_demarches.get(pair, []))}"
+            )
+
+        if options["fix"]:
+            for organisation_id, usager_id in differences:
+                AutorisationIndex.objects.refresh(organisation_id, usager_id)
+            pruned_count, _ = AutorisationIndex.objects.expired().delete()
+            self.stdout.write(
+                f"Fixed {len(differences)} entries, pruned {pruned_count} entries."
+            )
+        elif differences:
+            raise CommandError(
+                f"{len(differences)} entries differ from the autorisations."
+            )
+        else:
+            self.stdout.write("The autorisation index is consistent.")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from aidants_connect_web.tasks import create_journal_partitions
+
+
+class Command(BaseCommand):
+    help = "Creates the next monthly partitions of the `Journal` table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=None,
+            help="Number of months for which partitions are created in advance",
+        )
+
+    def handle(self, *args, **options):
+        create_journal_partitions(months_ahead=options["months_ahead"])
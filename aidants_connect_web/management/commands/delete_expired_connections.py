@@ -6,5 +6,21 @@ from aidants_connect_web.tasks import delete_expired_connections
 class Command(BaseCommand):
     help = "Deletes the expired `Connection` objects from the database"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of connections deleted per transaction",
+        )
+        parser.add_argument(
+            "--max-seconds",
+            type=float,
+            default=60,
+            help="Time after which no new batch is started",
+        )
+
     def handle(self, *args, **options):
-        delete_expired_connections()
+        delete_expired_connections(
+            batch_size=options["batch_size"], max_seconds=options["max_seconds"]
+        )
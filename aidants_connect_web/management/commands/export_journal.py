@@ -0,0 +1,88 @@
+from argparse import ArgumentTypeError
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from aidants_connect_web.journal_export import (
+    EXPORT_FORMATS,
+    filter_journal,
+    find_journal_rows,
+)
+from aidants_connect_web.models import JournalArchiveRemoval
+
+
+def parse_day(value: str):
+    day = parse_date(value)
+    if day is None:
+        raise ArgumentTypeError(f"Invalid date: {value}, expected YYYY-MM-DD.")
+    return day
+
+
+def start_of_day(day):
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams the journal entries matching the given filters as CSV "
+        "or JSON Lines, without loading them in memory. The entries of an "
+        "aidant or of an usager include those removed after being archived"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=sorted(EXPORT_FORMATS), default="csv",
+        )
+        parser.add_argument("--aidant", type=int, help="Id of the aidant")
+        parser.add_argument("--usager", type=int, help="Id of the usager")
+        parser.add_argument("--organisation", type=int, help="Id of the organisation")
+        parser.add_argument("--action", help="Journal action, e.g. use_autorisation")
+        parser.add_argument(
+            "--start", type=parse_day, help="First day exported, YYYY-MM-DD"
+        )
+        parser.add_argument(
+            "--end", type=parse_day, help="Last day exported, YYYY-MM-DD"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of journal entries fetched from the database at a time",
+        )
+        parser.add_argument(
+            "--output", help="Path of the file written, stdout if unset"
+        )
+
+    def handle(self, *args, **options):
+        end = options["end"] and options["end"] + timedelta(days=1)
+        filters = dict(
+            aidant=options["aidant"],
+            usager=options["usager"],
+            organisation=options["organisation"],
+            action=options["action"],
+            start=start_of_day(options["start"]),
+            end=start_of_day(end),
+        )
+        if options["aidant"] is not None or options["usager"] is not None:
+            entries = find_journal_rows(**filters)
+        else:
+            entries = filter_journal(**filters)
+            if JournalArchiveRemoval.objects.exists():
+                self.stderr.write(
+                    "The entries removed from the journal after being archived "
+                    "are only exported with --aidant or --usager."
+                )
+        lines = EXPORT_FORMATS[options["format"]](
+            entries, chunk_size=options["chunk_size"]
+        )
+
+        if not options["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+        with open(options["output"], "w", newline="") as output_file:
+            output_file.writelines(lines)
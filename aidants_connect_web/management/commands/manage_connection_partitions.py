@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from aidants_connect_web.tasks import manage_connection_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the next daily partitions of the `Connection` table "
+        "and drops the expired ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days-ahead",
+            type=int,
+            default=None,
+            help="Number of days for which partitions are created in advance",
+        )
+
+    def handle(self, *args, **options):
+        manage_connection_partitions(days_ahead=options["days_ahead"])
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from aidants_connect_web.partitioning import journal_partitioning, supports_partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Converts the `Journal` table to monthly partitions, copying its rows "
+        "by chunks while it stays writable"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Number of journal entries copied in each transaction",
+        )
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=3,
+            help="Number of months for which partitions are created in advance",
+        )
+
+    def handle(self, *args, **options):
+        if not supports_partitioning():
+            self.stdout.write("Partitioning needs PostgreSQL 11 or above.")
+            return
+        if journal_partitioning.is_partitioned():
+            self.stdout.write("The journal table is already partitioned.")
+            return
+
+        until = timezone.now()
+        for _ in range(options["months_ahead"]):
+            until = journal_partitioning.get_bounds(until)[1]
+        copied_count = journal_partitioning.partition_table_online(
+            until=until, chunk_size=options["chunk_size"], log=self.stdout.write
+        )
+        self.stdout.write(
+            f"The journal table is partitioned, {copied_count} entries copied."
+        )
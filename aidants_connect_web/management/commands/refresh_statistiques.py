@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from aidants_connect_web.tasks import refresh_statistiques
+
+
+class Command(BaseCommand):
+    help = "Takes a new snapshot of the public statistics"
+
+    def handle(self, *args, **options):
+        refresh_statistiques()
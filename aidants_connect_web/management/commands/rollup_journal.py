@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from aidants_connect_web.tasks import rollup_journal
+
+
+class Command(BaseCommand):
+    help = "Counts the new `Journal` entries into the daily rollup"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Number of journal entries counted per transaction",
+        )
+
+    def handle(self, *args, **options):
+        rollup_journal(chunk_size=options["chunk_size"])
@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.utils import timezone
+
+from aidants_connect_web.models import (
+    Aidant,
+    Autorisation,
+    AutorisationIndex,
+    Connection,
+    Journal,
+    Mandat,
+)
+
+
+@transaction.atomic
+def create_mandat(
+    aidant: Aidant,
+    connection: Connection,
+    expiration_date,
+    duree: int,
+    attestation_hash: str,
+    mandat_template_path: str,
+) -> Mandat:
+    """
+    Create the mandat described by `connection`, with one autorisation per
+    démarche, and revoke the active autorisations of the aidant's organisation
+    for the same usager and démarches. Everything is written in one transaction
+    and with a constant number of queries, whatever the number of démarches.
+    :return: the new mandat.
+    """
+    now = timezone.now()
+    usager = connection.usager
+    demarches = sorted(connection.demarches)
+
+    journal_entries = [
+        Journal.log_attestation_creation(
+            aidant=aidant,
+            usager=usager,
+            demarches=demarches,
+            duree=duree,
+            is_remote_mandat=connection.mandat_is_remote,
+            access_token=connection.access_token,
+            attestation_hash=attestation_hash,
+            mandat_template_path=mandat_template_path,
+            commit=False,
+        )
+    ]
+
+    (mandat,) = Mandat.objects.bulk_create(
+        [
+            Mandat(
+                organisation_id=aidant.organisation_id,
+                usager=usager,
+                duree_keyword=connection.duree_keyword,
+                expiration_date=expiration_date,
+                is_remote=connection.mandat_is_remote,
+            )
+        ]
+    )
+
+    # Revoke the autorisations superseded by the new mandat
+    superseded_autorisations = list(
+        Autorisation.objects.active()
+        .filter(
+            mandat__organisation_id=aidant.organisation_id,
+            mandat__usager=usager,
+            demarche__in=demarches,
+        )
+        .select_related("mandat__usager")
+        .select_for_update(of=("self",))
+        .order_by("pk")
+    )
+    Autorisation.objects.filter(
+        pk__in=[autorisation.pk for autorisation in superseded_autorisations]
+    ).update(revocation_date=now)
+
+    autorisations = Autorisation.objects.bulk_create(
+        Autorisation(
+            mandat=mandat, demarche=demarche, last_renewal_token=connection.access_token
+        )
+        for demarche in demarches
+    )
+
+    for autorisation in autorisations:
+        for superseded_autorisation in superseded_autorisations:
+            if superseded_autorisation.demarche == autorisation.demarche:
+                superseded_autorisation.revocation_date = now
+                journal_entries.append(
+                    Journal.log_autorisation_cancel(
+                        superseded_autorisation, aidant, commit=False
+                    )
+                )
+        journal_entries.append(
+            Journal.log_autorisation_creation(autorisation, aidant, commit=False)
+        )
+    journal_entries = Journal.objects.bulk_create(journal_entries)
+
+    # `bulk_create` and `update` bypass `Journal.save` and the `post_save`
+    # signals that keep these denormalised values up to date.
+    Journal.update_aidant_last_action_date(aidant.id, journal_entries[-1].creation_date)
+    aidant.last_action_date = journal_entries[-1].creation_date
+    AutorisationIndex.objects.refresh(aidant.organisation_id, usager.id)
+
+    return mandat
@@ -0,0 +1,40 @@
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+from aidants_connect_web.utilities import generate_file_sha256_hash
+
+
+MANDAT_TEMPLATES_DIR = "templates/aidants_connect_web/mandat_templates"
+
+
+@lru_cache(maxsize=None)
+def get_mandat_template_hashes() -> dict:
+    """
+    Hash every version of the mandat template once per process.
+    :return: a dict mapping each template path, relative to this app and in the
+    format of `settings.MANDAT_TEMPLATE_PATH`, to its SHA-256 hash.
+    """
+    base_path = Path(__file__).resolve().parent
+    return {
+        str(template_file.relative_to(base_path)): generate_file_sha256_hash(
+            template_file
+        )
+        for template_file in sorted((base_path / MANDAT_TEMPLATES_DIR).glob("*.html"))
+    }
+
+
+def get_mandat_template_hash(template_path: str = None) -> str:
+    """
+    :param template_path: the version of the mandat template,
+    `settings.MANDAT_TEMPLATE_PATH` by default.
+    :return: the SHA-256 hash of this version, read from disk at most once.
+    """
+    if template_path is None:
+        template_path = settings.MANDAT_TEMPLATE_PATH
+
+    mandat_template_hashes = get_mandat_template_hashes()
+    if template_path not in mandat_template_hashes:
+        mandat_template_hashes[template_path] = generate_file_sha256_hash(template_path)
+    return mandat_template_hashes[template_path]
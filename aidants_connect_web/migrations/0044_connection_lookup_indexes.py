@@ -0,0 +1,30 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # `CREATE INDEX CONCURRENTLY` cannot run inside a transaction, but it does
+    # not lock the table against writes while the index is built.
+    atomic = False
+
+    dependencies = [
+        ("aidants_connect_web", "0043_auto_20201118_1601"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="connection",
+            index=models.Index(fields=["state"], name="connection_state_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="connection",
+            index=models.Index(fields=["code"], name="connection_code_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="connection",
+            index=models.Index(
+                fields=["access_token"], name="connection_access_token_idx"
+            ),
+        ),
+    ]
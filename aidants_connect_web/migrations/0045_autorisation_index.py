@@ -0,0 +1,99 @@
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def fill_autorisation_index(apps, _):
+    Autorisation = apps.get_model("aidants_connect_web", "Autorisation")
+    AutorisationIndex = apps.get_model("aidants_connect_web", "AutorisationIndex")
+
+    # Only the pairs with an active autorisation are worth indexing.
+    expiration_dates = {}
+    active_autorisations = (
+        Autorisation.objects.exclude(mandat__expiration_date__lt=timezone.now())
+        .filter(revocation_date__isnull=True, mandat__isnull=False)
+        .values_list(
+            "mandat__organisation_id",
+            "mandat__usager_id",
+            "demarche",
+            "mandat__expiration_date",
+        )
+    )
+    for organisation_id, usager_id, demarche, expiration_date in active_autorisations:
+        pair_dates = expiration_dates.setdefault((organisation_id, usager_id), {})
+        pair_dates[demarche] = max(
+            expiration_date, pair_dates.get(demarche, expiration_date)
+        )
+
+    AutorisationIndex.objects.bulk_create(
+        (
+            AutorisationIndex(
+                organisation_id=organisation_id,
+                usager_id=usager_id,
+                demarches={
+                    demarche: expiration_date.isoformat()
+                    for demarche, expiration_date in pair_dates.items()
+                },
+                expiration_date=max(pair_dates.values()),
+            )
+            for (organisation_id, usager_id), pair_dates in expiration_dates.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aidants_connect_web", "0044_connection_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AutorisationIndex",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("demarches", models.JSONField(default=dict)),
+                (
+                    "expiration_date",
+                    models.DateTimeField(verbose_name="Date d'expiration"),
+                ),
+                (
+                    "organisation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="autorisation_index",
+                        to="aidants_connect_web.organisation",
+                    ),
+                ),
+                (
+                    "usager",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="autorisation_index",
+                        to="aidants_connect_web.usager",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "index des autorisations actives",
+                "verbose_name_plural": "index des autorisations actives",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="autorisationindex",
+            constraint=models.UniqueConstraint(
+                fields=("organisation", "usager"),
+                name="unique_autorisation_index_per_organisation_usager",
+            ),
+        ),
+        migrations.RunPython(fill_autorisation_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models import Q
+
+
+class Migration(migrations.Migration):
+
+    # `CREATE INDEX CONCURRENTLY` cannot run inside a transaction, but it does
+    # not lock the tables against writes while the indexes are built.
+    atomic = False
+
+    dependencies = [
+        ("aidants_connect_web", "0045_autorisation_index"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="usager",
+            index=models.Index(
+                fields=["family_name", "given_name"], name="usager_name_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="mandat",
+            index=models.Index(
+                fields=["organisation", "usager", "expiration_date"],
+                name="mandat_orga_usager_exp_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="autorisation",
+            index=models.Index(
+                condition=Q(revocation_date__isnull=True),
+                fields=["mandat", "demarche"],
+                name="autorisation_unrevoked_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="journal",
+            index=models.Index(
+                fields=["aidant", "creation_date"], name="journal_aidant_date_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="journal",
+            index=models.Index(
+                fields=["aidant", "action", "access_token"],
+                name="journal_aidant_token_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="journal",
+            index=models.Index(
+                fields=["action", "creation_date"], name="journal_action_date_idx"
+            ),
+        ),
+    ]
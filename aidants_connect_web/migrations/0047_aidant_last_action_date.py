@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_last_action_date(apps, _):
+    Aidant = apps.get_model("aidants_connect_web", "Aidant")
+    Journal = apps.get_model("aidants_connect_web", "Journal")
+
+    Aidant.objects.update(
+        last_action_date=Subquery(
+            Journal.objects.filter(aidant=OuterRef("pk"))
+            .order_by("-id")
+            .values("creation_date")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aidants_connect_web", "0046_hot_queries_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aidant",
+            name="last_action_date",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Date de la dernière action",
+            ),
+        ),
+        migrations.RunPython(fill_last_action_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aidants_connect_web", "0047_aidant_last_action_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatistiquesSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "creation_date",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Date de création",
+                    ),
+                ),
+                ("values", models.JSONField(default=dict)),
+            ],
+            options={
+                "verbose_name": "instantané des statistiques",
+                "verbose_name_plural": "instantanés des statistiques",
+            },
+        ),
+    ]
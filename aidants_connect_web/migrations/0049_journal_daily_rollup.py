@@ -0,0 +1,101 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aidants_connect_web", "0048_statistiques_snapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JournalDailyRollupCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_journal_id", models.BigIntegerField(default=0)),
+                ("update_date", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="JournalDailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="Jour")),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("connect_aidant", "Connexion d'un aidant"),
+                            (
+                                "activity_check_aidant",
+                                "Reprise de connexion d'un aidant",
+                            ),
+                            ("franceconnect_usager", "FranceConnexion d'un usager"),
+                            (
+                                "update_email_usager",
+                                "L'email de l'usager a été modifié",
+                            ),
+                            ("create_attestation", "Création d'une attestation"),
+                            ("create_autorisation", "Création d'une autorisation"),
+                            ("use_autorisation", "Utilisation d'une autorisation"),
+                            ("cancel_autorisation", "Révocation d'une autorisation"),
+                        ],
+                        max_length=30,
+                    ),
+                ),
+                ("demarche", models.CharField(blank=True, max_length=100)),
+                (
+                    "count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre d'entrées"
+                    ),
+                ),
+                (
+                    "organisation",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="journal_daily_rollups",
+                        to="aidants_connect_web.organisation",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "activité journalière",
+                "verbose_name_plural": "activités journalières",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="journaldailyrollup",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(organisation__isnull=False),
+                fields=("day", "organisation", "action", "demarche"),
+                name="unique_journal_daily_rollup",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="journaldailyrollup",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(organisation__isnull=True),
+                fields=("day", "action", "demarche"),
+                name="unique_journal_daily_rollup_without_organisation",
+            ),
+        ),
+    ]
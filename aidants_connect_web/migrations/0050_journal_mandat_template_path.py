@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aidants_connect_web", "0049_journal_daily_rollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="journal",
+            name="mandat_template_path",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,182 @@
+from datetime import timedelta
+import re
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+# The table is partitioned by day of expiration, as `connection_partitioning`
+# manages it afterwards. The SQL is kept here so that the migration does not
+# depend on the application code.
+# Declarative partitioning with default partitions, indexes and foreign keys on
+# the partitioned table requires PostgreSQL 11: on earlier versions, such as the
+# PostgreSQL 9.6 of the CI, this migration does nothing and the table stays a
+# plain table.
+MINIMUM_POSTGRESQL_VERSION = 110000
+
+INDEX_NAME_MAX_LENGTH = 63
+
+TABLE = "aidants_connect_web_connection"
+
+COLUMN = "expires_on"
+
+
+def supports_partitioning(connection):
+    return (
+        connection.vendor == "postgresql"
+        and connection.pg_version >= MINIMUM_POSTGRESQL_VERSION
+    )
+
+
+def get_index_definitions(cursor, table):
+    """
+    :return: the (name, definition) of the indexes of `table` that do not back
+    a constraint
+    """
+    cursor.execute(
+        "SELECT index.relname, pg_get_indexdef(pg_index.indexrelid) "
+        "FROM pg_index "
+        "JOIN pg_class index ON index.oid = pg_index.indexrelid "
+        "WHERE pg_index.indrelid = to_regclass(%s) "
+        "AND NOT EXISTS ("
+        "SELECT 1 FROM pg_constraint "
+        "WHERE pg_constraint.conindid = pg_index.indexrelid"
+        ") "
+        "ORDER BY index.relname",
+        [table],
+    )
+    return [
+        (name, definition.replace(" ON ONLY ", " ON "))
+        for name, definition in cursor.fetchall()
+    ]
+
+
+def rebuild_table(cursor, quote_name, partitioned):
+    """
+    Rename the table to `<table>_previous` and create the new table in its
+    place, with the same columns, sequence, indexes and foreign keys.
+    """
+    table = quote_name(TABLE)
+    previous_table = quote_name(f"{TABLE}_previous")
+
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLE])
+    sequence = cursor.fetchone()[0]
+    index_definitions = get_index_definitions(cursor, TABLE)
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [TABLE],
+    )
+    foreign_keys = cursor.fetchall()
+
+    for index_name, _ in index_definitions:
+        cursor.execute(f"DROP INDEX {quote_name(index_name)}")
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {previous_table}")
+    cursor.execute(
+        f"ALTER TABLE {previous_table} RENAME CONSTRAINT "
+        f"{quote_name(TABLE + '_pkey')} TO {quote_name(TABLE + '_previous_pkey')}"
+    )
+    cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+
+    if partitioned:
+        cursor.execute(
+            f"CREATE TABLE {table} (LIKE {previous_table} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({quote_name(COLUMN)})"
+        )
+        # A primary key of a partitioned table includes the partition key.
+        primary_key = f"id, {quote_name(COLUMN)}"
+    else:
+        cursor.execute(
+            f"CREATE TABLE {table} (LIKE {previous_table} INCLUDING DEFAULTS)"
+        )
+        primary_key = "id"
+    cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({primary_key})")
+    for _, index_definition in index_definitions:
+        cursor.execute(index_definition)
+    for constraint_name, constraint_definition in foreign_keys:
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {quote_name(constraint_name)} "
+            f"{constraint_definition}"
+        )
+
+
+def copy_rows(cursor, quote_name):
+    previous_table = quote_name(f"{TABLE}_previous")
+    cursor.execute(f"INSERT INTO {quote_name(TABLE)} SELECT * FROM {previous_table}")
+    cursor.execute(f"DROP TABLE {previous_table} CASCADE")
+
+
+def create_partition(cursor, quote_name, name, start=None, end=None):
+    """
+    Create the partition `name` for the rows from `start` to `end`, or the
+    default partition when they are None, with the indexes of the table under
+    the same names suffixed by the partition's.
+    """
+    table = quote_name(TABLE)
+    partition = quote_name(name)
+
+    cursor.execute(f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)")
+    suffix = name[len(TABLE) :]
+    for index_name, index_definition in get_index_definitions(cursor, TABLE):
+        partition_index_name = f"{index_name}{suffix}"
+        if len(partition_index_name) <= INDEX_NAME_MAX_LENGTH:
+            cursor.execute(
+                re.sub(
+                    r"^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?\S+ ",
+                    lambda match: (
+                        f"CREATE {match.group(1) or ''}INDEX "
+                        f"{quote_name(partition_index_name)} ON {partition} "
+                    ),
+                    index_definition,
+                )
+            )
+
+    if start is None:
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {partition} DEFAULT")
+        return
+    # Partition bounds must be plain literals before PostgreSQL 12.
+    cursor.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {partition} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        [start.isoformat(), end.isoformat()],
+    )
+
+
+def partition_connection_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if not supports_partitioning(connection):
+        return
+    quote_name = connection.ops.quote_name
+    until = timezone.now() + timedelta(days=settings.CONNECTION_PARTITIONS_DAYS_AHEAD)
+    with connection.cursor() as cursor:
+        rebuild_table(cursor, quote_name, partitioned=True)
+        create_partition(cursor, quote_name, f"{TABLE}_default")
+        start = timezone.now().astimezone(timezone.utc)
+        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        while start <= until:
+            end = start + timedelta(days=1)
+            create_partition(cursor, quote_name, f"{TABLE}_p{start:%Y%m%d}", start, end)
+            start = end
+        copy_rows(cursor, quote_name)
+
+
+def unpartition_connection_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if not supports_partitioning(connection):
+        return
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        rebuild_table(cursor, quote_name, partitioned=False)
+        copy_rows(cursor, quote_name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aidants_connect_web", "0050_journal_mandat_template_path"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_connection_table, unpartition_connection_table),
+    ]
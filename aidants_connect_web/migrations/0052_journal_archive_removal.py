@@ -0,0 +1,57 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aidants_connect_web", "0051_partition_connection"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JournalArchiveRemoval",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField(verbose_name="Mois")),
+                (
+                    "entry_count",
+                    models.PositiveIntegerField(verbose_name="Nombre d'entrées"),
+                ),
+                (
+                    "last_entry_id",
+                    models.BigIntegerField(verbose_name="Dernière entrée"),
+                ),
+                (
+                    "archive_name",
+                    models.CharField(max_length=255, verbose_name="Archive"),
+                ),
+                (
+                    "archive_sha256",
+                    models.CharField(
+                        max_length=64, verbose_name="Empreinte SHA-256 de l'archive"
+                    ),
+                ),
+                ("removed_by", models.CharField(max_length=255, verbose_name="Auteur")),
+                (
+                    "removal_date",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Date de suppression",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "suppression d'entrées de journal archivées",
+                "verbose_name_plural": "suppressions d'entrées de journal archivées",
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+import logging
+
+from django.db import DatabaseError, migrations, transaction
+
+logger = logging.getLogger()
+
+# The SQL is kept here so that the migration does not depend on the
+# application code: `aidants_connect_web.search` queries this index.
+SEARCH_EXTENSIONS = ("pg_trgm", "unaccent")
+
+UNACCENT_FUNCTION = "aidants_connect_unaccent"
+
+NAME_SEARCH_INDEX = "usager_name_search_idx"
+
+
+def search_extensions_available(connection):
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_available_extensions WHERE name = ANY(%s)",
+            [list(SEARCH_EXTENSIONS)],
+        )
+        return cursor.fetchone()[0] == len(SEARCH_EXTENSIONS)
+
+
+def create_index(apps, schema_editor):
+    # The index is only created where the extensions are available and the
+    # database user is allowed to create them.
+    connection = schema_editor.connection
+    if not search_extensions_available(connection):
+        logger.warning(
+            f"The {' and '.join(SEARCH_EXTENSIONS)} extensions are not available, "
+            f"the usagers are searched without index."
+        )
+        return
+
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            for extension in SEARCH_EXTENSIONS:
+                cursor.execute(f"CREATE EXTENSION IF NOT EXISTS {extension}")
+            cursor.execute(
+                "SELECT extname, extnamespace::regnamespace::text FROM pg_extension "
+                "WHERE extname = ANY(%s)",
+                [list(SEARCH_EXTENSIONS)],
+            )
+            schemas = dict(cursor.fetchall())
+            # `unaccent` is only STABLE, its dictionary may change, when an index
+            # expression has to be IMMUTABLE.
+            cursor.execute(
+                f"CREATE OR REPLACE FUNCTION {UNACCENT_FUNCTION}(text) RETURNS text "
+                f"AS $$ SELECT {schemas['unaccent']}.unaccent("
+                f"'{schemas['unaccent']}.unaccent'::regdictionary, $1"
+                f") $$ LANGUAGE sql IMMUTABLE STRICT"
+            )
+            name = f"{UNACCENT_FUNCTION}(lower(given_name || ' ' || family_name))"
+            cursor.execute(
+                f"CREATE INDEX {NAME_SEARCH_INDEX} ON aidants_connect_web_usager "
+                f"USING gin ({name} {schemas['pg_trgm']}.gin_trgm_ops)"
+            )
+    except DatabaseError as e:
+        logger.warning(f"The usagers name search index could not be created: {e}")
+
+
+def drop_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX IF EXISTS {NAME_SEARCH_INDEX}")
+        cursor.execute(f"DROP FUNCTION IF EXISTS {UNACCENT_FUNCTION}(text)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aidants_connect_web", "0052_journal_archive_removal"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations, models
+
+
+def fill_autorisation_ids(apps, _):
+    Autorisation = apps.get_model("aidants_connect_web", "Autorisation")
+    AutorisationIndex = apps.get_model("aidants_connect_web", "AutorisationIndex")
+
+    # For each démarche, the unrevoked autorisation with the latest expiration
+    # date, as `AutorisationIndex.objects.refresh` picks it.
+    latest_autorisations = {}
+    unrevoked_autorisations = (
+        Autorisation.objects.filter(revocation_date__isnull=True, mandat__isnull=False)
+        .values_list(
+            "id",
+            "mandat__organisation_id",
+            "mandat__usager_id",
+            "demarche",
+            "mandat__expiration_date",
+        )
+        .order_by("mandat__expiration_date", "id")
+    )
+    for (
+        autorisation_id,
+        organisation_id,
+        usager_id,
+        demarche,
+        _,
+    ) in unrevoked_autorisations.iterator():
+        latest_autorisations.setdefault((organisation_id, usager_id), {})[
+            demarche
+        ] = autorisation_id
+
+    for entry in AutorisationIndex.objects.iterator():
+        entry.autorisation_ids = latest_autorisations.get(
+            (entry.organisation_id, entry.usager_id), {}
+        )
+        entry.save(update_fields=["autorisation_ids"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aidants_connect_web", "0053_usager_name_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="autorisationindex",
+            name="autorisation_ids",
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(fill_autorisation_ids, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,33 @@
 from datetime import timedelta
 
 from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import (
+    Count,
+    Exists,
+    ExpressionWrapper,
+    F,
+    Func,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, Coalesce, TruncDate
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.functional import cached_property
 
+from aidants_connect_web.partitioning import journal_partitioning
+from aidants_connect_web.search import name_search_is_indexed, SearchName, SearchTerm
+from aidants_connect_web.utilities import generate_token_digest
+
 
 class Organisation(models.Model):
     name = models.TextField("Nom", default="No name provided")
@@ -46,6 +66,10 @@ class Aidant(AbstractUser):
     organisation = models.ForeignKey(
         Organisation, null=True, on_delete=models.CASCADE, related_name="aidants"
     )
+    # Denormalised from the Journal, kept up to date by `Journal.save`
+    last_action_date = models.DateTimeField(
+        "Date de la dernière action", null=True, blank=True, editable=False
+    )
 
     objects = AidantManager()
 
@@ -65,23 +89,23 @@ class Aidant(AbstractUser):
         :return: Autorisation object if this aidant may perform the specified `demarche`
         for the specified `usager`, `None` otherwise.`
         """
-        try:
-            return (
-                Autorisation.objects.active()
-                .for_demarche(demarche)
-                .for_usager(usager)
-                .visible_by(self)
-                .get()
+        # The index row gives the autorisation, found by its primary key.
+        return (
+            Autorisation.objects.active()
+            .filter(
+                pk=AutorisationIndex.objects.get_autorisation_id(
+                    self.organisation, usager, demarche
+                )
             )
-        except Autorisation.DoesNotExist:
-            return None
+            .first()
+        )
 
     def get_usagers(self):
         """
         :return: a queryset of usagers who have at least one autorisation
         (active or expired) with the aidant's organisation.
         """
-        return Usager.objects.visible_by(self).distinct()
+        return Usager.objects.visible_by(self)
 
     def get_usager(self, usager_id):
         """
@@ -98,7 +122,11 @@ class Aidant(AbstractUser):
         :return: a queryset of usagers who have an active autorisation
         with the aidant's organisation.
         """
-        return self.get_usagers().active()
+        return Usager.objects.filter(
+            autorisation_index__in=AutorisationIndex.objects.active().filter(
+                organisation=self.organisation
+            )
+        )
 
     def get_autorisations(self):
         """
@@ -145,18 +173,16 @@ class Aidant(AbstractUser):
         :return: a list of demarches the usager has active autorisations for
         in this aidant's organisation.
         """
-        return self.get_active_autorisations_for_usager(usager).values_list(
-            "demarche", flat=True
+        autorisation_index = AutorisationIndex.objects.get_for(
+            self.organisation, usager
         )
+        return autorisation_index.get_active_demarches() if autorisation_index else []
 
     def get_last_action_timestamp(self):
         """
         :return: the timestamp of this aidant's last logged action or `None`.
         """
-        try:
-            return Journal.objects.filter(aidant=self).last().creation_date
-        except AttributeError:
-            return None
+        return self.last_action_date
 
     def get_journal_create_attestation(self, access_token):
         """
@@ -169,9 +195,30 @@ class Aidant(AbstractUser):
         return journal_create_attestation
 
 
+class RowValue(Func):
+    function = "ROW"
+
+
+class RowGreaterThan(Func):
+    """
+    `ROW(...) > ROW(...)`, which PostgreSQL serves from a btree index on the
+    leading columns where the equivalent OR of comparisons is not.
+    """
+
+    template = "%(expressions)s"
+    arg_joiner = " > "
+    output_field = models.BooleanField()
+
+
 class UsagerQuerySet(models.QuerySet):
     def active(self):
-        return self.filter(mandats__expiration_date__gt=timezone.now()).distinct()
+        return self.filter(
+            Exists(
+                Mandat.objects.filter(
+                    usager=OuterRef("pk"), expiration_date__gt=timezone.now()
+                )
+            )
+        )
 
     def visible_by(self, aidant):
         """
@@ -179,7 +226,50 @@ class UsagerQuerySet(models.QuerySet):
         :return: a new QuerySet instance only filtering in the usagers who have
         an autorisation with this aidant's organisation.
         """
-        return self.filter(mandats__organisation=aidant.organisation).distinct()
+        return self.filter(
+            Exists(
+                Mandat.objects.filter(
+                    usager=OuterRef("pk"), organisation=aidant.organisation
+                )
+            )
+        )
+
+    def ordered_after(self, key: tuple = None):
+        """
+        :param key: the (family_name, given_name, id) of an usager
+        :return: the usagers in alphabetical order, following `key` if given,
+        so that they can be paged through `usager_name_idx` without OFFSET.
+        """
+        usagers = self.order_by("family_name", "given_name", "id")
+        if key is None:
+            return usagers
+        return usagers.filter(
+            RowGreaterThan(
+                RowValue("family_name", "given_name", "id"), RowValue(*map(Value, key)),
+            )
+        )
+
+    def search(self, terms: str):
+        """
+        :return: the usagers whose full name contains each word of `terms`,
+        ignoring case, and accents where `usager_name_search_idx` exists.
+        `%`, `_` and `\\` in `terms` are matched literally: `contains` and
+        `icontains` escape them, in a value as in an expression such as
+        `SearchTerm`, so they must not be escaped here as well.
+        """
+        usagers = self
+        if name_search_is_indexed():
+            usagers = usagers.annotate(
+                search_name=SearchName("given_name", "family_name")
+            )
+            for word in terms.split():
+                usagers = usagers.filter(search_name__contains=SearchTerm(Value(word)))
+        else:
+            for word in terms.split():
+                usagers = usagers.filter(
+                    Q(given_name__icontains=word) | Q(family_name__icontains=word)
+                )
+        return usagers
 
 
 class Usager(models.Model):
@@ -217,6 +307,9 @@ class Usager(models.Model):
 
     class Meta:
         ordering = ["family_name", "given_name"]
+        indexes = [
+            models.Index(fields=["family_name", "given_name"], name="usager_name_idx")
+        ]
 
     def __str__(self):
         return f"{self.given_name} {self.family_name}"
@@ -271,18 +364,69 @@ def get_staff_organisation_name_id() -> int:
 
 
 class MandatQuerySet(models.QuerySet):
-    def active(self):
-        return (
-            self.exclude(expiration_date__lt=timezone.now())
-            .filter(autorisations__revocation_date__isnull=True)
-            .distinct()
+    @staticmethod
+    def _has_autorisation(**filters):
+        return Exists(Autorisation.objects.filter(mandat=OuterRef("pk"), **filters))
+
+    @classmethod
+    def active_condition(cls) -> Q:
+        """
+        :return: the condition of `active()`, for use in conditional aggregations.
+        """
+        # A mandat without any autorisation is considered active.
+        return Q(expiration_date__gte=timezone.now()) & (
+            cls._has_autorisation(revocation_date__isnull=True)
+            | ~cls._has_autorisation()
         )
 
+    def active(self):
+        return self.filter(self.active_condition())
+
     def inactive(self):
         return self.filter(
             Q(expiration_date__lt=timezone.now())
-            | ~Q(autorisations__revocation_date__isnull=True)
-        ).distinct()
+            | (
+                self._has_autorisation()
+                & ~self._has_autorisation(revocation_date__isnull=True)
+            )
+        )
+
+    def with_is_active(self):
+        """
+        Annotate `is_active`, which then no longer takes a query per mandat.
+        """
+        return self.annotate(
+            is_active=ExpressionWrapper(
+                self._has_autorisation(revocation_date__isnull=True)
+                & Q(expiration_date__gte=timezone.now()),
+                output_field=models.BooleanField(),
+            )
+        )
+
+    def split_by_activity(self, now=None) -> tuple:
+        """
+        Fetch the mandats with their autorisations in two queries, and sort
+        them as `active()` and `inactive()` would, against a single `now`.
+        Each mandat gets its `autorisation_count`.
+        :return: the lists of active and inactive mandats
+        """
+        now = now or timezone.now()
+        active_mandats, inactive_mandats = [], []
+        for mandat in self.prefetch_related("autorisations"):
+            autorisations = mandat.autorisations.all()
+            mandat.autorisation_count = len(autorisations)
+            # A mandat without any autorisation is considered active.
+            if mandat.expiration_date >= now and (
+                not autorisations
+                or any(
+                    autorisation.revocation_date is None
+                    for autorisation in autorisations
+                )
+            ):
+                active_mandats.append(mandat)
+            else:
+                inactive_mandats.append(mandat)
+        return active_mandats, inactive_mandats
 
 
 class Mandat(models.Model):
@@ -302,9 +446,33 @@ class Mandat(models.Model):
 
     objects = MandatQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["organisation", "usager", "expiration_date"],
+                name="mandat_orga_usager_exp_idx",
+            )
+        ]
+
     def __str__(self):
         return f"#{self.id}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        mandat = super().from_db(db, field_names, values)
+        # The `AutorisationIndex` pair as loaded, to refresh it as well when the
+        # mandat is moved to another organisation or usager.
+        loaded_values = dict(zip(field_names, values))
+        mandat.loaded_index_pair = (
+            loaded_values.get("organisation_id"),
+            loaded_values.get("usager_id"),
+        )
+        return mandat
+
+    @property
+    def index_pair(self) -> tuple:
+        return self.organisation_id, self.usager_id
+
     @property
     def is_expired(self) -> bool:
         return timezone.now() > self.expiration_date
@@ -376,6 +544,15 @@ class Autorisation(models.Model):
 
     objects = AutorisationQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["mandat", "demarche"],
+                name="autorisation_unrevoked_idx",
+                condition=Q(revocation_date__isnull=True),
+            )
+        ]
+
     def __str__(self):
         return f"#{self.id}"
 
@@ -415,10 +592,150 @@ class Autorisation(models.Model):
         Journal.log_autorisation_cancel(self, aidant)
 
 
+class AutorisationIndexQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(expiration_date__gte=timezone.now())
+
+    def expired(self):
+        return self.filter(expiration_date__lt=timezone.now())
+
+    def get_for(self, organisation, usager):
+        """
+        :return: the entry of this organisation for this usager, or `None` if the
+        usager has no active autorisation with the organisation.
+        """
+        try:
+            return self.active().get(organisation=organisation, usager=usager)
+        except AutorisationIndex.DoesNotExist:
+            return None
+
+    def get_autorisation_id(self, organisation, usager, demarche):
+        """
+        :return: an expression of the id of the indexed autorisation of this
+        organisation for this usager and this démarche, for `filter(pk=...)`
+        """
+        return Subquery(
+            self.filter(organisation=organisation, usager=usager).values(
+                autorisation_id=Cast(
+                    KeyTextTransform(demarche, "autorisation_ids"),
+                    models.IntegerField(),
+                )
+            )
+        )
+
+    def refresh(self, organisation_id, usager_id):
+        """
+        Recompute the entry of an (organisation, usager) pair from the autorisations.
+        Must be called whenever an autorisation or a mandat of the pair is written.
+        :return: the new entry, or `None` if the pair has no unrevoked autorisation.
+        """
+        unrevoked_autorisations = Autorisation.objects.filter(
+            mandat__organisation_id=organisation_id,
+            mandat__usager_id=usager_id,
+            revocation_date__isnull=True,
+        ).values_list("id", "demarche", "mandat__expiration_date")
+
+        expiration_dates = {}
+        autorisation_ids = {}
+        for autorisation_id, demarche, expiration_date in unrevoked_autorisations:
+            if expiration_date >= expiration_dates.get(demarche, expiration_date):
+                expiration_dates[demarche] = expiration_date
+                autorisation_ids[demarche] = autorisation_id
+
+        if not expiration_dates:
+            self.filter(organisation_id=organisation_id, usager_id=usager_id).delete()
+            return None
+
+        autorisation_index, _ = self.update_or_create(
+            organisation_id=organisation_id,
+            usager_id=usager_id,
+            defaults={
+                "demarches": {
+                    demarche: expiration_date.isoformat()
+                    for demarche, expiration_date in expiration_dates.items()
+                },
+                "autorisation_ids": autorisation_ids,
+                "expiration_date": max(expiration_dates.values()),
+            },
+        )
+        return autorisation_index
+
+
+class AutorisationIndex(models.Model):
+    """
+    Denormalised view of the unrevoked autorisations an organisation holds for
+    an usager, so that permission checks are a single indexed lookup instead of
+    a join over mandats and autorisations.
+    `demarches` maps each démarche to the latest expiration date of its unrevoked
+    autorisations, `autorisation_ids` to the id of the autorisation with this
+    date, and `expiration_date` is the latest of these dates: past it, the entry
+    is ignored, until `check_autorisation_index --fix` prunes it.
+    """
+
+    organisation = models.ForeignKey(
+        Organisation, on_delete=models.CASCADE, related_name="autorisation_index"
+    )
+    usager = models.ForeignKey(
+        Usager, on_delete=models.CASCADE, related_name="autorisation_index"
+    )
+    demarches = models.JSONField(default=dict)
+    autorisation_ids = models.JSONField(default=dict)
+    expiration_date = models.DateTimeField("Date d'expiration")
+
+    objects = AutorisationIndexQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "index des autorisations actives"
+        verbose_name_plural = "index des autorisations actives"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["organisation", "usager"],
+                name="unique_autorisation_index_per_organisation_usager",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.organisation} - {self.usager}"
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expiration_date < timezone.now()
+
+    def get_active_demarches(self) -> list:
+        now = timezone.now()
+        return sorted(
+            demarche
+            for demarche, expiration_date in self.demarches.items()
+            if parse_datetime(expiration_date) >= now
+        )
+
+
 class ConnectionQuerySet(models.QuerySet):
     def expired(self):
         return self.filter(expires_on__lt=timezone.now())
 
+    def get_by_code(self, code):
+        return self._get_by_token("code", code)
+
+    def get_by_access_token(self, access_token):
+        return self._get_by_token("access_token", access_token)
+
+    def _get_by_token(self, field_name, token):
+        """
+        :return: the connection whose `field_name` holds the digest of `token`.
+        Connections created before the switch to `generate_token_digest` are
+        still found through their `make_password` hash while
+        `FC_AS_FI_LEGACY_TOKEN_LOOKUP` is on.
+        :raise: Connection.DoesNotExist
+        """
+        try:
+            return self.get(**{field_name: generate_token_digest(token)})
+        except self.model.DoesNotExist:
+            if not settings.FC_AS_FI_LEGACY_TOKEN_LOOKUP:
+                raise
+            legacy_hash = make_password(token, settings.FC_AS_FI_HASH_SALT)
+            return self.get(**{field_name: legacy_hash})
+
 
 def default_connection_expiration_date():
     now = timezone.now()
@@ -469,6 +786,11 @@ class Connection(models.Model):
 
     class Meta:
         verbose_name = "connexion"
+        indexes = [
+            models.Index(fields=["state"], name="connection_state_idx"),
+            models.Index(fields=["code"], name="connection_code_idx"),
+            models.Index(fields=["access_token"], name="connection_access_token_idx"),
+        ]
 
     def __str__(self):
         return f"Connexion #{self.id} - {self.usager}"
@@ -482,6 +804,20 @@ class JournalQuerySet(models.QuerySet):
     def excluding_staff(self):
         return self.exclude(aidant__organisation__name=settings.STAFF_ORGANISATION_NAME)
 
+    # On a partitioned journal, PostgreSQL only scans the monthly partitions
+    # matching bounds on `creation_date` given as values, not expressions.
+    def created_between(self, start, end):
+        return self.filter(creation_date__gte=start, creation_date__lt=end)
+
+    def created_since(self, moment):
+        return self.filter(creation_date__gte=moment)
+
+    def created_in_month(self, moment):
+        """
+        :return: the entries of the calendar month (UTC) of `moment`
+        """
+        return self.created_between(*journal_partitioning.get_bounds(moment))
+
 
 class Journal(models.Model):
     ACTIONS = (
@@ -515,6 +851,7 @@ class Journal(models.Model):
     access_token = models.TextField(blank=True, null=True)
     autorisation = models.IntegerField(blank=True, null=True)
     attestation_hash = models.CharField(max_length=100, blank=True, null=True)
+    mandat_template_path = models.CharField(max_length=255, blank=True, null=True)
     additional_information = models.TextField(blank=True, null=True)
     is_remote_mandat = models.BooleanField(default=False)
 
@@ -523,6 +860,18 @@ class Journal(models.Model):
     class Meta:
         verbose_name = "entrée de journal"
         verbose_name_plural = "entrées de journal"
+        indexes = [
+            models.Index(
+                fields=["aidant", "creation_date"], name="journal_aidant_date_idx"
+            ),
+            models.Index(
+                fields=["aidant", "action", "access_token"],
+                name="journal_aidant_token_idx",
+            ),
+            models.Index(
+                fields=["action", "creation_date"], name="journal_action_date_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Entrée #{self.id} : {self.action} - {self.aidant}"
@@ -531,10 +880,39 @@ class Journal(models.Model):
         if self.id:
             raise NotImplementedError("Editing is not allowed on journal entries")
         super(Journal, self).save(*args, **kwargs)
+        self.update_aidant_last_action_date(self.aidant_id, self.creation_date)
+        if Journal.aidant.is_cached(self) and self.aidant:
+            previous_date = self.aidant.last_action_date
+            if previous_date is None or previous_date < self.creation_date:
+                self.aidant.last_action_date = self.creation_date
+
+    @staticmethod
+    def update_aidant_last_action_date(aidant_id, last_action_date):
+        """
+        Move the `last_action_date` of the aidant forward, leaving it as is
+        when it is already later. Entries without an aidant update nothing.
+        """
+        if aidant_id:
+            Aidant.objects.filter(
+                Q(last_action_date__lt=last_action_date)
+                | Q(last_action_date__isnull=True),
+                pk=aidant_id,
+            ).update(last_action_date=last_action_date)
 
     def delete(self, *args, **kwargs):
         raise NotImplementedError("Deleting is not allowed on journal entries")
 
+    @classmethod
+    def _log(cls, commit: bool, **fields):
+        """
+        :return: the new journal entry, unsaved if `commit` is False so that
+        it can be saved along with others by `bulk_create`.
+        """
+        journal_entry = cls(**fields)
+        if commit:
+            journal_entry.save()
+        return journal_entry
+
     @classmethod
     def log_connection(cls, aidant: Aidant):
         return cls.objects.create(aidant=aidant, action="connect_aidant")
@@ -565,11 +943,15 @@ class Journal(models.Model):
         is_remote_mandat: bool,
         access_token: str,
         attestation_hash: str,
+        mandat_template_path: str = None,
+        commit: bool = True,
     ):
-        return cls.objects.create(
+        return cls._log(
+            commit,
             aidant=aidant,
             usager=usager,
             action="create_attestation",
+            mandat_template_path=mandat_template_path,
             demarche=",".join(demarches),
             duree=duree,
             access_token=access_token,
@@ -578,11 +960,14 @@ class Journal(models.Model):
         )
 
     @classmethod
-    def log_autorisation_creation(cls, autorisation: Autorisation, aidant: Aidant):
+    def log_autorisation_creation(
+        cls, autorisation: Autorisation, aidant: Aidant, commit: bool = True
+    ):
         mandat = autorisation.mandat
         usager = mandat.usager
 
-        return cls.objects.create(
+        return cls._log(
+            commit,
             aidant=aidant,
             usager=usager,
             action="create_autorisation",
@@ -611,8 +996,11 @@ class Journal(models.Model):
         )
 
     @classmethod
-    def log_autorisation_cancel(cls, autorisation: Autorisation, aidant: Aidant):
-        return cls.objects.create(
+    def log_autorisation_cancel(
+        cls, autorisation: Autorisation, aidant: Aidant, commit: bool = True
+    ):
+        return cls._log(
+            commit,
             aidant=aidant,
             usager=autorisation.mandat.usager,
             action="cancel_autorisation",
@@ -620,3 +1008,202 @@ class Journal(models.Model):
             duree=autorisation.duration_for_humans,
             autorisation=autorisation.id,
         )
+
+
+class StatistiquesSnapshotQuerySet(models.QuerySet):
+    def get_latest(self):
+        """
+        :return: the most recent snapshot, or `None` if none was taken yet.
+        """
+        return self.order_by("-creation_date").first()
+
+    def delete_older(self, kept_count: int) -> int:
+        """
+        Delete the snapshots but the `kept_count` most recent ones.
+        :return: the number of deleted snapshots
+        """
+        kept_ids = self.order_by("-creation_date", "-id").values("id")[:kept_count]
+        deleted_count, _ = self.exclude(id__in=kept_ids).delete()
+        return deleted_count
+
+
+class StatistiquesSnapshot(models.Model):
+    """
+    Precomputed values of the public statistics page, refreshed periodically
+    so that serving the page does not run any aggregate query.
+    """
+
+    creation_date = models.DateTimeField("Date de création", default=timezone.now)
+    values = models.JSONField(default=dict)
+
+    objects = StatistiquesSnapshotQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "instantané des statistiques"
+        verbose_name_plural = "instantanés des statistiques"
+
+    def __str__(self):
+        return f"Statistiques du {self.creation_date:%d/%m/%Y %H:%M}"
+
+
+class JournalDailyRollupQuerySet(models.QuerySet):
+    def excluding_staff(self):
+        return self.exclude(organisation__name=settings.STAFF_ORGANISATION_NAME)
+
+    def for_period(self, first_day, last_day):
+        return self.filter(day__gte=first_day, day__lte=last_day)
+
+    def total(self) -> int:
+        return self.aggregate(total=Coalesce(Sum("count"), 0))["total"]
+
+    def per_day(self):
+        return self._totals_by("day")
+
+    def per_organisation(self):
+        return self._totals_by("organisation")
+
+    def per_action(self):
+        return self._totals_by("action")
+
+    def per_demarche(self):
+        return self._totals_by("demarche")
+
+    def _totals_by(self, *fields):
+        return self.order_by(*fields).values(*fields).annotate(total=Sum("count"))
+
+    def roll_up(self, chunk_size: int = 10000, lag: timedelta = timedelta(minutes=5)):
+        """
+        Count the journal entries written since the last run into the rollup,
+        `chunk_size` entries at a time, each chunk in its own transaction.
+        The entries of the last `lag` are left to the next run, so that an entry
+        whose transaction is still open when its successors are counted is not
+        skipped.
+        :return: the number of journal entries rolled up.
+        """
+        checkpoints = JournalDailyRollupCheckpoint.objects
+        checkpoint, _ = checkpoints.get_or_create(pk=1)
+        last_journal_id = Journal.objects.filter(
+            id__gt=checkpoint.last_journal_id, creation_date__lt=timezone.now() - lag,
+        ).aggregate(Max("id"))["id__max"]
+
+        rolled_up_count = 0
+        while last_journal_id:
+            with transaction.atomic():
+                checkpoint = checkpoints.select_for_update().get(pk=checkpoint.pk)
+                if checkpoint.last_journal_id >= last_journal_id:
+                    break
+
+                chunk_last_journal_id = min(
+                    last_journal_id, checkpoint.last_journal_id + chunk_size
+                )
+                chunk_entries = Journal.objects.filter(
+                    id__gt=checkpoint.last_journal_id, id__lte=chunk_last_journal_id
+                )
+                rolled_up_count += self._add_to_rollup(chunk_entries)
+
+                checkpoint.last_journal_id = chunk_last_journal_id
+                checkpoint.save(update_fields=["last_journal_id", "update_date"])
+
+        return rolled_up_count
+
+    def _add_to_rollup(self, journal_entries) -> int:
+        counts = (
+            journal_entries.order_by()
+            .values(
+                "action",
+                day=TruncDate("creation_date"),
+                # The aidant's organisation now, not when the entry was written
+                organisation_id=F("aidant__organisation_id"),
+                rollup_demarche=Coalesce("demarche", Value("")),
+            )
+            .annotate(count=Count("pk"))
+        )
+
+        rolled_up_count = 0
+        for count in counts:
+            lookup = {
+                "day": count["day"],
+                "organisation_id": count["organisation_id"],
+                "action": count["action"],
+                "demarche": count["rollup_demarche"],
+            }
+            if not self.filter(**lookup).update(count=F("count") + count["count"]):
+                self.create(count=count["count"], **lookup)
+            rolled_up_count += count["count"]
+
+        return rolled_up_count
+
+
+class JournalDailyRollup(models.Model):
+    """
+    Number of journal entries per day, organisation, action and démarche,
+    filled incrementally by `roll_up()` so that historical statistics do not
+    have to scan the journal.
+    The journal does not record the organisation of the aidant, the entries
+    are counted for the organisation the aidant is in when they are rolled up:
+    entries written before an aidant changed organisation, and not rolled up
+    yet, are counted for the new one.
+    """
+
+    day = models.DateField("Jour")
+    organisation = models.ForeignKey(
+        Organisation,
+        null=True,
+        on_delete=models.PROTECT,
+        related_name="journal_daily_rollups",
+    )
+    action = models.CharField(max_length=30, choices=Journal.ACTIONS)
+    demarche = models.CharField(max_length=100, blank=True)
+    count = models.PositiveIntegerField("Nombre d'entrées", default=0)
+
+    objects = JournalDailyRollupQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "activité journalière"
+        verbose_name_plural = "activités journalières"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "organisation", "action", "demarche"],
+                condition=Q(organisation__isnull=False),
+                name="unique_journal_daily_rollup",
+            ),
+            models.UniqueConstraint(
+                fields=["day", "action", "demarche"],
+                condition=Q(organisation__isnull=True),
+                name="unique_journal_daily_rollup_without_organisation",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.organisation} - {self.action} - {self.demarche}"
+
+
+class JournalDailyRollupCheckpoint(models.Model):
+    """
+    Id of the last journal entry counted in the daily rollup.
+    """
+
+    last_journal_id = models.BigIntegerField(default=0)
+    update_date = models.DateTimeField(auto_now=True)
+
+
+class JournalArchiveRemoval(models.Model):
+    """
+    Removal from the journal of the entries of a month, once checked against
+    its archive file, whose checksum is kept to prove it unaltered later.
+    """
+
+    month = models.DateField("Mois")
+    entry_count = models.PositiveIntegerField("Nombre d'entrées")
+    last_entry_id = models.BigIntegerField("Dernière entrée")
+    archive_name = models.CharField("Archive", max_length=255)
+    archive_sha256 = models.CharField("Empreinte SHA-256 de l'archive", max_length=64)
+    removed_by = models.CharField("Auteur", max_length=255)
+    removal_date = models.DateTimeField("Date de suppression", default=timezone.now)
+
+    class Meta:
+        verbose_name = "suppression d'entrées de journal archivées"
+        verbose_name_plural = "suppressions d'entrées de journal archivées"
+
+    def __str__(self):
+        return f"Journal de {self.month:%m/%Y} archivé dans {self.archive_name}"
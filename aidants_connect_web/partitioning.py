@@ -0,0 +1,543 @@
+from datetime import datetime, timedelta
+import hashlib
+import re
+import time
+
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+
+# Declarative partitioning with default partitions, indexes and foreign keys on
+# the partitioned table
+MINIMUM_POSTGRESQL_VERSION = 110000
+
+INDEX_NAME_MAX_LENGTH = 63
+
+
+class PartitioningError(Exception):
+    pass
+
+
+def supports_partitioning(connection=db_connection) -> bool:
+    return (
+        connection.vendor == "postgresql"
+        and connection.pg_version >= MINIMUM_POSTGRESQL_VERSION
+    )
+
+
+class RangePartitioning:
+    """
+    A table range-partitioned on a timestamp `column`, with one partition per
+    day or per month named `<table>_p<YYYYMMDD>` or `<table>_p<YYYYMM>`, and a
+    `<table>_default` partition holding the rows outside of them.
+    Partitions are created empty and attached, moving the matching rows out of
+    the default partition, so that they can later be dropped in one statement.
+    The partitions get the indexes of the partitioned table, under the same
+    names suffixed by the partition's when they fit in 63 characters.
+    """
+
+    PERIOD_FORMATS = {"day": "%Y%m%d", "month": "%Y%m"}
+
+    def __init__(self, table: str, column: str, period: str = "day"):
+        if period not in self.PERIOD_FORMATS:
+            raise ValueError(f"Unknown partition period: {period}")
+        self.table = table
+        self.column = column
+        self.period = period
+
+    @property
+    def default_partition(self) -> str:
+        return f"{self.table}_default"
+
+    def get_bounds(self, moment: datetime) -> tuple:
+        """
+        :return: the start and end (excluded) of the partition holding `moment`
+        """
+        start = moment.astimezone(timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        if self.period == "day":
+            return start, start + timedelta(days=1)
+        start = start.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1)
+
+    def get_partition_name(self, start: datetime) -> str:
+        return f"{self.table}_p{start:{self.PERIOD_FORMATS[self.period]}}"
+
+    def is_partitioned(self) -> bool:
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+                [self.table],
+            )
+            row = cursor.fetchone()
+        return row is not None and row[0] == "p"
+
+    def list_partitions(self) -> list:
+        """
+        :return: the (name, start) of the periodic partitions, oldest first
+        """
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = to_regclass(%s)",
+                [self.table],
+            )
+            names = [name for (name,) in cursor.fetchall()]
+
+        pattern = re.compile(rf"^{re.escape(self.table)}_p(\d+)$")
+        partitions = []
+        for name in names:
+            match = pattern.match(name)
+            if match:
+                start = datetime.strptime(
+                    match.group(1), self.PERIOD_FORMATS[self.period]
+                ).replace(tzinfo=timezone.utc)
+                partitions.append((name, start))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    def create_partitions(self, until: datetime, since: datetime = None) -> list:
+        """
+        Create the missing partitions from the one holding `since` (now by
+        default) to the one holding `until`.
+        :return: the names of the created partitions
+        """
+        existing_names = {name for name, _ in self.list_partitions()}
+        created_names = []
+        start, end = self.get_bounds(since or timezone.now())
+        while start <= until:
+            name = self.get_partition_name(start)
+            if name not in existing_names:
+                with transaction.atomic(), db_connection.cursor() as cursor:
+                    self._create_partition(cursor, name, start, end)
+                created_names.append(name)
+            start, end = self.get_bounds(end)
+        return created_names
+
+    def drop_partitions(self, before: datetime) -> list:
+        """
+        Drop the partitions whose rows all have their `column` before `before`.
+        :return: the names of the dropped partitions
+        """
+        dropped_names = []
+        quote_name = db_connection.ops.quote_name
+        for name, start in self.list_partitions():
+            _, end = self.get_bounds(start)
+            if end > before:
+                break
+            with db_connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE {quote_name(name)}")
+            dropped_names.append(name)
+        return dropped_names
+
+    def partition_table(self, until: datetime, cursor):
+        """
+        Replace the table by a partitioned table holding the same rows, with its
+        default partition and the periodic partitions up to `until`.
+        The table is locked until the end of the transaction.
+        """
+        self._rebuild_table(cursor, partitioned=True)
+        self._create_partition(cursor, self.default_partition)
+        start, end = self.get_bounds(timezone.now())
+        while start <= until:
+            self._create_partition(cursor, self.get_partition_name(start), start, end)
+            start, end = self.get_bounds(end)
+        self._copy_rows(cursor)
+
+    def unpartition_table(self, cursor):
+        """
+        Replace the partitioned table by a plain table holding the same rows.
+        """
+        self._rebuild_table(cursor, partitioned=False)
+        self._copy_rows(cursor)
+
+    def partition_table_online(
+        self, until: datetime, chunk_size: int = 10000, log=None
+    ) -> int:
+        """
+        Replace an append-only table by a partitioned table holding the same
+        rows without blocking it for the time of the copy: the rows are copied
+        by chunks of `chunk_size` ids into `<table>_partitioned`, each chunk in
+        its own transaction and checked against the table there. Each round of
+        chunks only copies the rows whose id was taken before the transactions
+        running at its start ended, so that no row is committed behind a chunk.
+        Then, with the writes blocked, only the rows written since the start
+        of the last round are copied and checked, and the tables swapped.
+        When interrupted, it resumes from the last copied chunk.
+        :param log: called with a message after each chunk
+        :return: the number of copied rows
+        :raise: PartitioningError when a copied range does not match the table
+        """
+        quote_name = db_connection.ops.quote_name
+        table = quote_name(self.table)
+        new_table = f"{self.table}_partitioned"
+
+        with transaction.atomic(), db_connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [new_table])
+            if cursor.fetchone()[0] is None:
+                self._create_partitioned_copy(cursor, new_table, until)
+            cursor.execute(f"SELECT coalesce(max(id), 0) FROM {quote_name(new_table)}")
+            last_id = cursor.fetchone()[0]
+
+        copied_count = 0
+        while True:
+            settled_id = self._wait_for_settled_id()
+            round_count = 0
+            while True:
+                with transaction.atomic(), db_connection.cursor() as cursor:
+                    chunk_count, chunk_last_id = self._copy_chunk(
+                        cursor, new_table, last_id, chunk_size, up_to_id=settled_id
+                    )
+                    if chunk_count:
+                        self._check_copy(cursor, new_table, last_id, chunk_last_id)
+                if not chunk_count:
+                    break
+                round_count += chunk_count
+                last_id = chunk_last_id
+                if log:
+                    log(
+                        f"Copied {copied_count + round_count} rows, up to id {last_id}."
+                    )
+            copied_count += round_count
+            last_id = max(last_id, settled_id)
+            if round_count < chunk_size:
+                break
+
+        with transaction.atomic(), db_connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+            # Every row up to `last_id` is copied: only those written since the
+            # start of the last round are left.
+            chunk_count, _ = self._copy_chunk(cursor, new_table, last_id)
+            copied_count += chunk_count
+            self._check_copy(cursor, new_table, last_id)
+            self._swap_tables(cursor, new_table)
+        return copied_count
+
+    def _wait_for_settled_id(self, poll_interval: float = 0.1) -> int:
+        """
+        Wait for the end of the transactions running now, besides this one.
+        The sequence of the table is not cached, so ids are only taken by
+        running transactions.
+        :return: the last id taken from the sequence of the table before: every
+        row up to it is now either committed or never will be
+        """
+        with db_connection.cursor() as cursor:
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [self.table])
+            sequence = cursor.fetchone()[0]
+            cursor.execute(
+                f"SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END "
+                f"FROM {sequence}"
+            )
+            settled_id = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT array_agg(virtualxid) FROM pg_locks "
+                "WHERE locktype = 'virtualxid' AND pid <> pg_backend_pid()"
+            )
+            running_transactions = cursor.fetchone()[0]
+            while running_transactions:
+                time.sleep(poll_interval)
+                cursor.execute(
+                    "SELECT array_agg(virtualxid) FROM pg_locks "
+                    "WHERE locktype = 'virtualxid' AND virtualxid = ANY(%s)",
+                    [running_transactions],
+                )
+                running_transactions = cursor.fetchone()[0]
+        return settled_id
+
+    def _create_partitioned_copy(self, cursor, new_table: str, until: datetime):
+        """
+        Create `new_table`, partitioned, with the columns, sequence default,
+        foreign keys and indexes of the table, the indexes under temporary
+        names, and the partitions from the oldest row to `until`.
+        """
+        quote_name = db_connection.ops.quote_name
+        table = quote_name(self.table)
+        column = quote_name(self.column)
+
+        cursor.execute(
+            f"CREATE TABLE {quote_name(new_table)} "
+            f"(LIKE {table} INCLUDING DEFAULTS) PARTITION BY RANGE ({column})"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote_name(new_table)} "
+            f"ADD CONSTRAINT {quote_name(new_table + '_pkey')} "
+            f"PRIMARY KEY (id, {column})"
+        )
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [self.table],
+        )
+        for constraint_name, constraint_definition in cursor.fetchall():
+            cursor.execute(
+                f"ALTER TABLE {quote_name(new_table)} "
+                f"ADD CONSTRAINT {quote_name(constraint_name)} {constraint_definition}"
+            )
+
+        self._create_partition(cursor, self.default_partition, parent=new_table)
+        partition_names = [self.default_partition]
+        cursor.execute(f"SELECT min({column}) FROM {table}")
+        start, end = self.get_bounds(cursor.fetchone()[0] or timezone.now())
+        while start <= until:
+            partition_name = self.get_partition_name(start)
+            self._create_partition(cursor, partition_name, start, end, parent=new_table)
+            partition_names.append(partition_name)
+            start, end = self.get_bounds(end)
+
+        # The indexes of the partitions are created first, with the names
+        # `_create_partition` gives them, to be attached to those of the parent.
+        index_definitions = self._get_index_definitions(cursor, self.table)
+        for partition_name in partition_names:
+            suffix = partition_name[len(self.table) :]
+            for index_name, index_definition in index_definitions:
+                partition_index_name = f"{index_name}{suffix}"
+                if len(partition_index_name) <= INDEX_NAME_MAX_LENGTH:
+                    cursor.execute(
+                        self._rename_index_definition(
+                            index_definition, partition_index_name, partition_name
+                        )
+                    )
+        for index_name, index_definition in index_definitions:
+            cursor.execute(
+                self._rename_index_definition(
+                    index_definition, self._get_temporary_name(index_name), new_table
+                )
+            )
+
+    def _copy_chunk(
+        self,
+        cursor,
+        new_table: str,
+        last_id: int,
+        chunk_size: int = None,
+        up_to_id: int = None,
+    ) -> tuple:
+        """
+        Copy the rows of the table after `last_id` and up to `up_to_id` to
+        `new_table`, at most `chunk_size` of them.
+        :return: the number of copied rows and the last copied id
+        """
+        quote_name = db_connection.ops.quote_name
+        limit = f"LIMIT {int(chunk_size)}" if chunk_size else ""
+        up_to = f"AND id <= {int(up_to_id)}" if up_to_id is not None else ""
+        cursor.execute(
+            f"WITH copied_rows AS ("
+            f"INSERT INTO {quote_name(new_table)} "
+            f"SELECT * FROM {quote_name(self.table)} WHERE id > %s {up_to} "
+            f"ORDER BY id {limit} "
+            f"RETURNING id"
+            f") SELECT count(*), max(id) FROM copied_rows",
+            [last_id],
+        )
+        return cursor.fetchone()
+
+    def _check_copy(self, cursor, new_table: str, last_id: int, up_to_id: int = None):
+        """
+        Compare the number of rows of the table and of `new_table` after
+        `last_id` and up to `up_to_id`, counted through their primary keys.
+        :raise: PartitioningError when they differ
+        """
+        quote_name = db_connection.ops.quote_name
+        up_to = f"AND id <= {int(up_to_id)}" if up_to_id is not None else ""
+        count = f"SELECT count(*) FROM {{}} WHERE id > {int(last_id)} {up_to}"
+        cursor.execute(
+            f"SELECT ({count.format(quote_name(self.table))}), "
+            f"({count.format(quote_name(new_table))})"
+        )
+        row_count, new_row_count = cursor.fetchone()
+        if row_count != new_row_count:
+            raise PartitioningError(
+                f"{self.table} has {row_count} rows after id {last_id}, "
+                f"{new_table} {new_row_count}: the tables are not swapped."
+            )
+
+    def _swap_tables(self, cursor, new_table: str):
+        """
+        Drop the table and give its name, the names of its indexes and its
+        sequence to `new_table`.
+        """
+        quote_name = db_connection.ops.quote_name
+        table = quote_name(self.table)
+
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [self.table])
+        sequence = cursor.fetchone()[0]
+        index_names = [
+            index_name
+            for index_name, _ in self._get_index_definitions(cursor, self.table)
+        ]
+
+        # Check the deferred foreign keys of the copied rows before the drop.
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {quote_name(new_table)} RENAME TO {table}")
+        cursor.execute(
+            f"ALTER TABLE {table} RENAME CONSTRAINT {quote_name(new_table + '_pkey')} "
+            f"TO {quote_name(self.table + '_pkey')}"
+        )
+        for index_name in index_names:
+            cursor.execute(
+                f"ALTER INDEX {quote_name(self._get_temporary_name(index_name))} "
+                f"RENAME TO {quote_name(index_name)}"
+            )
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+
+    @staticmethod
+    def _get_temporary_name(index_name: str) -> str:
+        return f"partitioned_{hashlib.md5(index_name.encode()).hexdigest()}"
+
+    def _rebuild_table(self, cursor, partitioned: bool):
+        """
+        Rename the table to `<table>_previous` and create the new table in its
+        place, with the same columns, sequence, indexes and foreign keys.
+        """
+        quote_name = db_connection.ops.quote_name
+        table = quote_name(self.table)
+        previous_table = quote_name(f"{self.table}_previous")
+
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [self.table])
+        sequence = cursor.fetchone()[0]
+        index_definitions = self._get_index_definitions(cursor, self.table)
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [self.table],
+        )
+        foreign_keys = cursor.fetchall()
+
+        for index_name, _ in index_definitions:
+            cursor.execute(f"DROP INDEX {quote_name(index_name)}")
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {previous_table}")
+        cursor.execute(
+            f"ALTER TABLE {previous_table} RENAME CONSTRAINT "
+            f"{quote_name(self.table + '_pkey')} "
+            f"TO {quote_name(self.table + '_previous_pkey')}"
+        )
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+
+        if partitioned:
+            cursor.execute(
+                f"CREATE TABLE {table} (LIKE {previous_table} INCLUDING DEFAULTS) "
+                f"PARTITION BY RANGE ({quote_name(self.column)})"
+            )
+            # A primary key of a partitioned table includes the partition key.
+            primary_key = f"id, {quote_name(self.column)}"
+        else:
+            cursor.execute(
+                f"CREATE TABLE {table} (LIKE {previous_table} INCLUDING DEFAULTS)"
+            )
+            primary_key = "id"
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+        cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({primary_key})")
+        for _, index_definition in index_definitions:
+            cursor.execute(index_definition)
+        for constraint_name, constraint_definition in foreign_keys:
+            cursor.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {quote_name(constraint_name)} "
+                f"{constraint_definition}"
+            )
+
+    def _copy_rows(self, cursor):
+        quote_name = db_connection.ops.quote_name
+        previous_table = quote_name(f"{self.table}_previous")
+        cursor.execute(
+            f"INSERT INTO {quote_name(self.table)} SELECT * FROM {previous_table}"
+        )
+        cursor.execute(f"DROP TABLE {previous_table} CASCADE")
+
+    def _create_partition(
+        self,
+        cursor,
+        name: str,
+        start: datetime = None,
+        end: datetime = None,
+        parent: str = None,
+    ):
+        """
+        Create the partition `name` of `parent` (the table by default) for the
+        rows from `start` to `end`, or the default partition when they are None.
+        """
+        quote_name = db_connection.ops.quote_name
+        parent = parent or self.table
+        table = quote_name(parent)
+        partition = quote_name(name)
+
+        cursor.execute(f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)")
+        suffix = name[len(self.table) :]
+        for index_name, index_definition in self._get_index_definitions(cursor, parent):
+            partition_index_name = f"{index_name}{suffix}"
+            if len(partition_index_name) <= INDEX_NAME_MAX_LENGTH:
+                cursor.execute(
+                    self._rename_index_definition(
+                        index_definition, partition_index_name, name
+                    )
+                )
+
+        if start is None:
+            cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {partition} DEFAULT")
+            return
+
+        column = quote_name(self.column)
+        cursor.execute(
+            f"WITH moved_rows AS ("
+            f"DELETE FROM {quote_name(self.default_partition)} "
+            f"WHERE {column} >= %s AND {column} < %s RETURNING *"
+            f") INSERT INTO {partition} SELECT * FROM moved_rows",
+            [start, end],
+        )
+        # Partition bounds must be plain literals before PostgreSQL 12.
+        cursor.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {partition} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start.isoformat(), end.isoformat()],
+        )
+
+    @staticmethod
+    def _rename_index_definition(
+        index_definition: str, index_name: str, table: str
+    ) -> str:
+        """
+        :return: `index_definition` creating the index `index_name` on `table`
+        """
+        quote_name = db_connection.ops.quote_name
+        return re.sub(
+            r"^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?\S+ ",
+            lambda match: (
+                f"CREATE {match.group(1) or ''}INDEX {quote_name(index_name)} "
+                f"ON {quote_name(table)} "
+            ),
+            index_definition,
+        )
+
+    @staticmethod
+    def _get_index_definitions(cursor, table: str) -> list:
+        """
+        :return: the (name, definition) of the indexes of `table` that do not
+        back a constraint, those being created along with their constraint
+        """
+        cursor.execute(
+            "SELECT index.relname, pg_get_indexdef(pg_index.indexrelid) "
+            "FROM pg_index "
+            "JOIN pg_class index ON index.oid = pg_index.indexrelid "
+            "WHERE pg_index.indrelid = to_regclass(%s) "
+            "AND NOT EXISTS ("
+            "SELECT 1 FROM pg_constraint "
+            "WHERE pg_constraint.conindid = pg_index.indexrelid"
+            ") "
+            "ORDER BY index.relname",
+            [table],
+        )
+        return [
+            (name, definition.replace(" ON ONLY ", " ON "))
+            for name, definition in cursor.fetchall()
+        ]
+
+
+connection_partitioning = RangePartitioning(
+    "aidants_connect_web_connection", "expires_on", period="day"
+)
+
+journal_partitioning = RangePartitioning(
+    "aidants_connect_web_journal", "creation_date", period="month"
+)
@@ -0,0 +1,39 @@
+from functools import lru_cache
+
+from django.db import connection as db_connection
+from django.db.models import CharField, Func
+
+
+# Trigram index on the lowercase, accent-less full name of the usagers, created
+# by the migration `0053_usager_name_search` where the `pg_trgm` and `unaccent`
+# extensions are available.
+UNACCENT_FUNCTION = "aidants_connect_unaccent"
+
+NAME_SEARCH_INDEX = "usager_name_search_idx"
+
+
+class SearchName(Func):
+    """
+    The expression of `usager_name_search_idx`, which the queries must repeat
+    for the index to be used.
+    """
+
+    function = UNACCENT_FUNCTION
+    template = "%(function)s(lower(%(expressions)s))"
+    arg_joiner = " || ' ' || "
+    output_field = CharField()
+
+
+class SearchTerm(Func):
+    function = UNACCENT_FUNCTION
+    template = "%(function)s(lower(%(expressions)s))"
+    output_field = CharField()
+
+
+@lru_cache(maxsize=None)
+def name_search_is_indexed() -> bool:
+    if db_connection.vendor != "postgresql":
+        return False
+    with db_connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [NAME_SEARCH_INDEX])
+        return cursor.fetchone()[0] is not None
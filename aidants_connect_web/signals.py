@@ -1,9 +1,45 @@
 from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from aidants_connect_web.models import Journal
+from aidants_connect_web.models import (
+    Autorisation,
+    AutorisationIndex,
+    Journal,
+    Mandat,
+)
 
 
 @receiver(user_logged_in)
 def on_login(sender, user, request, **kwargs):
     Journal.log_connection(user)
+
+
+@receiver(post_save, sender=Mandat)
+@receiver(post_delete, sender=Mandat)
+def on_mandat_change(sender, instance, **kwargs):
+    index_pairs = {instance.index_pair}
+    loaded_index_pair = getattr(instance, "loaded_index_pair", (None, None))
+    if None not in loaded_index_pair:
+        index_pairs.add(loaded_index_pair)
+    for organisation_id, usager_id in index_pairs:
+        AutorisationIndex.objects.refresh(organisation_id, usager_id)
+    instance.loaded_index_pair = instance.index_pair
+
+
+@receiver(post_save, sender=Autorisation)
+@receiver(post_delete, sender=Autorisation)
+def on_autorisation_change(sender, instance, **kwargs):
+    if not instance.mandat_id:
+        return
+    if Autorisation.mandat.is_cached(instance):
+        index_pairs = [instance.mandat.index_pair]
+    else:
+        # Only the ids are needed, the mandat is not loaded for them. It is gone
+        # when its deletion cascades to its autorisations: `on_mandat_change`
+        # refreshes the pair then.
+        index_pairs = Mandat.objects.filter(pk=instance.mandat_id).values_list(
+            "organisation_id", "usager_id"
+        )
+    for organisation_id, usager_id in index_pairs:
+        AutorisationIndex.objects.refresh(organisation_id, usager_id)
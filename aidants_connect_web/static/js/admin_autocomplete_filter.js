@@ -0,0 +1,15 @@
+// Apply the value chosen in an admin autocomplete filter, from the first page
+// of the changelist.
+(function ($) {
+  $(document).on("change", ".admin-autocomplete-filter", function () {
+    var parameterName = this.getAttribute("data-parameter-name");
+    var params = new URLSearchParams(window.location.search);
+    params.delete("p");
+    if (this.value) {
+      params.set(parameterName, this.value);
+    } else {
+      params.delete(parameterName);
+    }
+    window.location.search = params.toString();
+  });
+})(django.jQuery);
@@ -0,0 +1,30 @@
+// Replace the "load more" row of the usagers table by the rows of the next
+// page, following the link instead when fetch is not available.
+(function () {
+  var usagers = document.getElementById("usagers");
+  if (!usagers || !window.fetch) {
+    return;
+  }
+  usagers.addEventListener("click", function (event) {
+    var link = event.target.closest("#usagers_load_more a");
+    if (!link) {
+      return;
+    }
+    event.preventDefault();
+    var loadMoreRow = link.closest("tr");
+    fetch(link.getAttribute("data-fragment-url"), { credentials: "same-origin" })
+      .then(function (response) {
+        if (!response.ok || response.redirected) {
+          throw new Error(response.statusText);
+        }
+        return response.text();
+      })
+      .then(function (rows) {
+        loadMoreRow.insertAdjacentHTML("beforebegin", rows);
+        loadMoreRow.parentNode.removeChild(loadMoreRow);
+      })
+      .catch(function () {
+        window.location.href = link.href;
+      });
+  });
+})();
@@ -0,0 +1,54 @@
+// Typeahead of the usager search fields: the element whose id is given by
+// `data-search-results` is filled with the fragment returned by
+// `data-search-url` for the typed name, and restored once the field is cleared.
+(function () {
+  var MINIMUM_LENGTH = 2;
+  var DELAY = 250;
+
+  function setUpSearch(input) {
+    var results = document.getElementById(input.getAttribute("data-search-results"));
+    var initialResults = results.innerHTML;
+    var timeout = null;
+    var lastTerms = "";
+
+    input.addEventListener("input", function () {
+      clearTimeout(timeout);
+      timeout = setTimeout(function () {
+        var terms = input.value.trim();
+        if (terms === lastTerms) {
+          return;
+        }
+        lastTerms = terms;
+        if (terms.length < MINIMUM_LENGTH) {
+          results.innerHTML = initialResults;
+          return;
+        }
+        var url = input.getAttribute("data-search-url") + "?q=" + encodeURIComponent(terms);
+        fetch(url, { credentials: "same-origin" })
+          .then(function (response) {
+            if (!response.ok || response.redirected) {
+              throw new Error(response.statusText);
+            }
+            return response.text();
+          })
+          .then(function (fragment) {
+            // Ignore the responses to outdated searches.
+            if (terms === lastTerms) {
+              results.innerHTML = fragment;
+            }
+          })
+          .catch(function () {
+            results.innerHTML = initialResults;
+          });
+      }, DELAY);
+    });
+  }
+
+  if (!window.fetch) {
+    return;
+  }
+  var inputs = document.querySelectorAll("input[data-search-url]");
+  for (var i = 0; i < inputs.length; i++) {
+    setUpSearch(inputs[i]);
+  }
+})();
@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from aidants_connect_web.models import (
+    Aidant,
+    Journal,
+    Mandat,
+    MandatQuerySet,
+    Organisation,
+    StatistiquesSnapshot,
+)
+
+
+def compute_statistiques() -> dict:
+    """
+    :return: the values displayed on the public statistics page,
+    as a JSON serializable dict.
+    Each model is aggregated in a single query, so that neither the number of
+    queries nor the memory used grow with the size of the tables.
+    """
+    last_30_days = timezone.now() - timedelta(days=30)
+    stafforg = settings.STAFF_ORGANISATION_NAME
+
+    organisations_count = Organisation.objects.exclude(name=stafforg).count()
+    aidants_count = Aidant.objects.exclude(organisation__name=stafforg).count()
+
+    # Mandats and usagers
+    active_mandat = MandatQuerySet.active_condition()
+    mandats_statistiques = Mandat.objects.exclude(
+        organisation__name=stafforg
+    ).aggregate(
+        mandats_count=Count("pk"),
+        active_mandats_count=Count("pk", filter=active_mandat),
+        usagers_with_mandat_count=Count("usager", distinct=True),
+        usagers_with_active_mandat_count=Count(
+            "usager", filter=active_mandat, distinct=True
+        ),
+    )
+
+    # Autorisations
+    autorisation_use = Journal.objects.excluding_staff().filter(
+        action="use_autorisation"
+    )
+    recent_use = Q(creation_date__gte=last_30_days)
+    autorisation_use_statistiques = autorisation_use.aggregate(
+        autorisation_use_count=Count("pk"),
+        autorisation_use_recent_count=Count("pk", filter=recent_use),
+        usagers_helped_count=Count("usager", distinct=True),
+        usagers_helped_recent_count=Count("usager", filter=recent_use, distinct=True),
+    )
+
+    # # Démarches
+    use_count_by_demarche = dict(
+        autorisation_use.order_by()
+        .values("demarche")
+        .annotate(use_count=Count("pk"))
+        .values_list("demarche", "use_count")
+    )
+    demarches_count = [
+        {
+            "title": demarche,
+            "icon": demarche_description["icon"],
+            "value": use_count_by_demarche.get(demarche, 0),
+        }
+        for demarche, demarche_description in settings.DEMARCHES.items()
+    ]
+    demarches_count.sort(key=lambda x: x["value"], reverse=True)
+
+    return {
+        "organisations_count": organisations_count,
+        "aidants_count": aidants_count,
+        **mandats_statistiques,
+        **autorisation_use_statistiques,
+        "demarches_count": demarches_count,
+    }
+
+
+def take_statistiques_snapshot() -> StatistiquesSnapshot:
+    return StatistiquesSnapshot.objects.create(values=compute_statistiques())
+
+
+def prune_statistiques_snapshots() -> int:
+    """
+    :return: the number of deleted snapshots, all but the
+    `STATISTIQUES_SNAPSHOTS_KEPT` most recent ones.
+    """
+    return StatistiquesSnapshot.objects.delete_older(
+        max(settings.STATISTIQUES_SNAPSHOTS_KEPT, 1)
+    )
+
+
+def get_statistiques_snapshot() -> StatistiquesSnapshot:
+    """
+    :return: the latest snapshot, taking a first one if there is none yet.
+    """
+    return StatistiquesSnapshot.objects.get_latest() or take_statistiques_snapshot()
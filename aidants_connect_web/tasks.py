@@ -1,29 +1,138 @@
+from datetime import timedelta
 import logging
+import time
 
+from django.conf import settings
 from django.template.defaultfilters import pluralize
+from django.utils import timezone
 
 from celery import shared_task
 
-from aidants_connect_web.models import Connection
+from aidants_connect_web.connection_store import get_connection_store
+from aidants_connect_web.models import JournalDailyRollup
+from aidants_connect_web.partitioning import (
+    connection_partitioning,
+    journal_partitioning,
+)
+from aidants_connect_web.statistiques import (
+    prune_statistiques_snapshots,
+    take_statistiques_snapshot,
+)
 
 
 logger = logging.getLogger()
 
 
 @shared_task
-def delete_expired_connections():
+def delete_expired_connections(batch_size=1000, max_seconds=60):
 
     logger.info("Deleting expired connections...")
 
-    expired_connections = Connection.objects.expired()
-    deleted_connections_count, _ = expired_connections.delete()
+    start = time.monotonic()
+    connection_store = get_connection_store()
+    deleted_connections_count = connection_store.delete_expired(
+        batch_size=batch_size, max_seconds=max_seconds
+    )
+    duration = time.monotonic() - start
+    remaining_connections_count = connection_store.count_expired()
 
     if deleted_connections_count > 0:
         logger.info(
             f"Successfully deleted {deleted_connections_count} "
-            f"connection{pluralize(deleted_connections_count)}!"
+            f"connection{pluralize(deleted_connections_count)} "
+            f"in {duration * 1000:.0f} ms!"
         )
     else:
         logger.info("No connection to delete.")
 
+    if remaining_connections_count > 0:
+        logger.info(
+            f"{remaining_connections_count} expired "
+            f"connection{pluralize(remaining_connections_count)} left "
+            "for the next run."
+        )
+
     return deleted_connections_count
+
+
+@shared_task
+def refresh_statistiques():
+
+    logger.info("Refreshing statistiques...")
+
+    statistiques_snapshot = take_statistiques_snapshot()
+    deleted_count = prune_statistiques_snapshots()
+
+    logger.info(
+        f"Successfully took {statistiques_snapshot} and deleted {deleted_count} "
+        f"older snapshot{pluralize(deleted_count)}."
+    )
+
+    return statistiques_snapshot.id
+
+
+@shared_task
+def rollup_journal(chunk_size=10000):
+
+    logger.info("Rolling up the journal...")
+
+    rolled_up_count = JournalDailyRollup.objects.roll_up(chunk_size=chunk_size)
+
+    logger.info(
+        f"Successfully rolled up {rolled_up_count} "
+        f"journal entr{pluralize(rolled_up_count, 'y,ies')}."
+    )
+
+    return rolled_up_count
+
+
+@shared_task
+def manage_connection_partitions(days_ahead=None):
+
+    logger.info("Managing connection partitions...")
+
+    if not connection_partitioning.is_partitioned():
+        logger.info("The connection table is not partitioned.")
+        return 0, 0
+
+    if days_ahead is None:
+        days_ahead = settings.CONNECTION_PARTITIONS_DAYS_AHEAD
+    now = timezone.now()
+    created_partitions = connection_partitioning.create_partitions(
+        until=now + timedelta(days=days_ahead)
+    )
+    dropped_partitions = connection_partitioning.drop_partitions(before=now)
+
+    logger.info(
+        f"Successfully created {len(created_partitions)} "
+        f"partition{pluralize(len(created_partitions))} and dropped "
+        f"{len(dropped_partitions)} expired partition"
+        f"{pluralize(len(dropped_partitions))}."
+    )
+
+    return len(created_partitions), len(dropped_partitions)
+
+
+@shared_task
+def create_journal_partitions(months_ahead=None):
+
+    logger.info("Creating journal partitions...")
+
+    if not journal_partitioning.is_partitioned():
+        logger.info("The journal table is not partitioned.")
+        return 0
+
+    if months_ahead is None:
+        months_ahead = settings.JOURNAL_PARTITIONS_MONTHS_AHEAD
+    until = timezone.now()
+    for _ in range(months_ahead):
+        until = journal_partitioning.get_bounds(until)[1]
+    # The journal is kept: its partitions are never dropped.
+    created_partitions = journal_partitioning.create_partitions(until=until)
+
+    logger.info(
+        f"Successfully created {len(created_partitions)} "
+        f"partition{pluralize(len(created_partitions))}."
+    )
+
+    return len(created_partitions)
@@ -0,0 +1,125 @@
+import time
+
+from django.test import override_settings
+
+import mock
+
+
+class FakeRedis:
+    """
+    In-memory stand-in for the few `redis.Redis` commands the connection store
+    and the circuit breaker use. Expiry follows `time.time()`, so `freeze_time`
+    applies to it.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.expiries = {}
+
+    def _expire_keys(self):
+        now = time.time()
+        for key, expiry in list(self.expiries.items()):
+            if expiry <= now:
+                del self.values[key]
+                del self.expiries[key]
+
+    @staticmethod
+    def _encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def get(self, key):
+        self._expire_keys()
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        self._expire_keys()
+        if nx and key in self.values:
+            return None
+        self.values[key] = self._encode(value)
+        self.expiries.pop(key, None)
+        if ex is not None:
+            self.expiries[key] = time.time() + ex
+        return True
+
+    def mget(self, *keys):
+        return [self.get(key) for key in keys]
+
+    def incr(self, key):
+        self._expire_keys()
+        value = int(self.values.get(key, 0)) + 1
+        self.values[key] = self._encode(value)
+        return value
+
+    def hincrby(self, key, field, amount=1):
+        fields = self.values.setdefault(key, {})
+        fields[self._encode(field)] = fields.get(self._encode(field), 0) + amount
+        return fields[self._encode(field)]
+
+    def hgetall(self, key):
+        return {
+            field: self._encode(value)
+            for field, value in self.values.get(key, {}).items()
+        }
+
+    def delete(self, *keys):
+        deleted_count = 0
+        for key in keys:
+            deleted_count += int(self.values.pop(key, None) is not None)
+            self.expiries.pop(key, None)
+        return deleted_count
+
+    def expire(self, key, seconds):
+        self._expire_keys()
+        if key not in self.values:
+            return False
+        self.expiries[key] = time.time() + seconds
+        return True
+
+    def ttl(self, key):
+        self._expire_keys()
+        if key not in self.values:
+            return -2
+        if key not in self.expiries:
+            return -1
+        return round(self.expiries[key] - time.time())
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, fake_redis: FakeRedis):
+        self.fake_redis = fake_redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((getattr(self.fake_redis, name), args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        results = [command(*args, **kwargs) for command, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+class RedisConnectionStoreMixin:
+    """
+    Runs the tests of the `TestCase` it is mixed in with against the Redis
+    connection store, on a `FakeRedis`.
+    """
+
+    def setUp(self):
+        self.fake_redis = FakeRedis()
+        patcher = mock.patch(
+            "aidants_connect_web.connection_store.get_redis_client",
+            return_value=self.fake_redis,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(CONNECTION_STORE="redis")
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        super().setUp()
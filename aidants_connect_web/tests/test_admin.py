@@ -0,0 +1,123 @@
+from django.db import connection
+from django.test import RequestFactory, tag, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from aidants_connect_web.admin import (
+    admin_site,
+    JournalDailyRollupAdmin,
+    MandatAdmin,
+    OrganisationAdmin,
+)
+from aidants_connect_web.models import JournalDailyRollup, Mandat, Organisation
+from aidants_connect_web.tests.factories import (
+    AidantFactory,
+    AutorisationFactory,
+    MandatFactory,
+    OrganisationFactory,
+    UsagerFactory,
+)
+
+
+@tag("admin")
+class ChangelistQueriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff_aidant = AidantFactory(username="staff@test.user", is_staff=True)
+        cls.organisations = [OrganisationFactory(name=f"Orga {i}") for i in range(4)]
+        cls.usager = UsagerFactory()
+        for organisation in cls.organisations:
+            AidantFactory(
+                username=f"aidant@{organisation.name}", organisation=organisation
+            )
+            AidantFactory(
+                username=f"inactive@{organisation.name}",
+                organisation=organisation,
+                is_active=False,
+            )
+            for _ in range(2):
+                mandat = MandatFactory(organisation=organisation, usager=cls.usager)
+                AutorisationFactory(mandat=mandat)
+        cls.revoked_mandat = MandatFactory(organisation=cls.organisations[0])
+        AutorisationFactory(mandat=cls.revoked_mandat, revocation_date=timezone.now())
+
+    def get_changelist(self, model_admin, list_per_page, **params):
+        request = RequestFactory().get("/", params)
+        request.user = self.staff_aidant
+        request.user.is_verified = lambda: True
+        model_admin.list_per_page = list_per_page
+        with CaptureQueriesContext(connection) as queries:
+            response = model_admin.changelist_view(request)
+            response.render()
+        return response, len(queries)
+
+    def test_organisation_changelist_queries_do_not_grow_with_page_size(self):
+        organisation_admin = OrganisationAdmin(Organisation, admin_site)
+        _, query_count = self.get_changelist(organisation_admin, 1)
+        response, page_query_count = self.get_changelist(organisation_admin, 100)
+
+        self.assertEqual(page_query_count, query_count)
+        organisations = response.context_data["cl"].result_list
+        self.assertEqual(
+            {
+                organisation.name: (
+                    organisation.admin_num_active_aidants(),
+                    organisation.admin_num_mandats(),
+                )
+                for organisation in organisations
+                if organisation in self.organisations
+            },
+            {"Orga 0": (1, 3), "Orga 1": (1, 2), "Orga 2": (1, 2), "Orga 3": (1, 2)},
+        )
+
+    def test_mandat_changelist_queries_do_not_grow_with_page_size(self):
+        mandat_admin = MandatAdmin(Mandat, admin_site)
+        _, query_count = self.get_changelist(mandat_admin, 1)
+        response, page_query_count = self.get_changelist(mandat_admin, 100)
+
+        self.assertEqual(page_query_count, query_count)
+        mandats = response.context_data["cl"].result_list
+        self.assertEqual(len(mandats), 9)
+        self.assertEqual(
+            [mandat for mandat in mandats if not mandat.admin_is_active()],
+            [self.revoked_mandat],
+        )
+
+    def test_mandat_changelist_autocomplete_filters(self):
+        mandat_admin = MandatAdmin(Mandat, admin_site)
+        organisation = self.organisations[1]
+        response, _ = self.get_changelist(
+            mandat_admin, 100, organisation__id__exact=organisation.id
+        )
+
+        self.assertEqual(
+            set(response.context_data["cl"].result_list),
+            set(Mandat.objects.filter(organisation=organisation)),
+        )
+        self.assertContains(
+            response, f'<option value="{organisation.id}" selected>Orga 1</option>'
+        )
+        usager_autocomplete_url = reverse(
+            f"{admin_site.name}:aidants_connect_web_usager_autocomplete"
+        )
+        self.assertContains(response, f'data-ajax--url="{usager_autocomplete_url}"')
+        self.assertNotContains(response, "Orga 2")
+
+        response, _ = self.get_changelist(
+            mandat_admin, 100, usager__id__exact=self.usager.id
+        )
+        self.assertEqual(len(response.context_data["cl"].result_list), 8)
+
+
+@tag("admin")
+class JournalDailyRollupAdminTests(TestCase):
+    def test_staff_can_only_view_the_rollup(self):
+        request = RequestFactory().get("/")
+        request.user = AidantFactory(is_staff=True)
+        rollup_admin = JournalDailyRollupAdmin(JournalDailyRollup, admin_site)
+
+        self.assertTrue(rollup_admin.has_view_permission(request))
+        self.assertFalse(rollup_admin.has_add_permission(request))
+        self.assertFalse(rollup_admin.has_change_permission(request))
+        self.assertFalse(rollup_admin.has_delete_permission(request))
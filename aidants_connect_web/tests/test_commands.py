@@ -1,21 +1,33 @@
+from io import StringIO
+import os
+from tempfile import TemporaryDirectory
 from unittest import skip
 
 from datetime import datetime, timedelta, timezone
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import override_settings, tag, TestCase
 
 from freezegun import freeze_time
 
+from aidants_connect_web.journal_archive import JournalMonthArchive
 from aidants_connect_web.models import (
     Autorisation,
+    AutorisationIndex,
     Connection,
+    Journal,
+    JournalArchiveRemoval,
+    JournalDailyRollup,
     Mandat,
+    StatistiquesSnapshot,
 )
 from aidants_connect_web.tests.factories import (
     AidantFactory,
+    AutorisationFactory,
     ConnectionFactory,
     LegacyAutorisationFactory,
+    MandatFactory,
     OrganisationFactory,
     UsagerFactory,
 )
@@ -193,3 +205,204 @@ class DeleteExpiredConnectionsTests(TestCase):
         remaining_connections = Connection.objects.all()
         self.assertEqual(remaining_connections.count(), 1)
         self.assertEqual(remaining_connections.first().id, self.conn_2.id)
+
+    @freeze_time("2020-01-01 07:00:00")
+    def test_delete_expired_connections_by_batches(self):
+        expired_connections = [self.conn_1] + [
+            ConnectionFactory(expires_on=self.conn_1.expires_on) for _ in range(4)
+        ]
+
+        with self.assertLogs(level="INFO") as logs:
+            call_command(
+                "delete_expired_connections", batch_size=2, max_seconds=0,
+            )
+        self.assertFalse(
+            Connection.objects.filter(
+                id__in=[connection.id for connection in expired_connections[:2]]
+            ).exists()
+        )
+        self.assertEqual(Connection.objects.expired().count(), 3)
+        self.assertRegex(logs.output[1], r"deleted 2 connections in \d+ ms")
+        self.assertIn("3 expired connections left", logs.output[2])
+
+        call_command("delete_expired_connections", batch_size=2)
+        self.assertEqual(list(Connection.objects.all()), [self.conn_2])
+
+
+@tag("commands")
+class RefreshStatistiquesTests(TestCase):
+    def test_refresh_statistiques(self):
+        AidantFactory()
+        call_command("refresh_statistiques")
+        AidantFactory(username="new@aidant.fr")
+        call_command("refresh_statistiques")
+
+        self.assertEqual(StatistiquesSnapshot.objects.count(), 2)
+        latest_snapshot = StatistiquesSnapshot.objects.get_latest()
+        self.assertEqual(latest_snapshot.values["aidants_count"], 2)
+
+    @override_settings(STATISTIQUES_SNAPSHOTS_KEPT=2)
+    def test_refresh_statistiques_deletes_older_snapshots(self):
+        for day in range(1, 5):
+            with freeze_time(f"2020-09-0{day} 12:00:00"):
+                call_command("refresh_statistiques")
+
+        self.assertEqual(
+            [
+                snapshot.creation_date.day
+                for snapshot in StatistiquesSnapshot.objects.order_by("creation_date")
+            ],
+            [3, 4],
+        )
+
+
+@tag("commands")
+class RollupJournalTests(TestCase):
+    @freeze_time("2020-01-01 07:00:00")
+    def setUp(self):
+        self.aidant = AidantFactory()
+        for _ in range(3):
+            Journal.log_connection(self.aidant)
+
+    def test_rollup_journal(self):
+        call_command("rollup_journal", "--chunk-size", "2")
+        self.assertEqual(
+            JournalDailyRollup.objects.get(
+                organisation=self.aidant.organisation, action="connect_aidant"
+            ).count,
+            3,
+        )
+
+
+@tag("commands")
+class CheckAutorisationIndexTests(TestCase):
+    def setUp(self):
+        self.mandat = MandatFactory()
+        AutorisationFactory(mandat=self.mandat, demarche="papiers")
+        AutorisationFactory(mandat=self.mandat, demarche="social")
+
+    def test_consistent_index(self):
+        stdout = StringIO()
+        call_command("check_autorisation_index", stdout=stdout)
+        self.assertIn("consistent", stdout.getvalue())
+
+    def test_inconsistent_index(self):
+        AutorisationIndex.objects.update(demarches={})
+        self.assertRaises(CommandError, call_command, "check_autorisation_index")
+
+        call_command("check_autorisation_index", "--fix", stdout=StringIO())
+
+        autorisation_index = AutorisationIndex.objects.get()
+        self.assertEqual(
+            autorisation_index.get_active_demarches(), ["papiers", "social"]
+        )
+        call_command("check_autorisation_index", stdout=StringIO())
+
+    def test_fix_prunes_expired_entries(self):
+        with freeze_time(datetime.now(timezone.utc) + timedelta(days=2)):
+            stdout = StringIO()
+            call_command("check_autorisation_index", "--fix", stdout=stdout)
+
+        self.assertIn("pruned 1 entries", stdout.getvalue())
+        self.assertFalse(AutorisationIndex.objects.exists())
+
+
+@tag("commands")
+class ArchiveJournalTests(TestCase):
+    def setUp(self):
+        self.aidant = AidantFactory()
+        with freeze_time("2020-01-15"):
+            Journal.log_connection(self.aidant)
+        with freeze_time("2020-03-15"):
+            self.recent_entry = Journal.log_connection(self.aidant)
+        JournalDailyRollup.objects.roll_up()
+
+    @freeze_time("2020-04-10")
+    def test_archive_journal(self):
+        with self.settings(JOURNAL_ARCHIVE_DIR=None):
+            with self.assertRaisesRegex(CommandError, "JOURNAL_ARCHIVE_DIR"):
+                call_command("archive_journal", remove=True, removed_by="Admin")
+        self.assertEqual(Journal.objects.count(), 2)
+
+        with TemporaryDirectory() as archive_directory:
+            with self.settings(JOURNAL_ARCHIVE_DIR=archive_directory):
+                with self.assertRaises(CommandError):
+                    call_command("archive_journal", remove=True)
+
+                stdout = StringIO()
+                call_command(
+                    "archive_journal",
+                    months_old=1,
+                    remove=True,
+                    removed_by="Admin",
+                    stdout=stdout,
+                )
+                self.assertEqual(
+                    os.listdir(archive_directory).count("journal_202001.jsonl.gz"), 1
+                )
+
+        self.assertIn("1 entries added to journal_202001.jsonl.gz.", stdout.getvalue())
+        self.assertEqual(list(Journal.objects.all()), [self.recent_entry])
+        self.assertEqual(JournalArchiveRemoval.objects.get().removed_by, "Admin")
+
+
+@tag("commands")
+class ExportJournalTests(TestCase):
+    def setUp(self):
+        self.aidant = AidantFactory()
+        with freeze_time("2020-06-30 12:00:00"):
+            self.entry = Journal.log_connection(self.aidant)
+        with freeze_time("2020-07-01 12:00:00"):
+            Journal.log_connection(self.aidant)
+
+    def test_export_journal(self):
+        stdout = StringIO()
+        call_command(
+            "export_journal",
+            "--format=jsonl",
+            f"--aidant={self.aidant.id}",
+            "--start=2020-06-01",
+            "--end=2020-06-30",
+            stdout=stdout,
+        )
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn(f'"id": {self.entry.id},', lines[0])
+
+    def test_export_journal_includes_archived_entries(self):
+        with TemporaryDirectory() as archive_directory:
+            with self.settings(JOURNAL_ARCHIVE_DIR=archive_directory):
+                archive = JournalMonthArchive(self.entry.creation_date)
+                archive.export()
+                JournalDailyRollup.objects.roll_up()
+                archive.remove_from_journal(removed_by="Admin")
+
+                stdout = StringIO()
+                call_command(
+                    "export_journal",
+                    "--format=jsonl",
+                    f"--aidant={self.aidant.id}",
+                    "--end=2020-06-30",
+                    stdout=stdout,
+                )
+                lines = stdout.getvalue().splitlines()
+                self.assertEqual(len(lines), 1)
+                self.assertIn(f'"id": {self.entry.id},', lines[0])
+                self.assertIn(
+                    f'"aidant__organisation_id": {self.aidant.organisation_id},',
+                    lines[0],
+                )
+
+                stdout, stderr = StringIO(), StringIO()
+                call_command("export_journal", stdout=stdout, stderr=stderr)
+                self.assertEqual(len(stdout.getvalue().splitlines()), 2)
+                self.assertIn(
+                    "only exported with --aidant or --usager", stderr.getvalue()
+                )
+
+    def test_export_journal_to_file(self):
+        with TemporaryDirectory() as output_directory:
+            output_path = os.path.join(output_directory, "journal.csv")
+            call_command("export_journal", output=output_path, chunk_size=1)
+            with open(output_path) as output_file:
+                self.assertEqual(len(output_file.readlines()), 3)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.test import override_settings, tag, TestCase
+from django.utils import timezone
+
+from freezegun import freeze_time
+
+from aidants_connect_web.connection_store import (
+    get_connection_store,
+    ORMConnectionStore,
+    RedisConnectionStore,
+)
+from aidants_connect_web.models import Connection
+from aidants_connect_web.tests.factories import UsagerFactory
+from aidants_connect_web.tests.fake_redis import FakeRedis, RedisConnectionStoreMixin
+from aidants_connect_web.utilities import generate_token_digest
+
+
+@tag("connection_store")
+@override_settings(CONNECTION_STORE_RETENTION=600)
+class RedisConnectionStoreTests(TestCase):
+    def setUp(self):
+        self.fake_redis = FakeRedis()
+        self.connection_store = RedisConnectionStore(self.fake_redis, prefix="test")
+        self.usager = UsagerFactory()
+
+    def test_connection_round_trip(self):
+        connection = self.connection_store.create(
+            state="test_state",
+            usager=self.usager,
+            demarches=["argent", "papiers"],
+            duree_keyword="SHORT",
+        )
+        self.assertEqual(connection.pk, 1)
+
+        loaded_connection = self.connection_store.get(connection.pk)
+        self.assertEqual(loaded_connection, connection)
+        self.assertEqual(loaded_connection.usager, self.usager)
+        self.assertEqual(loaded_connection.demarches, ["argent", "papiers"])
+        # The JSON serializer keeps datetimes to the millisecond.
+        self.assertAlmostEqual(
+            loaded_connection.expires_on,
+            connection.expires_on,
+            delta=timedelta(milliseconds=1),
+        )
+        self.assertFalse(Connection.objects.exists())
+
+    def test_connection_expires_after_retention(self):
+        connection = self.connection_store.create(
+            expires_on=timezone.now() + timedelta(seconds=300)
+        )
+        self.assertEqual(self.fake_redis.ttl(f"test:{connection.pk}"), 900)
+
+        with freeze_time(timezone.now() + timedelta(seconds=899)):
+            self.assertTrue(self.connection_store.get(connection.pk).is_expired)
+
+        with freeze_time(timezone.now() + timedelta(seconds=901)):
+            with self.assertRaises(Connection.DoesNotExist):
+                self.connection_store.get(connection.pk)
+
+    def test_lookups_by_state_code_and_access_token(self):
+        connection = self.connection_store.create(
+            state="test_state",
+            code=generate_token_digest("test_code"),
+            access_token=generate_token_digest("test_access_token"),
+        )
+
+        self.assertEqual(self.connection_store.get_by_state("test_state"), connection)
+        self.assertEqual(self.connection_store.get_by_code("test_code"), connection)
+        self.assertEqual(
+            self.connection_store.get_by_access_token("test_access_token"), connection
+        )
+        with self.assertRaises(Connection.DoesNotExist):
+            self.connection_store.get_by_code("wrong_code")
+
+    def test_stale_index_is_ignored(self):
+        connection = self.connection_store.create(state="first_state")
+        connection.state = "second_state"
+        self.connection_store.save(connection)
+
+        self.assertEqual(self.connection_store.get_by_state("second_state"), connection)
+        with self.assertRaises(Connection.DoesNotExist):
+            self.connection_store.get_by_state("first_state")
+
+
+@tag("connection_store")
+class GetConnectionStoreTests(RedisConnectionStoreMixin, TestCase):
+    def test_store_follows_setting(self):
+        self.assertIsInstance(get_connection_store(), RedisConnectionStore)
+        with self.settings(CONNECTION_STORE="orm"):
+            self.assertIsInstance(get_connection_store(), ORMConnectionStore)
+
+    def test_expired_connections_are_left_to_redis(self):
+        get_connection_store().create(expires_on=timezone.now() - timedelta(days=1))
+        self.assertEqual(get_connection_store().delete_expired(), 0)
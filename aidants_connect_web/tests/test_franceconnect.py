@@ -0,0 +1,257 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Thread
+import time
+
+from django.test import override_settings, tag, TestCase
+
+import mock
+from requests import HTTPError, RequestException
+
+from aidants_connect_web.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerOpen,
+    MemoryCircuitBreakerStorage,
+    RedisCircuitBreakerStorage,
+)
+from aidants_connect_web.franceconnect import (
+    FranceConnectClient,
+    FranceConnectUnavailable,
+)
+from aidants_connect_web.tests.fake_redis import FakeRedis
+
+
+class FranceConnectStandInHandler(BaseHTTPRequestHandler):
+    """
+    Answers like the FranceConnect token and userinfo endpoints, and misbehaves
+    on demand through the server's `failures` and `latency` attributes.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.respond({"access_token": "test_access_token", "id_token": "id_token"})
+
+    def do_GET(self):
+        self.respond({"sub": "123", "authorization": self.headers.get("Authorization")})
+
+    def respond(self, content):
+        self.server.client_ports.add(self.client_address[1])
+        self.server.request_count += 1
+        time.sleep(self.server.latency)
+
+        content_type = "application/json"
+        body = json.dumps(content).encode()
+        if self.server.failures:
+            self.server.failures -= 1
+            status = self.server.failure_status
+            if self.server.failure_body is None:
+                body = json.dumps({"error": "unavailable"}).encode()
+            else:
+                content_type, body = "text/html", self.server.failure_body
+        else:
+            status = 200
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@tag("franceconnect")
+class FranceConnectClientTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("localhost", 0), FranceConnectStandInHandler)
+        cls.server.daemon_threads = True
+        Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://localhost:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.client_ports = set()
+        self.server.request_count = 0
+        self.server.failures = 0
+        self.server.failure_status = 503
+        self.server.failure_body = None
+        self.server.latency = 0
+        settings_override = override_settings(
+            FC_AS_FS_BASE_URL=self.base_url,
+            FC_AS_FS_READ_TIMEOUT=0.5,
+            FC_AS_FS_MAX_RETRIES=2,
+            FC_AS_FS_BREAKER_STORAGE="memory",
+            FC_AS_FS_BREAKER_FAILURE_RATE=0.5,
+            FC_AS_FS_BREAKER_MIN_CALLS=4,
+            FC_AS_FS_BREAKER_WINDOW=60,
+            FC_AS_FS_BREAKER_OPEN_DURATION=30,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.franceconnect_client = FranceConnectClient()
+        self.addCleanup(self.franceconnect_client.session.close)
+
+    def test_request_token_and_user_info(self):
+        with self.assertLogs(level="INFO") as logs:
+            token = self.franceconnect_client.request_token("test_code")
+            user_info = self.franceconnect_client.request_user_info(
+                token["access_token"]
+            )
+
+        self.assertEqual(user_info["authorization"], "Bearer test_access_token")
+        self.assertRegex(logs.output[0], r"POST /token returned 200 in \d+ ms")
+        self.assertRegex(logs.output[1], r"GET /userinfo.* returned 200 in \d+ ms")
+
+    def test_connections_are_kept_alive(self):
+        for _ in range(3):
+            self.franceconnect_client.request_user_info("test_access_token")
+        self.assertEqual(self.server.request_count, 3)
+        self.assertEqual(len(self.server.client_ports), 1)
+
+    def test_user_info_is_retried(self):
+        self.server.failures = 2
+        user_info = self.franceconnect_client.request_user_info("test_access_token")
+        self.assertEqual(user_info["sub"], "123")
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_token_request_is_not_retried(self):
+        self.server.failures = 1
+        with self.assertRaises(HTTPError):
+            self.franceconnect_client.request_token("test_code")
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_non_json_server_error_raises_request_exception(self):
+        self.server.failures = 1
+        self.server.failure_status = 502
+        self.server.failure_body = b"<html>Bad Gateway</html>"
+        with self.assertRaises(RequestException):
+            self.franceconnect_client.request_token("test_code")
+        self.assertEqual(self.franceconnect_client.circuit_breaker.state, "closed")
+
+    def test_non_json_body_raises_request_exception(self):
+        self.server.failures = 1
+        self.server.failure_status = 200
+        self.server.failure_body = b""
+        with self.assertRaisesRegex(RequestException, "non-JSON body"):
+            self.franceconnect_client.request_token("test_code")
+
+    def test_slow_franceconnect_times_out(self):
+        self.server.latency = 1
+        with self.assertLogs(level="WARNING"):
+            with self.assertRaises(RequestException):
+                self.franceconnect_client.request_token("test_code")
+
+    def open_circuit_breaker(self):
+        for failures in (0, 0, 1, 1):
+            self.server.failures = failures
+            try:
+                self.franceconnect_client.request_token("test_code")
+            except HTTPError:
+                pass
+
+    def test_breaker_opens_and_fails_fast(self):
+        with self.assertLogs(level="WARNING") as logs:
+            self.open_circuit_breaker()
+        self.assertEqual(
+            logs.output,
+            [
+                "WARNING:root:FC as FS circuit breaker: closed -> open "
+                "(2/4 calls failed)"
+            ],
+        )
+        self.assertEqual(self.franceconnect_client.circuit_breaker.state, "open")
+
+        request_count = self.server.request_count
+        self.server.latency = 1
+        with self.assertLogs(level="WARNING") as logs:
+            with self.assertRaises(FranceConnectUnavailable):
+                self.franceconnect_client.request_token("test_code")
+        self.assertEqual(self.server.request_count, request_count)
+        self.assertIn("not attempted", logs.output[-1])
+
+    def test_breaker_half_opens_then_closes(self):
+        self.open_circuit_breaker()
+        self.assertEqual(self.franceconnect_client.circuit_breaker.state, "open")
+
+        with mock.patch("aidants_connect_web.circuit_breaker.time") as breaker_time:
+            breaker_time.monotonic.return_value = time.monotonic() + 31
+            breaker_time.time.return_value = time.time() + 31
+            self.assertEqual(
+                self.franceconnect_client.circuit_breaker.state, "half-open"
+            )
+            with self.assertLogs(level="WARNING") as logs:
+                token = self.franceconnect_client.request_token("test_code")
+
+        self.assertEqual(token["access_token"], "test_access_token")
+        self.assertEqual(self.franceconnect_client.circuit_breaker.state, "closed")
+        self.assertEqual(
+            logs.output,
+            [
+                "WARNING:root:FC as FS circuit breaker: open -> half-open",
+                "WARNING:root:FC as FS circuit breaker: half-open -> closed",
+            ],
+        )
+        self.assertEqual(
+            self.franceconnect_client.circuit_breaker.transition_counts,
+            {"closed -> open": 1, "open -> half-open": 1, "half-open -> closed": 1},
+        )
+
+    def test_failed_trial_opens_breaker_again(self):
+        self.open_circuit_breaker()
+        self.server.failures = 1
+
+        with mock.patch("aidants_connect_web.circuit_breaker.time") as breaker_time:
+            breaker_time.monotonic.return_value = time.monotonic() + 31
+            with self.assertRaises(HTTPError):
+                self.franceconnect_client.request_token("test_code")
+            self.assertEqual(self.franceconnect_client.circuit_breaker.state, "open")
+
+
+class CircuitBreakerTests(TestCase):
+    def get_circuit_breaker(self, storage):
+        return CircuitBreaker(
+            "test", storage, failure_rate=0.5, min_calls=2, window=60, open_duration=30,
+        )
+
+    def test_only_one_trial_call_when_half_open(self):
+        circuit_breaker = self.get_circuit_breaker(MemoryCircuitBreakerStorage())
+        circuit_breaker.record(success=False)
+        circuit_breaker.record(success=False)
+
+        with mock.patch("aidants_connect_web.circuit_breaker.time") as breaker_time:
+            breaker_time.monotonic.return_value = time.monotonic() + 31
+            self.assertTrue(circuit_breaker.before_call())
+            with self.assertRaises(CircuitBreakerOpen):
+                circuit_breaker.before_call()
+
+    def test_transitions_are_counted_in_redis(self):
+        storage = RedisCircuitBreakerStorage("redis://localhost:1", prefix="test")
+        storage.redis = FakeRedis()
+        circuit_breaker = self.get_circuit_breaker(storage)
+        with self.assertLogs(level="WARNING"):
+            circuit_breaker.record(success=False)
+            circuit_breaker.record(success=False)
+
+        self.assertEqual(
+            storage.redis.hgetall("test:transitions"), {b"closed -> open": b"1"}
+        )
+        self.assertEqual(circuit_breaker.transition_counts, {"closed -> open": 1})
+
+    def test_unreachable_redis_lets_calls_through(self):
+        circuit_breaker = self.get_circuit_breaker(
+            RedisCircuitBreakerStorage("redis://localhost:1", prefix="test")
+        )
+        with self.assertLogs(level="WARNING") as logs:
+            self.assertFalse(circuit_breaker.before_call())
+            circuit_breaker.record(success=False)
+        self.assertIn("storage unavailable", logs.output[0])
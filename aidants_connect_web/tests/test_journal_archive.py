@@ -0,0 +1,221 @@
+from datetime import datetime, timezone
+import gzip
+import os
+from tempfile import TemporaryDirectory
+
+from django.test import override_settings, tag, TestCase
+
+from freezegun import freeze_time
+import mock
+
+from aidants_connect_web.journal_archive import (
+    find_journal_entries,
+    JournalArchiveError,
+    JournalMonthArchive,
+)
+from aidants_connect_web.models import (
+    Journal,
+    JournalArchiveRemoval,
+    JournalDailyRollup,
+)
+from aidants_connect_web.tests.factories import AidantFactory, UsagerFactory
+
+
+@tag("journal_archive")
+class JournalMonthArchiveTests(TestCase):
+    def setUp(self):
+        archive_directory = TemporaryDirectory()
+        self.addCleanup(archive_directory.cleanup)
+        settings_override = override_settings(
+            JOURNAL_ARCHIVE_DIR=archive_directory.name
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.aidant = AidantFactory()
+        self.usager = UsagerFactory()
+        self.month = datetime(2020, 8, 1, tzinfo=timezone.utc)
+        with freeze_time("2020-08-10"):
+            self.connection_entry = Journal.log_connection(self.aidant)
+            self.attestation_entry = Journal.log_attestation_creation(
+                aidant=self.aidant,
+                usager=self.usager,
+                demarches=["argent", "papiers"],
+                duree=365,
+                is_remote_mandat=False,
+                access_token="fjfgjfdkldlzlsmqqxxcn",
+                attestation_hash="test_hash",
+            )
+        with freeze_time("2020-09-01"):
+            self.next_month_entry = Journal.log_connection(self.aidant)
+        self.archive = JournalMonthArchive(self.month)
+
+    def test_export_and_read_entries(self):
+        self.assertEqual(self.archive.export(), 2)
+        self.assertEqual(self.archive.name, "journal_202008.jsonl.gz")
+
+        archived_entries = list(self.archive.read_entries())
+        self.assertEqual(
+            archived_entries, [self.connection_entry, self.attestation_entry]
+        )
+        self.assertEqual(archived_entries[1].attestation_hash, "test_hash")
+        self.assertEqual(
+            list(self.archive.read_ids()),
+            [self.connection_entry.id, self.attestation_entry.id],
+        )
+        self.assertEqual(
+            archived_entries[1].creation_date, self.attestation_entry.creation_date
+        )
+        self.assertEqual(
+            self.archive.find("usager", self.usager.id), [self.attestation_entry]
+        )
+        self.assertEqual(
+            self.archive.find("aidant", self.aidant.id),
+            [self.connection_entry, self.attestation_entry],
+        )
+        self.assertEqual(self.archive.find("attestation_hash", "other_hash"), [])
+
+    @mock.patch.object(JournalMonthArchive, "BLOCK_SIZE", 1)
+    def test_find_only_reads_the_blocks_of_the_entries(self):
+        self.archive.export()
+        ((offset, size, entry_id),) = self.archive.read_index()["usager"][
+            str(self.usager.id)
+        ]
+        self.assertEqual(entry_id, self.attestation_entry.id)
+        self.assertGreater(offset, 0)
+
+        with mock.patch("aidants_connect_web.journal_archive.gzip.open") as gzip_open:
+            self.assertEqual(
+                self.archive.find("usager", self.usager.id), [self.attestation_entry]
+            )
+        gzip_open.assert_not_called()
+
+    def test_months_index_lists_the_archived_months(self):
+        self.archive.export()
+        JournalMonthArchive(datetime(2020, 9, 1, tzinfo=timezone.utc)).export()
+
+        months_index = JournalMonthArchive.read_months_index()
+        self.assertEqual(months_index["usager"], {str(self.usager.id): ["202008"]})
+        self.assertEqual(
+            months_index["aidant"], {str(self.aidant.id): ["202008", "202009"]}
+        )
+        self.assertEqual(months_index["attestation_hash"], {"test_hash": ["202008"]})
+
+    def test_export_appends_new_entries_only(self):
+        self.archive.export()
+        with freeze_time("2020-08-20"):
+            late_entry = Journal.log_connection(self.aidant)
+
+        self.assertEqual(self.archive.export(), 1)
+        self.assertEqual(self.archive.export(), 0)
+        self.assertEqual(
+            list(self.archive.read_entries()),
+            [self.connection_entry, self.attestation_entry, late_entry],
+        )
+        self.assertEqual(self.archive.read_index()["entry_count"], 3)
+
+    def test_interrupted_export_is_rolled_back(self):
+        self.archive.export()
+        index = self.archive.read_index()
+        # An export which stopped before writing its index
+        with freeze_time("2020-08-20"):
+            late_entry = Journal.log_connection(self.aidant)
+        with gzip.open(self.archive.path, "at") as archive_file:
+            archive_file.write('{"partial": ')
+        self.assertGreater(os.path.getsize(self.archive.path), index["archive_size"])
+
+        self.assertEqual(self.archive.export(), 1)
+        self.assertEqual(
+            list(self.archive.read_entries()),
+            [self.connection_entry, self.attestation_entry, late_entry],
+        )
+
+    def test_remove_from_journal(self):
+        self.archive.export()
+        with self.assertRaisesRegex(JournalArchiveError, "not rolled up"):
+            self.archive.remove_from_journal(removed_by="Admin")
+
+        JournalDailyRollup.objects.roll_up()
+        removal = self.archive.remove_from_journal(removed_by="Admin")
+
+        self.assertEqual(list(Journal.objects.all()), [self.next_month_entry])
+        self.assertEqual(removal.entry_count, 2)
+        self.assertEqual(removal.last_entry_id, self.attestation_entry.id)
+        self.assertEqual(removal.archive_sha256, self.archive.get_sha256())
+        self.assertEqual(JournalArchiveRemoval.objects.get(), removal)
+
+    def test_entries_are_not_removed_when_the_archive_does_not_match(self):
+        self.archive.export()
+        JournalDailyRollup.objects.roll_up()
+        with open(self.archive.path, "ab") as archive_file:
+            archive_file.write(b"\0")
+
+        with self.assertRaisesRegex(JournalArchiveError, "SHA-256"):
+            self.archive.remove_from_journal(removed_by="Admin")
+        os.remove(self.archive.path)
+        with self.assertRaisesRegex(JournalArchiveError, "SHA-256"):
+            self.archive.remove_from_journal(removed_by="Admin")
+        self.assertEqual(Journal.objects.count(), 3)
+
+    @override_settings(JOURNAL_ARCHIVE_DIR=None)
+    def test_archive_directory_must_be_set(self):
+        with self.assertRaises(JournalArchiveError):
+            JournalMonthArchive(self.month)
+        self.assertEqual(JournalMonthArchive.list(), [])
+        self.assertEqual(
+            find_journal_entries(usager=self.usager), [self.attestation_entry]
+        )
+
+    def test_entries_missing_from_archive_are_not_removed(self):
+        self.archive.export()
+        with freeze_time("2020-08-20"):
+            Journal.log_connection(self.aidant)
+        JournalDailyRollup.objects.roll_up()
+
+        with self.assertRaisesRegex(JournalArchiveError, "1 entries"):
+            self.archive.remove_from_journal(removed_by="Admin")
+        self.assertEqual(Journal.objects.count(), 4)
+        self.assertFalse(JournalArchiveRemoval.objects.exists())
+
+    def test_find_journal_entries_does_not_repeat_exported_entries(self):
+        self.archive.export()
+        with freeze_time("2020-08-20"):
+            late_entry = Journal.log_connection(self.aidant)
+
+        self.assertEqual(
+            find_journal_entries(aidant=self.aidant),
+            [
+                self.connection_entry,
+                self.attestation_entry,
+                self.next_month_entry,
+                late_entry,
+            ],
+        )
+
+    def test_find_journal_entries_merges_journal_and_archive(self):
+        self.assertEqual(
+            find_journal_entries(usager=self.usager), [self.attestation_entry]
+        )
+
+        self.archive.export()
+        JournalDailyRollup.objects.roll_up()
+        self.archive.remove_from_journal(removed_by="Admin")
+
+        self.assertEqual(
+            [archive.path for archive in JournalMonthArchive.list()],
+            [self.archive.path],
+        )
+        self.assertEqual(
+            find_journal_entries(usager=self.usager), [self.attestation_entry]
+        )
+        self.assertEqual(
+            find_journal_entries(attestation_hash="test_hash"),
+            [self.attestation_entry],
+        )
+        # The archived entries of the aidant come with those left in the journal.
+        self.assertEqual(
+            find_journal_entries(aidant=self.aidant),
+            [self.connection_entry, self.attestation_entry, self.next_month_entry],
+        )
+        with self.assertRaises(ValueError):
+            find_journal_entries(action="connect_aidant")
@@ -0,0 +1,120 @@
+from datetime import datetime, timezone
+import json
+
+from django.test import RequestFactory, tag, TestCase
+from django.utils.html import escape
+
+from freezegun import freeze_time
+
+from aidants_connect_web.admin import admin_site, JournalAdmin
+from aidants_connect_web.journal_export import (
+    EXPORTED_FIELDS,
+    filter_journal,
+    iter_csv,
+    iter_jsonl,
+)
+from aidants_connect_web.models import Journal
+from aidants_connect_web.tests.factories import AidantFactory, UsagerFactory
+
+
+@tag("journal_export")
+class JournalExportTests(TestCase):
+    def setUp(self):
+        self.aidant = AidantFactory()
+        self.other_aidant = AidantFactory(username="other@test.user")
+        self.usager = UsagerFactory()
+        with freeze_time("2020-03-01"):
+            self.franceconnect_entry = Journal.log_franceconnection_usager(
+                self.aidant, self.usager
+            )
+        with freeze_time("2021-01-05"):
+            self.connection_entry = Journal.log_connection(self.aidant)
+            self.other_entry = Journal.log_connection(self.other_aidant)
+
+    def test_filter_journal(self):
+        self.assertEqual(
+            list(filter_journal(usager=self.usager)), [self.franceconnect_entry]
+        )
+        self.assertEqual(
+            set(filter_journal(organisation=self.other_aidant.organisation)),
+            {self.other_entry},
+        )
+        self.assertEqual(
+            list(
+                filter_journal(
+                    aidant=self.aidant,
+                    start=datetime(2020, 1, 1, tzinfo=timezone.utc),
+                    end=datetime(2021, 1, 1, tzinfo=timezone.utc),
+                )
+            ),
+            [self.franceconnect_entry],
+        )
+        self.assertEqual(
+            list(filter_journal(action="connect_aidant").order_by("id")),
+            [self.connection_entry, self.other_entry],
+        )
+
+    def test_iter_csv(self):
+        lines = list(iter_csv(Journal.objects.all(), chunk_size=1))
+
+        self.assertEqual(lines[0], ",".join(EXPORTED_FIELDS) + "\r\n")
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith(f"{self.franceconnect_entry.id},"))
+        self.assertIn(",franceconnect_usager,", lines[1])
+        self.assertNotIn("access_token", lines[0])
+
+    def test_iter_jsonl(self):
+        entries = [
+            json.loads(line)
+            for line in iter_jsonl(filter_journal(aidant=self.aidant), chunk_size=1)
+        ]
+
+        self.assertEqual(
+            [entry["id"] for entry in entries],
+            [self.franceconnect_entry.id, self.connection_entry.id],
+        )
+        self.assertEqual(entries[0]["usager_id"], self.usager.id)
+        self.assertEqual(
+            entries[0]["aidant__organisation_id"], self.aidant.organisation_id
+        )
+        self.assertEqual(entries[1]["creation_date"], "2021-01-05T00:00:00Z")
+
+    def test_admin_export_actions(self):
+        journal_admin = JournalAdmin(Journal, admin_site)
+        request = RequestFactory().get("/")
+        request.user = AidantFactory(username="staff@test.user", is_staff=True)
+        self.assertNotIn("export_as_csv", journal_admin.get_actions(request))
+
+        request.user = AidantFactory(username="admin@test.user", is_superuser=True)
+        self.assertIn("export_as_jsonl", journal_admin.get_actions(request))
+        response = journal_admin.export_as_csv(
+            request, Journal.objects.filter(usager=self.usager)
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn(".csv", response["Content-Disposition"])
+        self.assertEqual(len(list(response.streaming_content)), 2)
+
+    def test_admin_filters_do_not_list_every_organisation(self):
+        journal_admin = JournalAdmin(Journal, admin_site)
+        request = RequestFactory().get(
+            "/", {"aidant__organisation__id__exact": self.aidant.organisation_id}
+        )
+        request.user = AidantFactory(username="admin@test.user", is_superuser=True)
+        request.user.is_verified = lambda: True
+
+        response = journal_admin.changelist_view(request)
+        response.render()
+
+        self.assertEqual(
+            set(response.context_data["cl"].result_list),
+            {self.franceconnect_entry, self.connection_entry},
+        )
+        self.assertContains(
+            response,
+            f'<option value="{self.aidant.organisation_id}" selected>'
+            f"{escape(self.aidant.organisation)}</option>",
+        )
+        self.assertNotContains(
+            response, f'<option value="{self.other_aidant.organisation_id}"'
+        )
@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import tag, TestCase
+from django.utils import timezone
+
+from aidants_connect_web.mandat_creation import create_mandat
+from aidants_connect_web.models import Aidant, Autorisation, AutorisationIndex, Journal
+from aidants_connect_web.tests.factories import (
+    AidantFactory,
+    AutorisationFactory,
+    ConnectionFactory,
+    MandatFactory,
+    UsagerFactory,
+)
+
+
+@tag("mandat_creation")
+class CreateMandatTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aidant = AidantFactory()
+        cls.usager = UsagerFactory()
+        cls.demarches = sorted(settings.DEMARCHES.keys())
+
+        # Every démarche already has an active autorisation
+        cls.previous_mandat = MandatFactory(
+            organisation=cls.aidant.organisation,
+            usager=cls.usager,
+            expiration_date=timezone.now() + timedelta(days=6),
+        )
+        for demarche in cls.demarches:
+            AutorisationFactory(mandat=cls.previous_mandat, demarche=demarche)
+
+    def create_mandat(self, aidant, demarches):
+        connection = ConnectionFactory(
+            aidant=aidant,
+            usager=self.usager,
+            demarches=demarches,
+            duree_keyword="LONG",
+            access_token="fake_access_token",
+        )
+        with self.assertNumQueries(13):
+            return create_mandat(
+                aidant=aidant,
+                connection=connection,
+                expiration_date=timezone.now() + timedelta(days=365),
+                duree=365,
+                attestation_hash="fake_attestation_hash",
+                mandat_template_path=settings.MANDAT_TEMPLATE_PATH,
+            )
+
+    def test_create_mandat_query_budget_does_not_depend_on_demarches(self):
+        self.create_mandat(self.aidant, ["papiers"])
+        self.create_mandat(self.aidant, self.demarches)
+
+    def test_create_mandat_writes_autorisations_and_journal(self):
+        aidant = Aidant.objects.get(pk=self.aidant.pk)
+        mandat = self.create_mandat(aidant, ["papiers", "argent"])
+
+        self.assertEqual(
+            list(mandat.autorisations.values_list("demarche", flat=True)),
+            ["argent", "papiers"],
+        )
+        self.assertEqual(
+            list(
+                Autorisation.objects.filter(
+                    mandat=self.previous_mandat, revocation_date__isnull=False
+                )
+                .order_by("demarche")
+                .values_list("demarche", flat=True)
+            ),
+            ["argent", "papiers"],
+        )
+
+        journal_entries = list(Journal.objects.order_by("id"))
+        self.assertEqual(
+            [(entry.action, entry.demarche) for entry in journal_entries],
+            [
+                ("create_attestation", "argent,papiers"),
+                ("cancel_autorisation", "argent"),
+                ("create_autorisation", "argent"),
+                ("cancel_autorisation", "papiers"),
+                ("create_autorisation", "papiers"),
+            ],
+        )
+        self.assertEqual(
+            journal_entries[0].mandat_template_path, settings.MANDAT_TEMPLATE_PATH
+        )
+        self.assertEqual(journal_entries[2].duree, 365)
+        self.assertEqual(journal_entries[1].duree, 6)
+
+        aidant.refresh_from_db()
+        self.assertEqual(aidant.last_action_date, journal_entries[-1].creation_date)
+        self.assertEqual(
+            AutorisationIndex.objects.get_for(
+                aidant.organisation, self.usager
+            ).demarches["papiers"],
+            mandat.expiration_date.isoformat(),
+        )
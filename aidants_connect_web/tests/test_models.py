@@ -1,22 +1,28 @@
 from datetime import date, datetime, timedelta
 
+from django.db import connection as db_connection
 from django.db.utils import IntegrityError
 from django.test import tag, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.conf import settings
 
 from freezegun import freeze_time
 from pytz import timezone as pytz_timezone
 
+from aidants_connect_web.journal_export import filter_journal
 from aidants_connect_web.models import (
     Aidant,
     Autorisation,
+    AutorisationIndex,
     Connection,
     Journal,
+    JournalDailyRollup,
     Mandat,
     Organisation,
     Usager,
 )
+from aidants_connect_web.search import NAME_SEARCH_INDEX, name_search_is_indexed
 from aidants_connect_web.tests.factories import (
     AidantFactory,
     MandatFactory,
@@ -59,6 +65,131 @@ class ConnectionModelTests(TestCase):
         self.assertEqual(second_saved_item.usager.gender, Usager.GENDER_MALE)
 
 
+class IndexUsageTestCase(TestCase):
+    def forbid_sequential_scans(self):
+        # Test tables are tiny, so Postgres would rightly prefer a sequential scan:
+        # forbid it for the duration of the test transaction.
+        with db_connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        self.forbid_sequential_scans()
+        self.assertIn(index_name, queryset.explain())
+
+    def assertQueriesUseIndex(self, func, index_name):
+        """
+        Run `func`, then check that the plan of one of its queries uses the index.
+        """
+        self.forbid_sequential_scans()
+        with CaptureQueriesContext(db_connection) as queries:
+            func()
+        plans = []
+        with db_connection.cursor() as cursor:
+            for query in queries:
+                if query["sql"].startswith("SELECT"):
+                    cursor.execute(f"EXPLAIN {query['sql']}")
+                    plans.extend(row[0] for row in cursor.fetchall())
+        self.assertIn(index_name, "\n".join(plans))
+
+
+@tag("models")
+class ConnectionIndexesTests(IndexUsageTestCase):
+    def test_lookup_by_state_uses_index(self):
+        self.assertUsesIndex(
+            Connection.objects.filter(state="aZeRtY"), "connection_state_idx"
+        )
+
+    def test_lookup_by_code_uses_index(self):
+        self.assertUsesIndex(
+            Connection.objects.filter(code="ert"), "connection_code_idx"
+        )
+
+    def test_lookup_by_access_token_uses_index(self):
+        self.assertUsesIndex(
+            Connection.objects.filter(access_token="token"),
+            "connection_access_token_idx",
+        )
+
+
+@tag("models")
+class HotQueriesIndexesTests(IndexUsageTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aidant = AidantFactory()
+        cls.usager = UsagerFactory()
+        cls.mandat = MandatFactory(
+            organisation=cls.aidant.organisation, usager=cls.usager
+        )
+        # Give the planner statistics where neither the aidant nor the action
+        # alone is selective, and where the usagers do not fit in a page.
+        with freeze_time(timezone.now() - timedelta(days=365)):
+            Journal.objects.bulk_create(
+                Journal(
+                    aidant=cls.aidant,
+                    action="create_attestation",
+                    access_token=f"t{i}",
+                )
+                for i in range(500)
+            )
+        for i in range(200):
+            MandatFactory(
+                organisation=cls.aidant.organisation, usager__family_name=f"Nom {i}"
+            )
+        with db_connection.cursor() as cursor:
+            for model in (Journal, Mandat, Usager):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    def test_mandats_of_an_usager_use_index(self):
+        # The mandats listed on the page of an usager
+        self.assertQueriesUseIndex(
+            lambda: Mandat.objects.filter(
+                organisation=self.aidant.organisation, usager=self.usager
+            ).split_by_activity(),
+            "mandat_orga_usager_exp_idx",
+        )
+
+    def test_active_mandats_use_unrevoked_autorisations_index(self):
+        self.assertUsesIndex(
+            Mandat.objects.filter(organisation=self.aidant.organisation).active(),
+            "autorisation_unrevoked_idx",
+        )
+
+    def test_journal_of_an_aidant_uses_index(self):
+        # The journal export of an aidant
+        self.assertUsesIndex(
+            filter_journal(
+                aidant=self.aidant, start=timezone.now() - timedelta(days=30)
+            ),
+            "journal_aidant_date_idx",
+        )
+
+    def test_journal_create_attestation_uses_index(self):
+        self.assertQueriesUseIndex(
+            lambda: self.aidant.get_journal_create_attestation("token"),
+            "journal_aidant_token_idx",
+        )
+
+    def test_recent_actions_use_index(self):
+        self.assertUsesIndex(
+            filter_journal(
+                action="use_autorisation", start=timezone.now() - timedelta(days=30)
+            ),
+            "journal_action_date_idx",
+        )
+
+    def test_usagers_of_an_aidant_use_name_index(self):
+        # The first page of the usagers list
+        self.assertUsesIndex(
+            self.aidant.get_usagers().ordered_after()[:50], "usager_name_idx"
+        )
+
+    def test_next_usagers_of_an_aidant_use_name_index(self):
+        # The following pages of the usagers list, the key bounding the index scan
+        usagers = self.aidant.get_usagers().ordered_after(("Dupont", "Jean", 1))
+        self.assertUsesIndex(usagers[:50], "usager_name_idx")
+        self.assertIn("Index Cond: (ROW(", usagers[:50].explain())
+
+
 @tag("models")
 class UsagerModelTests(TestCase):
     def test_usager_with_null_birthplace(self):
@@ -126,6 +257,37 @@ class UsagerModelTests(TestCase):
         self.assertEqual(usager.birthplace, "12345")
 
 
+@tag("models")
+class UsagerSearchTests(IndexUsageTestCase):
+    def setUp(self):
+        self.homer = UsagerFactory()
+        self.marge = UsagerFactory(given_name="Marge", family_name="Bouvier-Simpson")
+        self.helene = UsagerFactory(given_name="Hélène", family_name="Lovejoy")
+
+    def test_search_matches_each_word(self):
+        self.assertEqual(
+            list(Usager.objects.search("simpson").order_by("id")),
+            [self.homer, self.marge],
+        )
+        self.assertEqual(list(Usager.objects.search("HOMER  simp")), [self.homer])
+        self.assertEqual(list(Usager.objects.search("homer bouvier")), [])
+        self.assertEqual(list(Usager.objects.search("100%")), [])
+
+    def test_search_matches_like_wildcards_literally(self):
+        jean_paul = UsagerFactory(given_name="Jean_Paul", family_name="100%")
+
+        for terms in ("s_mpson", "jean%paul", "\\"):
+            self.assertEqual(list(Usager.objects.search(terms)), [], terms)
+        self.assertEqual(list(Usager.objects.search("n_p 100%")), [jean_paul])
+
+    def test_search_ignores_accents_through_index(self):
+        if not name_search_is_indexed():
+            self.skipTest("The pg_trgm and unaccent extensions are not available")
+        self.assertEqual(list(Usager.objects.search("helene")), [self.helene])
+        self.assertEqual(list(Usager.objects.search("HÉLÈNE love")), [self.helene])
+        self.assertUsesIndex(Usager.objects.search("lovejoy"), NAME_SEARCH_INDEX)
+
+
 @tag("models")
 class MandatModelTests(TestCase):
     def setUp(self):
@@ -232,6 +394,50 @@ class MandatModelTests(TestCase):
         self.assertEqual(active_mandats, 2)
         self.assertEqual(inactive_mandats, 1)
 
+    def test_active_queryset_method_include_mandat_without_autorisation(self):
+        Mandat.objects.create(
+            organisation=self.organisation_1,
+            usager=self.usager_2,
+            creation_date=timezone.now(),
+            duree_keyword="SHORT",
+            expiration_date=timezone.now() + timedelta(days=1),
+        )
+
+        self.assertEqual(Mandat.objects.active().count(), 3)
+        self.assertEqual(Mandat.objects.inactive().count(), 0)
+
+    def test_active_and_inactive_querysets_do_not_need_distinct(self):
+        self.assertNotIn("DISTINCT", str(Mandat.objects.active().query))
+        self.assertNotIn("DISTINCT", str(Mandat.objects.inactive().query))
+        self.assertNotIn("DISTINCT", str(Usager.objects.active().query))
+        self.assertNotIn("DISTINCT", str(self.aidant_1.get_usagers().active().query))
+        self.assertEqual(len(Usager.objects.active()), 2)
+
+    def test_split_by_activity_matches_active_and_inactive_querysets(self):
+        expired_mandat = MandatFactory(
+            organisation=self.organisation_1,
+            usager=self.usager_2,
+            expiration_date=timezone.now() - timedelta(days=1),
+        )
+        AutorisationFactory(mandat=expired_mandat)
+        revoked_mandat = MandatFactory(
+            organisation=self.organisation_1, usager=self.usager_2
+        )
+        AutorisationFactory(mandat=revoked_mandat, revocation_date=timezone.now())
+        empty_mandat = MandatFactory(
+            organisation=self.organisation_1, usager=self.usager_2
+        )
+
+        with self.assertNumQueries(2):
+            active_mandats, inactive_mandats = Mandat.objects.split_by_activity()
+
+        self.assertCountEqual(active_mandats, Mandat.objects.active())
+        self.assertCountEqual(inactive_mandats, [expired_mandat, revoked_mandat])
+        self.assertEqual(
+            {mandat: mandat.autorisation_count for mandat in active_mandats},
+            {self.mandat_1: 1, self.mandat_2: 2, empty_mandat: 0},
+        )
+
 
 @tag("models")
 class AutorisationModelTests(TestCase):
@@ -289,6 +495,128 @@ class AutorisationModelTests(TestCase):
         )
 
 
+@tag("models")
+class AutorisationIndexModelTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aidant_marge = AidantFactory(username="Marge")
+        cls.usager_homer = UsagerFactory()
+        cls.mandat_marge_homer_6 = MandatFactory(
+            organisation=cls.aidant_marge.organisation,
+            usager=cls.usager_homer,
+            expiration_date=timezone.now() + timedelta(days=6),
+        )
+        cls.mandat_marge_homer_365 = MandatFactory(
+            organisation=cls.aidant_marge.organisation,
+            usager=cls.usager_homer,
+            expiration_date=timezone.now() + timedelta(days=365),
+        )
+
+    def get_index(self):
+        return AutorisationIndex.objects.get_for(
+            self.aidant_marge.organisation, self.usager_homer
+        )
+
+    def test_index_follows_autorisation_creation(self):
+        self.assertIsNone(self.get_index())
+
+        AutorisationFactory(mandat=self.mandat_marge_homer_6, demarche="papiers")
+        AutorisationFactory(mandat=self.mandat_marge_homer_365, demarche="social")
+
+        autorisation_index = self.get_index()
+        self.assertCountEqual(
+            autorisation_index.get_active_demarches(), ["papiers", "social"]
+        )
+        self.assertEqual(
+            autorisation_index.expiration_date,
+            self.mandat_marge_homer_365.expiration_date,
+        )
+
+    def test_index_follows_autorisation_revocation(self):
+        autorisation = AutorisationFactory(
+            mandat=self.mandat_marge_homer_6, demarche="papiers"
+        )
+        AutorisationFactory(mandat=self.mandat_marge_homer_365, demarche="social")
+
+        autorisation.revoke(self.aidant_marge)
+
+        self.assertEqual(self.get_index().get_active_demarches(), ["social"])
+
+    def test_index_is_ignored_once_every_autorisation_has_expired(self):
+        AutorisationFactory(mandat=self.mandat_marge_homer_6, demarche="papiers")
+        AutorisationFactory(mandat=self.mandat_marge_homer_365, demarche="social")
+
+        with freeze_time(timezone.now() + timedelta(days=7)):
+            self.assertEqual(self.get_index().get_active_demarches(), ["social"])
+
+        with freeze_time(timezone.now() + timedelta(days=366)):
+            with self.assertNumQueries(1):
+                self.assertIsNone(self.get_index())
+        # Reading the index does not write to it.
+        self.assertEqual(AutorisationIndex.objects.count(), 1)
+
+    def test_index_follows_mandat_moved_to_another_usager(self):
+        AutorisationFactory(mandat=self.mandat_marge_homer_6, demarche="papiers")
+        AutorisationFactory(mandat=self.mandat_marge_homer_365, demarche="social")
+        usager_bart = UsagerFactory()
+
+        mandat = Mandat.objects.get(pk=self.mandat_marge_homer_365.pk)
+        mandat.usager = usager_bart
+        mandat.save()
+
+        self.assertEqual(self.get_index().get_active_demarches(), ["papiers"])
+        self.assertEqual(
+            AutorisationIndex.objects.get_for(
+                self.aidant_marge.organisation, usager_bart
+            ).get_active_demarches(),
+            ["social"],
+        )
+
+    def test_index_refresh_does_not_load_the_mandat(self):
+        AutorisationFactory(mandat=self.mandat_marge_homer_6, demarche="papiers")
+        autorisation = Autorisation.objects.get()
+
+        autorisation.revocation_date = timezone.now()
+        autorisation.save()
+
+        self.assertFalse(Autorisation.mandat.is_cached(autorisation))
+        self.assertIsNone(self.get_index())
+
+    def test_index_holds_the_latest_autorisation_of_each_demarche(self):
+        AutorisationFactory(mandat=self.mandat_marge_homer_6, demarche="papiers")
+        latest_papiers = AutorisationFactory(
+            mandat=self.mandat_marge_homer_365, demarche="papiers"
+        )
+
+        self.assertEqual(
+            self.get_index().autorisation_ids, {"papiers": latest_papiers.id}
+        )
+
+    def test_permission_checks_use_a_single_query(self):
+        autorisation = AutorisationFactory(
+            mandat=self.mandat_marge_homer_6, demarche="papiers"
+        )
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(
+                self.aidant_marge.get_valid_autorisation("social", self.usager_homer)
+            )
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.aidant_marge.get_valid_autorisation("papiers", self.usager_homer),
+                autorisation,
+            )
+        with freeze_time(timezone.now() + timedelta(days=7)):
+            self.assertIsNone(
+                self.aidant_marge.get_valid_autorisation("papiers", self.usager_homer)
+            )
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.aidant_marge.get_active_demarches_for_usager(self.usager_homer),
+                ["papiers"],
+            )
+
+
 @tag("models")
 class OrganisationModelTests(TestCase):
     def test_create_and_retrieve_organisation(self):
@@ -612,6 +940,34 @@ class JournalModelTests(TestCase):
         self.assertEqual(entry.action, "connect_aidant")
         self.assertEqual(entry.aidant.id, self.aidant_thierry.id)
 
+    def test_logging_updates_aidant_last_action_date(self):
+        aidant = Aidant.objects.get(pk=self.aidant_thierry.pk)
+        with freeze_time(timezone.now() + timedelta(hours=1)):
+            entry = Journal.log_activity_check(aidant=aidant)
+
+        self.assertEqual(aidant.last_action_date, entry.creation_date)
+        aidant.refresh_from_db()
+        self.assertEqual(aidant.last_action_date, entry.creation_date)
+
+    def test_logging_does_not_move_aidant_last_action_date_back(self):
+        aidant = Aidant.objects.get(pk=self.aidant_thierry.pk)
+        last_entry = Journal.log_activity_check(aidant=aidant)
+        with freeze_time(timezone.now() - timedelta(hours=1)):
+            Journal.log_activity_check(aidant=aidant)
+
+        self.assertEqual(aidant.last_action_date, last_entry.creation_date)
+        aidant.refresh_from_db()
+        self.assertEqual(aidant.last_action_date, last_entry.creation_date)
+
+    def test_get_last_action_timestamp_does_not_query_the_journal(self):
+        aidant = Aidant.objects.get(pk=self.aidant_thierry.pk)
+        with self.assertNumQueries(0):
+            last_action_timestamp = aidant.get_last_action_timestamp()
+        self.assertEqual(
+            last_action_timestamp,
+            Journal.objects.filter(aidant=aidant).last().creation_date,
+        )
+
     def test_a_franceconnect_usager_journal_entry_can_be_created(self):
         entry = Journal.log_franceconnection_usager(
             aidant=self.aidant_thierry, usager=self.usager_ned,
@@ -711,3 +1067,126 @@ class JournalModelTests(TestCase):
         self.assertTrue(
             validate_attestation_hash(attestation_string, entry.attestation_hash)
         )
+
+
+@tag("models", "journal")
+class JournalDailyRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.aidant_thierry = AidantFactory()
+        cls.aidant_staff = AidantFactory(
+            username="staff@staff.fr",
+            organisation=OrganisationFactory(name=settings.STAFF_ORGANISATION_NAME),
+        )
+        cls.usager = UsagerFactory()
+        cls.autorisation = AutorisationFactory(
+            mandat=MandatFactory(
+                organisation=cls.aidant_thierry.organisation, usager=cls.usager
+            ),
+            demarche="papiers",
+        )
+
+        with freeze_time(datetime(2020, 9, 1, 10, tzinfo=timezone.utc)):
+            Journal.log_connection(cls.aidant_thierry)
+            cls.log_use(cls.aidant_thierry)
+            cls.log_use(cls.aidant_thierry)
+            cls.log_use(cls.aidant_staff)
+        with freeze_time(datetime(2020, 9, 2, 10, tzinfo=timezone.utc)):
+            cls.log_use(cls.aidant_thierry)
+
+    @classmethod
+    def log_use(cls, aidant):
+        Journal.log_autorisation_use(
+            aidant, cls.usager, "papiers", "fake_access_token", cls.autorisation
+        )
+
+    def test_roll_up_counts_entries_per_day_organisation_action_and_demarche(self):
+        self.assertEqual(JournalDailyRollup.objects.roll_up(), 5)
+
+        self.assertEqual(
+            list(
+                JournalDailyRollup.objects.order_by(
+                    "day", "organisation__name", "action"
+                ).values_list("day", "organisation", "action", "demarche", "count")
+            ),
+            [
+                (
+                    date(2020, 9, 1),
+                    self.aidant_staff.organisation.id,
+                    "use_autorisation",
+                    "papiers",
+                    1,
+                ),
+                (
+                    date(2020, 9, 1),
+                    self.aidant_thierry.organisation.id,
+                    "connect_aidant",
+                    "",
+                    1,
+                ),
+                (
+                    date(2020, 9, 1),
+                    self.aidant_thierry.organisation.id,
+                    "use_autorisation",
+                    "papiers",
+                    2,
+                ),
+                (
+                    date(2020, 9, 2),
+                    self.aidant_thierry.organisation.id,
+                    "use_autorisation",
+                    "papiers",
+                    1,
+                ),
+            ],
+        )
+
+    def test_roll_up_only_counts_new_entries(self):
+        JournalDailyRollup.objects.roll_up()
+        self.assertEqual(JournalDailyRollup.objects.roll_up(), 0)
+
+        with freeze_time(datetime(2020, 9, 2, 11, tzinfo=timezone.utc)):
+            self.log_use(self.aidant_thierry)
+        self.assertEqual(JournalDailyRollup.objects.roll_up(), 1)
+        self.assertEqual(JournalDailyRollup.objects.get(day=date(2020, 9, 2)).count, 2)
+
+    def test_roll_up_leaves_the_most_recent_entries_to_the_next_run(self):
+        JournalDailyRollup.objects.roll_up()
+        self.log_use(self.aidant_thierry)
+        self.assertEqual(JournalDailyRollup.objects.roll_up(), 0)
+
+        with freeze_time(timezone.now() + timedelta(minutes=10)):
+            self.assertEqual(JournalDailyRollup.objects.roll_up(), 1)
+
+    def test_roll_up_in_chunks(self):
+        self.assertEqual(JournalDailyRollup.objects.roll_up(chunk_size=2), 5)
+        self.assertEqual(JournalDailyRollup.objects.total(), 5)
+        self.assertEqual(
+            JournalDailyRollup.objects.get(
+                day=date(2020, 9, 1),
+                organisation=self.aidant_thierry.organisation,
+                action="use_autorisation",
+            ).count,
+            2,
+        )
+
+    def test_totals(self):
+        JournalDailyRollup.objects.roll_up()
+        uses = JournalDailyRollup.objects.excluding_staff().filter(
+            action="use_autorisation"
+        )
+
+        self.assertEqual(uses.total(), 3)
+        self.assertEqual(
+            uses.for_period(date(2020, 9, 2), date(2020, 9, 30)).total(), 1
+        )
+        self.assertEqual(
+            list(uses.per_day()),
+            [
+                {"day": date(2020, 9, 1), "total": 2},
+                {"day": date(2020, 9, 2), "total": 1},
+            ],
+        )
+        self.assertEqual(
+            list(uses.per_demarche()), [{"demarche": "papiers", "total": 3}]
+        )
@@ -0,0 +1,245 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection as db_connection
+from django.test import tag, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from freezegun import freeze_time
+import mock
+
+from aidants_connect_web.models import Connection, Journal
+from aidants_connect_web.partitioning import (
+    connection_partitioning,
+    journal_partitioning,
+    PartitioningError,
+    supports_partitioning,
+)
+from aidants_connect_web.tasks import create_journal_partitions
+from aidants_connect_web.tests.factories import AidantFactory, ConnectionFactory
+
+
+@tag("partitioning")
+class ConnectionPartitioningTests(TestCase):
+    def setUp(self):
+        if not connection_partitioning.is_partitioned():
+            self.skipTest("Partitioning needs PostgreSQL 11 or above")
+        self.now = timezone.now()
+
+    def get_partition(self, connection: Connection) -> str:
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text "
+                "FROM aidants_connect_web_connection WHERE id = %s",
+                [connection.id],
+            )
+            return cursor.fetchone()[0]
+
+    def test_connection_is_stored_in_the_partition_of_its_expiration_day(self):
+        connection = ConnectionFactory(expires_on=self.now + timedelta(days=1))
+        start, _ = connection_partitioning.get_bounds(connection.expires_on)
+        self.assertEqual(
+            self.get_partition(connection),
+            connection_partitioning.get_partition_name(start),
+        )
+
+        old_connection = ConnectionFactory(expires_on=self.now - timedelta(days=365))
+        self.assertEqual(
+            self.get_partition(old_connection), "aidants_connect_web_connection_default"
+        )
+
+    def test_new_partition_takes_its_rows_from_the_default_partition(self):
+        later = self.now + timedelta(days=60)
+        connection = ConnectionFactory(expires_on=later)
+        self.assertEqual(
+            self.get_partition(connection), "aidants_connect_web_connection_default"
+        )
+
+        created_partitions = connection_partitioning.create_partitions(
+            until=later, since=later
+        )
+        self.assertEqual(
+            created_partitions,
+            [
+                connection_partitioning.get_partition_name(
+                    connection_partitioning.get_bounds(later)[0]
+                )
+            ],
+        )
+        self.assertEqual(self.get_partition(connection), created_partitions[0])
+        self.assertEqual(
+            connection_partitioning.create_partitions(until=later, since=later), []
+        )
+
+    def test_expired_partitions_are_dropped(self):
+        three_days_ago = self.now - timedelta(days=3)
+        expired_connection = ConnectionFactory(expires_on=three_days_ago)
+        connection = ConnectionFactory(expires_on=self.now + timedelta(minutes=5))
+        connection_partitioning.create_partitions(
+            until=self.now - timedelta(days=2), since=three_days_ago
+        )
+
+        dropped_partitions = connection_partitioning.drop_partitions(before=self.now)
+
+        self.assertEqual(len(dropped_partitions), 2)
+        self.assertEqual(list(Connection.objects.all()), [connection])
+        self.assertNotIn(self.get_partition(connection), dropped_partitions)
+        self.assertNotIn(expired_connection, Connection.objects.all())
+
+    def test_manage_connection_partitions(self):
+        with self.assertLogs(level="INFO") as logs:
+            call_command("manage_connection_partitions", days_ahead=30)
+
+        last_partition = connection_partitioning.list_partitions()[-1]
+        self.assertEqual(
+            last_partition[1],
+            connection_partitioning.get_bounds(self.now + timedelta(days=30))[0],
+        )
+        self.assertRegex(logs.output[-1], r"created \d+ partitions")
+
+
+@tag("partitioning")
+class JournalPartitioningTests(TestCase):
+    # The conversion happens in the transaction of the test, rolled back after it.
+    def setUp(self):
+        if not supports_partitioning() or journal_partitioning.is_partitioned():
+            self.skipTest("Partitioning needs PostgreSQL 11 or above")
+        self.aidant = AidantFactory()
+        self.entries = []
+        for creation_date in (
+            datetime(2020, 7, 31, 23, 59, tzinfo=timezone.utc),
+            datetime(2020, 8, 1, tzinfo=timezone.utc),
+            datetime(2020, 8, 15, tzinfo=timezone.utc),
+            datetime(2020, 10, 3, tzinfo=timezone.utc),
+        ):
+            with freeze_time(creation_date):
+                self.entries.append(Journal.log_connection(self.aidant))
+        self.until = datetime(2020, 11, 1, tzinfo=timezone.utc)
+
+    def get_partition(self, entry: Journal) -> str:
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text "
+                "FROM aidants_connect_web_journal WHERE id = %s",
+                [entry.id],
+            )
+            return cursor.fetchone()[0]
+
+    def test_journal_is_partitioned_by_month(self):
+        copied_count = journal_partitioning.partition_table_online(
+            until=self.until, chunk_size=3
+        )
+
+        self.assertEqual(copied_count, 4)
+        self.assertTrue(journal_partitioning.is_partitioned())
+        self.assertEqual(
+            [partition for partition, _ in journal_partitioning.list_partitions()],
+            [
+                "aidants_connect_web_journal_p202007",
+                "aidants_connect_web_journal_p202008",
+                "aidants_connect_web_journal_p202009",
+                "aidants_connect_web_journal_p202010",
+                "aidants_connect_web_journal_p202011",
+            ],
+        )
+        self.assertEqual(list(Journal.objects.order_by("id")), self.entries)
+        self.assertEqual(
+            [self.get_partition(entry) for entry in self.entries],
+            [
+                "aidants_connect_web_journal_p202007",
+                "aidants_connect_web_journal_p202008",
+                "aidants_connect_web_journal_p202008",
+                "aidants_connect_web_journal_p202010",
+            ],
+        )
+
+        new_entry = Journal.log_connection(self.aidant)
+        self.assertGreater(new_entry.id, self.entries[-1].id)
+        self.assertEqual(
+            self.get_partition(new_entry), "aidants_connect_web_journal_default"
+        )
+        with db_connection.cursor() as cursor:
+            indexes = db_connection.introspection.get_constraints(
+                cursor, "aidants_connect_web_journal"
+            )
+        self.assertIn("journal_aidant_date_idx", indexes)
+        self.assertIn("aidants_connect_web_journal_pkey", indexes)
+
+    def test_interrupted_conversion_is_resumed(self):
+        new_table = "aidants_connect_web_journal_partitioned"
+        with db_connection.cursor() as cursor:
+            journal_partitioning._create_partitioned_copy(cursor, new_table, self.until)
+            journal_partitioning._copy_chunk(cursor, new_table, 0, 2)
+
+        copied_count = journal_partitioning.partition_table_online(
+            until=self.until, chunk_size=1
+        )
+
+        self.assertEqual(copied_count, 2)
+        self.assertEqual(list(Journal.objects.order_by("id")), self.entries)
+
+    def test_settled_id_is_the_last_id_taken(self):
+        self.assertEqual(
+            journal_partitioning._wait_for_settled_id(), self.entries[-1].id
+        )
+
+    def test_only_the_rows_of_the_last_round_are_copied_under_the_lock(self):
+        # As if the last two entries were written by transactions still running
+        # at the start of the round
+        with mock.patch.object(
+            journal_partitioning,
+            "_wait_for_settled_id",
+            return_value=self.entries[1].id,
+        ), CaptureQueriesContext(db_connection) as queries:
+            copied_count = journal_partitioning.partition_table_online(until=self.until)
+
+        self.assertEqual(copied_count, 4)
+        self.assertEqual(list(Journal.objects.order_by("id")), self.entries)
+        statements = [query["sql"] for query in queries]
+        lock_index = next(
+            index
+            for index, statement in enumerate(statements)
+            if statement.startswith("LOCK TABLE")
+        )
+        self.assertIn(f"WHERE id > {self.entries[1].id} ", statements[lock_index + 1])
+        self.assertIn(f"WHERE id > {self.entries[1].id} ", statements[lock_index + 2])
+
+    def test_copy_is_checked_against_the_table(self):
+        new_table = "aidants_connect_web_journal_partitioned"
+        with db_connection.cursor() as cursor:
+            journal_partitioning._create_partitioned_copy(cursor, new_table, self.until)
+            journal_partitioning._copy_chunk(cursor, new_table, 0)
+            cursor.execute(
+                f"DELETE FROM {new_table} WHERE id = %s", [self.entries[1].id]
+            )
+
+            with self.assertRaisesRegex(PartitioningError, "has 4 rows after id 0"):
+                journal_partitioning._check_copy(cursor, new_table, 0)
+            journal_partitioning._check_copy(cursor, new_table, self.entries[1].id)
+
+    def test_month_queries_only_scan_their_partition(self):
+        journal_partitioning.partition_table_online(until=self.until)
+
+        august_entries = Journal.objects.created_in_month(
+            datetime(2020, 8, 20, tzinfo=timezone.utc)
+        )
+
+        self.assertEqual(list(august_entries.order_by("id")), self.entries[1:3])
+        plan = august_entries.explain()
+        self.assertIn("aidants_connect_web_journal_p202008", plan)
+        self.assertNotIn("aidants_connect_web_journal_p202007", plan)
+        self.assertNotIn("aidants_connect_web_journal_default", plan)
+
+    def test_partition_journal_and_create_journal_partitions(self):
+        call_command("partition_journal", months_ahead=0, stdout=StringIO())
+        self.assertTrue(journal_partitioning.is_partitioned())
+        self.assertEqual(
+            journal_partitioning.list_partitions()[-1][1],
+            journal_partitioning.get_bounds(timezone.now())[0],
+        )
+
+        with self.assertLogs(level="INFO") as logs:
+            self.assertEqual(create_journal_partitions(months_ahead=2), 2)
+        self.assertIn("Successfully created 2 partitions.", logs.output[-1])
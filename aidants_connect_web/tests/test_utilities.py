@@ -1,6 +1,22 @@
-from django.test import tag, TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings, tag, TestCase
 
-from aidants_connect_web.utilities import generate_sha256_hash
+import mock
+
+from aidants_connect_web.mandat_templates import (
+    get_mandat_template_hash,
+    get_mandat_template_hashes,
+)
+from aidants_connect_web.utilities import (
+    decode_keyset_cursor,
+    encode_keyset_cursor,
+    generate_file_sha256_hash,
+    generate_sha256_hash,
+    generate_token_digest,
+    get_qrcode,
+    QRCODE_GENERATORS,
+)
 
 
 @tag("utilities")
@@ -18,3 +34,68 @@ class UtilitiesTests(TestCase):
         )
         self.assertEqual(generate_sha256_hash("123salt".encode()), hash_123salt)
         self.assertEqual(len(generate_sha256_hash("123salt".encode())), 64)
+
+    @override_settings(FC_AS_FI_TOKEN_DIGEST_KEY="key")
+    def test_generate_token_digest(self):
+        digest = generate_token_digest("123")
+        self.assertEqual(len(digest), 64)
+        self.assertEqual(digest, generate_token_digest("123"))
+        self.assertNotEqual(digest, generate_sha256_hash("123".encode()))
+        with self.settings(FC_AS_FI_TOKEN_DIGEST_KEY="another_key"):
+            self.assertNotEqual(digest, generate_token_digest("123"))
+
+    def test_decode_keyset_cursor(self):
+        types = (str, str, int)
+        cursor = encode_keyset_cursor(["Simpson", "Homer", 12])
+        self.assertEqual(decode_keyset_cursor(cursor, types), ("Simpson", "Homer", 12))
+        self.assertIsNone(decode_keyset_cursor("", types))
+        self.assertIsNone(decode_keyset_cursor("not-base64!", types))
+        for key in ([None, None, None], ["a", "b", "x"], ["a", "b", False], ["a"]):
+            self.assertIsNone(decode_keyset_cursor(encode_keyset_cursor(key), types))
+
+
+@tag("utilities")
+class MandatTemplatesTests(TestCase):
+    def test_every_mandat_template_is_hashed(self):
+        mandat_template_hashes = get_mandat_template_hashes()
+        self.assertIn(settings.MANDAT_TEMPLATE_PATH, mandat_template_hashes)
+        for template_path, template_hash in mandat_template_hashes.items():
+            self.assertEqual(template_hash, generate_file_sha256_hash(template_path))
+
+    @mock.patch("aidants_connect_web.mandat_templates.generate_file_sha256_hash")
+    def test_mandat_template_hash_is_not_computed_again(self, generate_hash_mock):
+        self.assertEqual(
+            get_mandat_template_hash(),
+            get_mandat_template_hashes()[settings.MANDAT_TEMPLATE_PATH],
+        )
+        self.assertEqual(
+            get_mandat_template_hash(
+                "templates/aidants_connect_web/mandat_templates/mandat_template.html"
+            ),
+            get_mandat_template_hashes()[
+                "templates/aidants_connect_web/mandat_templates/mandat_template.html"
+            ],
+        )
+        generate_hash_mock.assert_not_called()
+
+
+@tag("utilities")
+class QRCodeTests(TestCase):
+    def setUp(self):
+        get_qrcode.cache_clear()
+        cache.clear()
+
+    def test_get_qrcode(self):
+        self.assertTrue(get_qrcode("test").startswith(b"\x89PNG"))
+        self.assertTrue(get_qrcode("test", "svg").startswith(b"<?xml"))
+
+    def test_qrcode_is_generated_once(self):
+        generate_qrcode_png_mock = mock.Mock(return_value=b"png")
+        with mock.patch.dict(QRCODE_GENERATORS, {"png": generate_qrcode_png_mock}):
+            self.assertEqual(get_qrcode("test"), b"png")
+            self.assertEqual(get_qrcode("test"), b"png")
+            # Another process finds it in the shared cache
+            get_qrcode.cache_clear()
+            self.assertEqual(get_qrcode("test"), b"png")
+
+        generate_qrcode_png_mock.assert_called_once_with("test")
@@ -3,13 +3,18 @@ from freezegun import freeze_time
 from pytz import timezone as pytz_timezone
 import mock
 import jwt
+from requests import Timeout
 
 from django.conf import settings
+from django.contrib import messages as django_messages
 from django.test import override_settings, tag, TestCase
 from django.test.client import Client
 
-from aidants_connect_web.models import Connection, Journal, Usager
+from aidants_connect_web.connection_store import get_connection_store
+from aidants_connect_web.franceconnect import FranceConnectClient
+from aidants_connect_web.models import Journal, Usager
 from aidants_connect_web.tests.factories import AidantFactory, UsagerFactory
+from aidants_connect_web.tests.fake_redis import RedisConnectionStoreMixin
 from aidants_connect_web.utilities import generate_sha256_hash
 from aidants_connect_web.views.FC_as_FS import get_user_info
 
@@ -20,7 +25,7 @@ fc_callback_url = settings.FC_AS_FI_CALLBACK_URL
 @tag("new_mandat", "FC_as_FS")
 class FCAuthorize(TestCase):
     def setUp(self):
-        Connection.objects.create(
+        get_connection_store().create(
             id=1, demarches=["argent", "papiers"], duree_keyword="SHORT"
         )
 
@@ -29,7 +34,7 @@ class FCAuthorize(TestCase):
         session["connection"] = 1
         session.save()
         self.client.get("/fc_authorize/")
-        connection = Connection.objects.get(pk=1)
+        connection = get_connection_store().get(1)
         self.assertNotEqual(connection.state, "")
 
 
@@ -47,7 +52,7 @@ class FCCallback(TestCase):
         self.client = Client()
         self.aidant = AidantFactory()
         self.epoch_date = DATE.timestamp()
-        self.connection = Connection.objects.create(
+        self.connection = get_connection_store().create(
             demarches=["argent", "papiers"],
             duree_keyword="SHORT",
             state="test_state",
@@ -57,7 +62,7 @@ class FCCallback(TestCase):
             expires_on=DATE + timedelta(minutes=5),
             aidant=self.aidant,
         )
-        Connection.objects.create(
+        get_connection_store().create(
             state="test_another_state",
             connection_type="FS",
             nonce="test_another_nonce",
@@ -96,34 +101,41 @@ class FCCallback(TestCase):
         self.assertEqual(response.status_code, 408)
 
     @freeze_time(date)
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.post")
-    def test_wrong_nonce_when_decoding_returns_403(self, mock_post):
-        mock_response = mock.Mock()
-        mock_response.status_code = 200
-        mock_response.content = "content"
+    @mock.patch.object(FranceConnectClient, "request_token")
+    def test_wrong_nonce_when_decoding_returns_403(self, mock_request_token):
         id_token = {"aud": settings.FC_AS_FS_ID, "nonce": "wrong_nonce"}
-        mock_response.json = mock.Mock(
-            return_value={
-                "access_token": "test_access_token",
-                "token_type": "Bearer",
-                "expires_in": 60,
-                "id_token": jwt.encode(
-                    id_token, settings.FC_AS_FS_SECRET, algorithm="HS256"
-                ),
-            }
-        )
+        mock_request_token.return_value = {
+            "access_token": "test_access_token",
+            "token_type": "Bearer",
+            "expires_in": 60,
+            "id_token": jwt.encode(
+                id_token, settings.FC_AS_FS_SECRET, algorithm="HS256"
+            ),
+        }
 
-        mock_post.return_value = mock_response
         response = self.client.get(
             "/callback/", data={"state": "test_another_state", "code": "test_code"}
         )
         self.assertEqual(response.status_code, 403)
 
     @freeze_time(date)
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.post")
+    @mock.patch.object(FranceConnectClient, "request_token")
+    def test_franceconnect_timeout_redirects_with_a_message(self, mock_request_token):
+        mock_request_token.side_effect = Timeout()
+        self.client.force_login(self.aidant)
+
+        response = self.client.get(
+            "/callback/", data={"state": "test_state", "code": "test_code"}
+        )
+        self.assertRedirects(response, "/espace-aidant/", fetch_redirect_response=False)
+        messages = list(django_messages.get_messages(response.wsgi_request))
+        self.assertEqual(len(messages), 1)
+
+    @freeze_time(date)
+    @mock.patch.object(FranceConnectClient, "request_token")
     @mock.patch("aidants_connect_web.views.FC_as_FS.get_user_info")
     def test_request_existing_user_redirects_to_recap(
-        self, mock_get_user_info, mock_post
+        self, mock_get_user_info, mock_request_token
     ):
         connection_number = 1
 
@@ -131,9 +143,6 @@ class FCCallback(TestCase):
         session["connection"] = connection_number
         session.save()
 
-        mock_response = mock.Mock()
-        mock_response.status_code = 200
-        mock_response.content = "content"
         id_token = {
             "aud": settings.FC_AS_FS_ID,
             "exp": self.epoch_date + 600,
@@ -143,18 +152,14 @@ class FCCallback(TestCase):
             "nonce": "test_nonce",
         }
 
-        mock_response.json = mock.Mock(
-            return_value={
-                "access_token": "test_access_token",
-                "token_type": "Bearer",
-                "expires_in": 60,
-                "id_token": jwt.encode(
-                    id_token, settings.FC_AS_FS_SECRET, algorithm="HS256"
-                ),
-            }
-        )
-
-        mock_post.return_value = mock_response
+        mock_request_token.return_value = {
+            "access_token": "test_access_token",
+            "token_type": "Bearer",
+            "expires_in": 60,
+            "id_token": jwt.encode(
+                id_token, settings.FC_AS_FS_SECRET, algorithm="HS256"
+            ),
+        }
 
         mock_get_user_info.return_value = (self.usager, None)
 
@@ -165,7 +170,7 @@ class FCCallback(TestCase):
         )
         mock_get_user_info.assert_called_once_with(self.connection)
 
-        connection = Connection.objects.get(pk=connection_number)
+        connection = get_connection_store().get(connection_number)
 
         self.assertEqual(connection.access_token, "test_access_token")
         url = (
@@ -183,19 +188,18 @@ class FCCallback(TestCase):
         self.assertEqual(last_journal_entry.action, "franceconnect_usager")
 
     @freeze_time(date)
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.post")
+    @mock.patch.object(FranceConnectClient, "request_token")
     @mock.patch("aidants_connect_web.views.FC_as_FS.get_user_info")
-    def test_request_new_user_redirects_to_recap(self, mock_get_user_info, mock_post):
+    def test_request_new_user_redirects_to_recap(
+        self, mock_get_user_info, mock_request_token
+    ):
         connection_number = 1
 
         session = self.client.session
         session["connection"] = connection_number
         session.save()
 
-        # Creating mock_post
-        mock_response = mock.Mock()
-        mock_response.status_code = 200
-        mock_response.content = "content"
+        # Creating mock_request_token
         id_token = {
             "aud": settings.FC_AS_FS_ID,
             "exp": self.epoch_date + 600,
@@ -204,18 +208,14 @@ class FCCallback(TestCase):
             "sub": "9b754782705c55ebfe10371c909f62e73a3e09fb566fc5d23040a29fae4e0ebb",
             "nonce": "test_nonce",
         }
-        mock_response.json = mock.Mock(
-            return_value={
-                "access_token": "test_access_token",
-                "token_type": "Bearer",
-                "expires_in": 60,
-                "id_token": jwt.encode(
-                    id_token, settings.FC_AS_FS_SECRET, algorithm="HS256"
-                ),
-            }
-        )
-
-        mock_post.return_value = mock_response
+        mock_request_token.return_value = {
+            "access_token": "test_access_token",
+            "token_type": "Bearer",
+            "expires_in": 60,
+            "id_token": jwt.encode(
+                id_token, settings.FC_AS_FS_SECRET, algorithm="HS256"
+            ),
+        }
 
         mock_get_user_info.return_value = (
             UsagerFactory(
@@ -239,7 +239,7 @@ class FCCallback(TestCase):
         )
         mock_get_user_info.assert_called_once_with(self.connection)
 
-        connection = Connection.objects.get(pk=connection_number)
+        connection = get_connection_store().get(connection_number)
         self.assertEqual(connection.usager.given_name, "Joséphine")
 
         url = (
@@ -267,29 +267,25 @@ class GetUserInfoTests(TestCase):
         )
         self.usager = UsagerFactory(given_name="Joséphine", sub=self.usager_sub)
         self.aidant = AidantFactory()
-        self.connection = Connection.objects.create(
+        self.connection = get_connection_store().create(
             access_token="mock_access_token", aidant=self.aidant,
         )
 
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.get")
-    def test_well_formatted_new_user_info_outputs_usager(self, mock_get):
-        mock_response = mock.Mock()
-        mock_response.status_code = 200
-        mock_response.content = "content"
-        mock_response.json = mock.Mock(
-            return_value={
-                "given_name": "Fabrice",
-                "family_name": "Mercier",
-                "sub": "456",
-                "preferred_username": "TROIS",
-                "birthdate": "1981-07-27",
-                "gender": Usager.GENDER_FEMALE,
-                "birthplace": "95277",
-                "birthcountry": Usager.BIRTHCOUNTRY_FRANCE,
-                "email": "test@test.com",
-            }
-        )
-        mock_get.return_value = mock_response
+    @mock.patch(
+        "aidants_connect_web.franceconnect.FranceConnectClient.request_user_info"
+    )
+    def test_well_formatted_new_user_info_outputs_usager(self, mock_request_user_info):
+        mock_request_user_info.return_value = {
+            "given_name": "Fabrice",
+            "family_name": "Mercier",
+            "sub": "456",
+            "preferred_username": "TROIS",
+            "birthdate": "1981-07-27",
+            "gender": Usager.GENDER_FEMALE,
+            "birthplace": "95277",
+            "birthcountry": Usager.BIRTHCOUNTRY_FRANCE,
+            "email": "test@test.com",
+        }
 
         usager, error = get_user_info(self.connection)
 
@@ -297,73 +293,65 @@ class GetUserInfoTests(TestCase):
         self.assertEqual(usager.email, "test@test.com")
         self.assertIsNone(error)
 
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.get")
-    def test_badly_formatted_new_user_info_outputs_error(self, mock_get):
-        mock_response = mock.Mock()
-        mock_response.status_code = 200
-        mock_response.content = "content"
-        mock_response.json = mock.Mock(
-            return_value={  # without 'given_name'
-                "family_name": "Mercier",
-                "sub": "456",
-                "preferred_username": "TROIS",
-                "birthdate": "1981-07-27",
-                "gender": Usager.GENDER_FEMALE,
-                "birthplace": "95277",
-                "birthcountry": Usager.BIRTHCOUNTRY_FRANCE,
-                "email": "test@test.com",
-            }
-        )
-        mock_get.return_value = mock_response
+    @mock.patch(
+        "aidants_connect_web.franceconnect.FranceConnectClient.request_user_info"
+    )
+    def test_badly_formatted_new_user_info_outputs_error(self, mock_request_user_info):
+        mock_request_user_info.return_value = {  # without 'given_name'
+            "family_name": "Mercier",
+            "sub": "456",
+            "preferred_username": "TROIS",
+            "birthdate": "1981-07-27",
+            "gender": Usager.GENDER_FEMALE,
+            "birthplace": "95277",
+            "birthcountry": Usager.BIRTHCOUNTRY_FRANCE,
+            "email": "test@test.com",
+        }
         usager, error = get_user_info(self.connection)
 
         self.assertIsNone(usager)
         self.assertIn("The FranceConnect ID is not complete:", error)
 
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.get")
-    def test_formatted_new_user_without_birthplace_outputs_usager(self, mock_get):
-        mock_response = mock.Mock()
-        mock_response.status_code = 200
-        mock_response.content = "content"
-        mock_response.json = mock.Mock(
-            return_value={  # with empty 'birthplace'
-                "given_name": "Fabrice",
-                "family_name": "Mercier",
-                "sub": "456",
-                "preferred_username": "TROIS",
-                "birthdate": "1981-07-27",
-                "gender": Usager.GENDER_MALE,
-                "birthplace": "",
-                "birthcountry": "99100",
-                "email": "test@test.com",
-            }
-        )
-        mock_get.return_value = mock_response
+    @mock.patch(
+        "aidants_connect_web.franceconnect.FranceConnectClient.request_user_info"
+    )
+    def test_formatted_new_user_without_birthplace_outputs_usager(
+        self, mock_request_user_info
+    ):
+        mock_request_user_info.return_value = {  # with empty 'birthplace'
+            "given_name": "Fabrice",
+            "family_name": "Mercier",
+            "sub": "456",
+            "preferred_username": "TROIS",
+            "birthdate": "1981-07-27",
+            "gender": Usager.GENDER_MALE,
+            "birthplace": "",
+            "birthcountry": "99100",
+            "email": "test@test.com",
+        }
 
         usager, error = get_user_info(self.connection)
 
         self.assertEqual(usager.given_name, "Fabrice")
         self.assertIsNone(error)
 
-    @mock.patch("aidants_connect_web.views.FC_as_FS.python_request.get")
-    def test_formatted_existing_user_with_email_change_outputs_usager(self, mock_get):
-        mock_response = mock.Mock()
-        mock_response.status_code = 200
-        mock_response.content = "content"
-        mock_response.json = mock.Mock(
-            return_value={
-                "given_name": self.usager.given_name,
-                "family_name": self.usager.family_name,
-                "sub": self.usager_sub_fc,
-                "preferred_username": self.usager.preferred_username,
-                "birthdate": self.usager.birthdate,
-                "gender": self.usager.gender,
-                "birthplace": self.usager.birthplace,
-                "birthcountry": self.usager.birthcountry,
-                "email": "new@email.com",
-            }
-        )
-        mock_get.return_value = mock_response
+    @mock.patch(
+        "aidants_connect_web.franceconnect.FranceConnectClient.request_user_info"
+    )
+    def test_formatted_existing_user_with_email_change_outputs_usager(
+        self, mock_request_user_info
+    ):
+        mock_request_user_info.return_value = {
+            "given_name": self.usager.given_name,
+            "family_name": self.usager.family_name,
+            "sub": self.usager_sub_fc,
+            "preferred_username": self.usager.preferred_username,
+            "birthdate": self.usager.birthdate,
+            "gender": self.usager.gender,
+            "birthplace": self.usager.birthplace,
+            "birthcountry": self.usager.birthcountry,
+            "email": "new@email.com",
+        }
 
         usager, error = get_user_info(self.connection)
 
@@ -374,3 +362,15 @@ class GetUserInfoTests(TestCase):
 
         last_journal_entry = Journal.objects.last()
         self.assertEqual(last_journal_entry.action, "update_email_usager")
+
+
+class FCAuthorizeRedisTests(RedisConnectionStoreMixin, FCAuthorize):
+    pass
+
+
+class FCCallbackRedisTests(RedisConnectionStoreMixin, FCCallback):
+    pass
+
+
+class GetUserInfoRedisTests(RedisConnectionStoreMixin, GetUserInfoTests):
+    pass
@@ -1,7 +1,9 @@
 from datetime import timedelta
 
-from django.test import tag, TestCase
+from django.db import connection
+from django.test import override_settings, tag, TestCase
 from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import resolve
 from django.utils import timezone
 
@@ -11,6 +13,7 @@ from aidants_connect_web.tests.factories import (
     MandatFactory,
     UsagerFactory,
 )
+from aidants_connect_web.utilities import encode_keyset_cursor
 from aidants_connect_web.views import espace_aidant, usagers
 
 
@@ -49,6 +52,78 @@ class UsagersIndexPageTests(TestCase):
         self.assertTemplateUsed(response, "aidants_connect_web/usagers.html")
 
 
+@tag("usagers")
+@override_settings(USAGERS_PAGE_SIZE=2)
+class UsagersIndexPaginationTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.aidant = AidantFactory()
+        self.client.force_login(self.aidant)
+        # Same names are ordered by id, so that no usager is skipped or repeated.
+        self.usagers = [
+            UsagerFactory(family_name=family_name, given_name=given_name)
+            for family_name, given_name in (
+                ("Bouvier", "Selma"),
+                ("Bouvier", "Patty"),
+                ("Simpson", "Marge"),
+                ("Simpson", "Bart"),
+                ("Simpson", "Bart"),
+            )
+        ]
+        for usager in self.usagers:
+            MandatFactory(organisation=self.aidant.organisation, usager=usager)
+        MandatFactory(usager=UsagerFactory(family_name="Flanders"))
+
+    def test_usagers_are_listed_by_pages(self):
+        response = self.client.get("/usagers/")
+        self.assertEqual(
+            response.context["usagers"], [self.usagers[1], self.usagers[0]]
+        )
+
+        listed_usagers = []
+        url = "/usagers/page/"
+        next_cursor = response.context["next_cursor"]
+        while next_cursor:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {"apres": next_cursor})
+            self.assertTemplateUsed(response, "aidants_connect_web/usagers_rows.html")
+            self.assertFalse(
+                any("COUNT(" in query["sql"] for query in queries.captured_queries)
+            )
+            listed_usagers.extend(response.context["usagers"])
+            next_cursor = response.context["next_cursor"]
+
+        self.assertEqual(
+            listed_usagers, [self.usagers[3], self.usagers[4], self.usagers[2]]
+        )
+        self.assertNotContains(response, "Afficher plus d'usagers")
+
+    def test_load_more_link(self):
+        response = self.client.get("/usagers/")
+        next_cursor = response.context["next_cursor"]
+        self.assertContains(response, f'href="/usagers/?apres={next_cursor}"')
+
+        response = self.client.get("/usagers/", {"apres": next_cursor})
+        self.assertTemplateUsed(response, "aidants_connect_web/usagers.html")
+        self.assertEqual(
+            response.context["usagers"], [self.usagers[3], self.usagers[4]]
+        )
+
+    def test_malformed_cursor_starts_from_the_first_page(self):
+        for cursor in (
+            "not-base64!",
+            encode_keyset_cursor([1, 2]),
+            encode_keyset_cursor(None),
+            encode_keyset_cursor([None, None, None]),
+            encode_keyset_cursor(["a", "b", "x"]),
+            encode_keyset_cursor(["a", "b", True]),
+        ):
+            response = self.client.get("/usagers/", {"apres": cursor})
+            self.assertEqual(
+                response.context["usagers"], [self.usagers[1], self.usagers[0]]
+            )
+
+
 @tag("usagers")
 class UsagersDetailsPageTests(TestCase):
     def setUp(self):
@@ -77,6 +152,29 @@ class UsagersDetailsPageTests(TestCase):
             "<title>Aidants Connect - Homer Simpson</title>", response_content
         )
 
+    def test_usager_details_queries_do_not_grow_with_mandats(self):
+        self.client.force_login(self.aidant)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f"/usagers/{self.usager.id}/")
+        query_count = len(queries)
+
+        # 50 mandats, one in two expired
+        for i in range(49):
+            days = -1 if i % 2 == 0 else 1
+            mandat = MandatFactory(
+                organisation=self.aidant.organisation,
+                usager=self.usager,
+                expiration_date=timezone.now() + timedelta(days=days),
+            )
+            AutorisationFactory(mandat=mandat, demarche="papiers")
+            AutorisationFactory(mandat=mandat, revocation_date=timezone.now())
+
+        with self.assertNumQueries(query_count):
+            response = self.client.get(f"/usagers/{self.usager.id}/")
+        self.assertEqual(len(response.context["active_mandats"]), 25)
+        self.assertEqual(len(response.context["inactive_mandats"]), 25)
+        self.assertContains(response, "2 démarches", count=49)
+
 
 @tag("usagers")
 class AutorisationCancelConfirmPageTests(TestCase):
@@ -208,3 +306,34 @@ class AutorisationCancelConfirmPageTests(TestCase):
         )
         url = "/espace-aidant/"
         self.assertRedirects(response, url, fetch_redirect_response=False)
+
+
+@tag("usagers")
+class UsagersSearchTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.aidant = AidantFactory()
+        self.client.force_login(self.aidant)
+        self.homer = UsagerFactory()
+        self.bart = UsagerFactory(given_name="Bart")
+        for usager in (self.homer, self.bart):
+            MandatFactory(organisation=self.aidant.organisation, usager=usager)
+        MandatFactory(usager=UsagerFactory(given_name="Homer", family_name="Thompson"))
+
+    def test_usagers_search_url_triggers_the_usagers_search_view(self):
+        found = resolve("/usagers/recherche/")
+        self.assertEqual(found.func, usagers.usagers_search)
+
+    def test_search_is_limited_to_the_usagers_of_the_organisation(self):
+        response = self.client.get("/usagers/recherche/", {"q": "homer"})
+        self.assertTemplateUsed(response, "aidants_connect_web/usagers_rows.html")
+        self.assertEqual(response.context["usagers"], [self.homer])
+        self.assertContains(response, f"/usagers/{self.homer.id}/")
+
+        response = self.client.get("/usagers/recherche/", {"q": "simpson"})
+        self.assertEqual(response.context["usagers"], [self.bart, self.homer])
+
+    def test_too_short_search_returns_nothing(self):
+        response = self.client.get("/usagers/recherche/", {"q": " h "})
+        self.assertEqual(response.context["usagers"], [])
+        self.assertContains(response, "Aucun usager ne correspond à cette recherche.")
@@ -1,5 +1,6 @@
 from datetime import date, datetime, timedelta
 import json
+from unittest import skip
 
 from django.conf import settings
 from django.contrib.auth.hashers import make_password
@@ -12,6 +13,7 @@ from django.utils import timezone
 from freezegun import freeze_time
 from pytz import timezone as pytz_timezone
 
+from aidants_connect_web.connection_store import get_connection_store
 from aidants_connect_web.models import (
     Aidant,
     Connection,
@@ -24,6 +26,8 @@ from aidants_connect_web.tests.factories import (
     MandatFactory,
     UsagerFactory,
 )
+from aidants_connect_web.tests.fake_redis import RedisConnectionStoreMixin
+from aidants_connect_web.utilities import generate_token_digest
 from aidants_connect_web.views import id_provider
 
 
@@ -73,7 +77,7 @@ class AuthorizeTests(TestCase):
         date_further_away_minus_one_hour = datetime(
             2019, 1, 9, 8, tzinfo=pytz_timezone("Europe/Paris")
         )
-        self.connection = Connection.objects.create(
+        self.connection = get_connection_store().create(
             state="test_expiration_date_triggered",
             nonce="avalidnonce456",
             usager=self.usager,
@@ -195,10 +199,22 @@ class AuthorizeTests(TestCase):
         self.assertEqual(len(response.context["usagers"]), 1)
         self.assertIsInstance(response.context["aidant"], Aidant)
 
+    def test_authorize_usagers_search(self):
+        self.client.force_login(self.aidant_thierry)
+        UsagerFactory(given_name="Joséphine", family_name="Baker", sub="456")
+
+        response = self.client.get("/authorize/usagers/", {"q": "Joséphine"})
+
+        self.assertTemplateUsed(
+            response, "aidants_connect_web/id_provider/authorize_usagers.html"
+        )
+        self.assertEqual(response.context["usagers"], [self.usager])
+        self.assertContains(response, f'value="{self.usager.id}"')
+
     def test_sending_user_information_triggers_callback(self):
         self.client.force_login(self.aidant_thierry)
 
-        connection = Connection.objects.create(
+        connection = get_connection_store().create(
             state="avalidstate123", nonce="avalidnonce456", usager=self.usager
         )
 
@@ -210,9 +226,7 @@ class AuthorizeTests(TestCase):
             },
         )
 
-        saved_items = Connection.objects.all()
-        self.assertEqual(saved_items.count(), 2)
-        connection = saved_items[1]
+        connection = get_connection_store().get(connection.id)
         self.assertEqual(connection.usager.sub, "123")
         self.assertNotEqual(connection.nonce, "No Nonce Provided")
 
@@ -251,13 +265,13 @@ class FISelectDemarcheTests(TestCase):
             organisation=self.aidant_thierry.organisation,
         )
         self.usager = UsagerFactory(given_name="Joséphine")
-        self.connection = Connection.objects.create(
+        self.connection = get_connection_store().create(
             state="avalidstate123", nonce="avalidnonce456", usager=self.usager,
         )
         date_further_away_minus_one_hour = datetime(
             2019, 1, 9, 8, tzinfo=pytz_timezone("Europe/Paris")
         )
-        self.connection_2 = Connection.objects.create(
+        self.connection_2 = get_connection_store().create(
             state="test_expiration_date_triggered",
             nonce="test_nonce",
             usager=self.usager,
@@ -394,7 +408,7 @@ class FISelectDemarcheTests(TestCase):
 class TokenTests(TestCase):
     def setUp(self):
         self.code = "test_code"
-        self.code_hash = make_password(self.code, settings.FC_AS_FI_HASH_SALT)
+        self.code_hash = generate_token_digest(self.code)
         self.usager = UsagerFactory(given_name="Joséphine")
         self.usager.sub = "avalidsub789"
         self.usager.save()
@@ -406,7 +420,7 @@ class TokenTests(TestCase):
         self.connection.expires_on = datetime(
             2012, 1, 14, 3, 21, 34, tzinfo=pytz_timezone("Europe/Paris")
         )
-        self.connection.save()
+        get_connection_store().save(self.connection)
         self.fc_request = {
             "grant_type": "authorization_code",
             "redirect_uri": "test_url.test_url",
@@ -429,10 +443,10 @@ class TokenTests(TestCase):
         response_content = response.content.decode("utf-8")
         self.assertEqual(response.status_code, 200)
         response_json = json.loads(response_content)
-        response_json["access_token"] = make_password(
-            response_json["access_token"], settings.FC_AS_FI_HASH_SALT
+        response_json["access_token"] = generate_token_digest(
+            response_json["access_token"]
         )
-        connection = Connection.objects.get(code=self.code_hash)
+        connection = get_connection_store().get_by_code(self.code)
         awaited_response = {
             "access_token": connection.access_token,
             "expires_in": 3600,
@@ -446,6 +460,20 @@ class TokenTests(TestCase):
 
         self.assertEqual(response_json, awaited_response)
 
+    @freeze_time(date)
+    # `make_password` needs a salt, which FC_AS_FI_HASH_SALT may not be in tests
+    @override_settings(FC_AS_FI_HASH_SALT="test_salt")
+    def test_code_hashed_with_make_password_needs_the_legacy_lookup(self):
+        self.connection.code = make_password(self.code, settings.FC_AS_FI_HASH_SALT)
+        get_connection_store().save(self.connection)
+
+        with self.settings(FC_AS_FI_LEGACY_TOKEN_LOOKUP=False):
+            response = self.client.post("/token/", self.fc_request)
+            self.assertEqual(response.status_code, 403)
+
+        response = self.client.post("/token/", self.fc_request)
+        self.assertEqual(response.status_code, 200)
+
     def test_wrong_grant_type_triggers_403(self):
         fc_request = dict(self.fc_request)
         fc_request["grant_type"] = "not_authorization_code"
@@ -519,10 +547,8 @@ class UserInfoTests(TestCase):
         )
 
         self.access_token = "test_access_token"
-        self.access_token_hash = make_password(
-            self.access_token, settings.FC_AS_FI_HASH_SALT
-        )
-        self.connection = Connection.objects.create(
+        self.access_token_hash = generate_token_digest(self.access_token)
+        self.connection = get_connection_store().create(
             state="avalidstate123",
             code="test_code",
             nonce="avalidnonde456",
@@ -577,6 +603,26 @@ class UserInfoTests(TestCase):
         self.assertEqual(journal_entries.count(), 1)
         self.assertEqual(journal_entries.first().action, "use_autorisation")
 
+    @freeze_time(date)
+    # `make_password` needs a salt, which FC_AS_FI_HASH_SALT may not be in tests
+    @override_settings(FC_AS_FI_HASH_SALT="test_salt")
+    def test_access_token_hashed_with_make_password_needs_the_legacy_lookup(self):
+        self.connection.access_token = make_password(
+            self.access_token, settings.FC_AS_FI_HASH_SALT
+        )
+        get_connection_store().save(self.connection)
+
+        with self.settings(FC_AS_FI_LEGACY_TOKEN_LOOKUP=False):
+            response = self.client.get(
+                "/userinfo/", **{"HTTP_AUTHORIZATION": f"Bearer {self.access_token}"}
+            )
+            self.assertEqual(response.status_code, 403)
+
+        response = self.client.get(
+            "/userinfo/", **{"HTTP_AUTHORIZATION": f"Bearer {self.access_token}"}
+        )
+        self.assertEqual(response.status_code, 200)
+
     date_expired = date + timedelta(seconds=settings.FC_CONNECTION_AGE + 1200)
 
     @freeze_time(date_expired)
@@ -632,10 +678,8 @@ class EndSessionEndpointTests(TestCase):
         )
 
         self.access_token = "test_access_token"
-        self.access_token_hash = make_password(
-            self.access_token, settings.FC_AS_FI_HASH_SALT
-        )
-        self.connection = Connection.objects.create(
+        self.access_token_hash = generate_token_digest(self.access_token)
+        self.connection = get_connection_store().create(
             state="avalidstate123",
             code="test_code",
             nonce="avalidnonde456",
@@ -686,3 +730,30 @@ class EndSessionEndpointTests(TestCase):
         )
 
         self.assertEqual(response.status_code, 400)
+
+
+LEGACY_HASHES_ARE_ONLY_IN_DATABASE = "Legacy hashes only exist in the database"
+
+
+class AuthorizeRedisTests(RedisConnectionStoreMixin, AuthorizeTests):
+    pass
+
+
+class FISelectDemarcheRedisTests(RedisConnectionStoreMixin, FISelectDemarcheTests):
+    pass
+
+
+class TokenRedisTests(RedisConnectionStoreMixin, TokenTests):
+    @skip(LEGACY_HASHES_ARE_ONLY_IN_DATABASE)
+    def test_code_hashed_with_make_password_needs_the_legacy_lookup(self):
+        pass
+
+
+class UserInfoRedisTests(RedisConnectionStoreMixin, UserInfoTests):
+    @skip(LEGACY_HASHES_ARE_ONLY_IN_DATABASE)
+    def test_access_token_hashed_with_make_password_needs_the_legacy_lookup(self):
+        pass
+
+
+class EndSessionEndpointRedisTests(RedisConnectionStoreMixin, EndSessionEndpointTests):
+    pass
@@ -1,8 +1,11 @@
 from datetime import datetime, timedelta
-from unittest import skip
+import os
+import time
+from unittest import skip, skipUnless
 
 from django.conf import settings
 from django.contrib import messages as django_messages
+from django.core.cache import cache
 
 from django.db.models import Q
 from django.test import override_settings, tag, TestCase
@@ -20,6 +23,7 @@ from aidants_connect_web.tests.factories import (
     OrganisationFactory,
     UsagerFactory,
 )
+from aidants_connect_web.utilities import get_qrcode
 from aidants_connect_web.views import new_mandat
 
 
@@ -637,6 +641,52 @@ class GenerateAttestationTests(TestCase):
         found = resolve("/creation_mandat/qrcode/")
         self.assertEqual(found.func, new_mandat.attestation_qrcode)
 
+    def log_attestation_creation(self):
+        connection = Connection.objects.get(pk=1)
+        connection.access_token = "test_access_token"
+        connection.save()
+        Journal.log_attestation_creation(
+            aidant=self.aidant_thierry,
+            usager=self.test_usager,
+            demarches=connection.demarches,
+            duree=1,
+            is_remote_mandat=False,
+            access_token=connection.access_token,
+            attestation_hash="test_attestation_hash",
+        )
+
+        self.client.force_login(self.aidant_thierry)
+        session = self.client.session
+        session["connection"] = 1
+        session.save()
+
+    def test_autorisation_qrcode_is_cached_by_the_browser(self):
+        self.log_attestation_creation()
+
+        response = self.client.get("/creation_mandat/qrcode/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response["ETag"], '"png-test_attestation_hash"')
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+
+        response = self.client.get(
+            "/creation_mandat/qrcode/", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_autorisation_qrcode_as_svg(self):
+        self.log_attestation_creation()
+
+        response = self.client.get("/creation_mandat/qrcode/", {"format": "svg"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertIn(b"<svg", response.content)
+
+        response = self.client.get("/creation_mandat/qrcode/", {"format": "gif"})
+        self.assertEqual(response.status_code, 400)
+
     def test_response_is_the_print_page(self):
         self.client.force_login(self.aidant_thierry)
 
@@ -670,3 +720,67 @@ class GenerateAttestationTests(TestCase):
         self.assertIn("COMMUNE", response_content)
         # if this fails, check if info is not on second page
         self.assertIn("18 juillet 2020", response_content)
+
+
+@tag("benchmark")
+@override_settings(ACTIVITY_CHECK_DURATION=timedelta(hours=1))
+@skipUnless(os.getenv("BENCHMARK"), "Set BENCHMARK=1 to run the benchmarks")
+class AttestationQRCodeBenchmark(TestCase):
+    """
+    Requests per second of the attestation QR code, printed when run with
+    `BENCHMARK=1 python manage.py test --tag benchmark`.
+    """
+
+    request_count = 100
+
+    def setUp(self):
+        aidant = AidantFactory()
+        usager = UsagerFactory()
+        Connection.objects.create(
+            id=1,
+            state="test_state",
+            connection_type="FS",
+            nonce="test_nonce",
+            demarches=["papiers"],
+            duree_keyword="SHORT",
+            usager=usager,
+            access_token="test_access_token",
+        )
+        Journal.log_attestation_creation(
+            aidant=aidant,
+            usager=usager,
+            demarches=["papiers"],
+            duree=1,
+            is_remote_mandat=False,
+            access_token="test_access_token",
+            attestation_hash="test_attestation_hash",
+        )
+        self.client.force_login(aidant)
+        session = self.client.session
+        session["connection"] = 1
+        session.save()
+
+    def get_throughput(self, clear_caches=(), **headers) -> float:
+        start = time.perf_counter()
+        for _ in range(self.request_count):
+            for clear_cache in clear_caches:
+                clear_cache()
+            response = self.client.get("/creation_mandat/qrcode/", **headers)
+        self.assertIn(response.status_code, (200, 304))
+        return self.request_count / (time.perf_counter() - start)
+
+    def test_attestation_qrcode_throughput(self):
+        throughputs = {
+            "generated": self.get_throughput((get_qrcode.cache_clear, cache.clear)),
+            "shared cache": self.get_throughput((get_qrcode.cache_clear,)),
+            "process cache": self.get_throughput(),
+            "not modified": self.get_throughput(
+                HTTP_IF_NONE_MATCH='"png-test_attestation_hash"'
+            ),
+        }
+        print()
+        for name, throughput in throughputs.items():
+            print(f"Attestation QR code, {name}: {throughput:.0f} requests/s")
+
+        self.assertGreater(throughputs["shared cache"], throughputs["generated"])
+        self.assertGreater(throughputs["process cache"], throughputs["generated"])
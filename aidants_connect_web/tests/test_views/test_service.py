@@ -9,7 +9,11 @@ from django.utils import timezone
 
 from freezegun import freeze_time
 
-from aidants_connect_web.models import Journal, Organisation
+from aidants_connect_web.models import Journal, Organisation, StatistiquesSnapshot
+from aidants_connect_web.statistiques import (
+    compute_statistiques,
+    take_statistiques_snapshot,
+)
 from aidants_connect_web.tests.factories import (
     AidantFactory,
     AutorisationFactory,
@@ -278,6 +282,50 @@ class StatistiquesTests(TestCase):
         self.assertEqual(response.context["demarches_count"][0]["value"], 3)
         self.assertEqual(response.context["demarches_count"][1]["value"], 0)
 
+    def test_statistiques_take_a_constant_number_of_queries(self):
+        with self.assertNumQueries(5):
+            compute_statistiques()
+
+        aidant = AidantFactory(username="new@aidant.fr")
+        for _ in range(10):
+            usager = UsagerFactory(sub=f"sub for {_}")
+            mandat = MandatFactory(organisation=aidant.organisation, usager=usager)
+            autorisation = AutorisationFactory(mandat=mandat, demarche="papiers")
+            Journal.log_autorisation_use(
+                aidant, usager, "papiers", "fake_access_token", autorisation
+            )
+
+        with self.assertNumQueries(5):
+            statistiques = compute_statistiques()
+        self.assertEqual(statistiques["usagers_helped_count"], 12)
+        self.assertEqual(
+            statistiques["demarches_count"][0],
+            {
+                "title": "papiers",
+                "icon": settings.DEMARCHES["papiers"]["icon"],
+                "value": 10,
+            },
+        )
+
+    def test_stats_are_served_from_the_latest_snapshot(self):
+        snapshot_date = datetime(2020, 9, 1, 12, tzinfo=timezone.utc)
+        with freeze_time(snapshot_date):
+            take_statistiques_snapshot()
+        AidantFactory(username="new@aidant.fr")
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/stats/")
+        self.assertEqual(response.context["aidants_count"], 1)
+        self.assertEqual(response.context["statistiques_date"], snapshot_date)
+        self.assertContains(response, "Données mises à jour le 01/09/2020")
+
+    def test_a_snapshot_is_taken_if_there_is_none(self):
+        self.assertEqual(StatistiquesSnapshot.objects.count(), 0)
+        self.client.get("/stats/")
+        self.assertEqual(StatistiquesSnapshot.objects.count(), 1)
+        self.client.get("/stats/")
+        self.assertEqual(StatistiquesSnapshot.objects.count(), 1)
+
 
 @tag("service")
 class MentionsLegalesTests(TestCase):
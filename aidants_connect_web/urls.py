@@ -26,6 +26,8 @@ urlpatterns = [
     ),
     # usagers
     path("usagers/", usagers.usagers_index, name="usagers"),
+    path("usagers/page/", usagers.usagers_page, name="usagers_page"),
+    path("usagers/recherche/", usagers.usagers_search, name="usagers_search"),
     path("usagers/<int:usager_id>/", usagers.usager_details, name="usager_details"),
     path(
         "usagers/<int:usager_id>/mandats/<int:mandat_id>/autorisations/<int:autorisation_id>/cancel_confirm",  # noqa
@@ -62,6 +64,11 @@ urlpatterns = [
     ),
     # id_provider
     path("authorize/", id_provider.authorize, name="authorize"),
+    path(
+        "authorize/usagers/",
+        id_provider.authorize_usagers_search,
+        name="authorize_usagers_search",
+    ),
     path("token/", id_provider.token, name="token"),
     path("userinfo/", id_provider.user_info, name="user_info"),
     path("select_demarche/", id_provider.fi_select_demarche, name="fi_select_demarche"),
@@ -1,9 +1,15 @@
+from functools import lru_cache
 import io
 import hashlib
+import hmac
+import json
 import qrcode
+import qrcode.image.svg
 from pathlib import Path
 
 from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
 
 def generate_sha256_hash(value: bytes):
@@ -32,6 +38,20 @@ def generate_file_sha256_hash(filename):
         return file_readable_hash
 
 
+def generate_token_digest(token: str) -> str:
+    """
+    Generate the digest under which an OIDC secret (`code`, `access_token`)
+    is stored on a `Connection`.
+    The secrets are random 64 bytes strings, so a keyed HMAC-SHA256 is enough:
+    unlike `make_password`, it does not need thousands of iterations.
+    :param token: the secret, as sent to or received from FranceConnect
+    :return: a hash (string) of 64 characters
+    """
+    return hmac.new(
+        settings.FC_AS_FI_TOKEN_DIGEST_KEY.encode(), token.encode(), hashlib.sha256
+    ).hexdigest()
+
+
 def validate_attestation_hash(attestation_string, attestation_hash):
     attestation_string_with_salt = attestation_string + settings.ATTESTATION_SALT
     new_attestation_hash = generate_sha256_hash(
@@ -40,8 +60,71 @@ def validate_attestation_hash(attestation_string, attestation_hash):
     return new_attestation_hash == attestation_hash
 
 
+def encode_keyset_cursor(key: tuple) -> str:
+    """
+    :param key: the values of the ordering fields of the last item of a page
+    :return: an URL-safe string from which the next page starts
+    """
+    return urlsafe_base64_encode(json.dumps(key).encode())
+
+
+def decode_keyset_cursor(cursor: str, types: tuple):
+    """
+    :param types: the types of the values of the key, in order
+    :return: the key encoded by `encode_keyset_cursor`, or `None` if the cursor
+    is empty or malformed, or its values are not of `types`
+    """
+    if not cursor:
+        return None
+    try:
+        key = json.loads(urlsafe_base64_decode(cursor))
+    except ValueError:
+        return None
+    if not isinstance(key, list) or len(key) != len(types):
+        return None
+    # `bool` is a subclass of `int`, but no key value.
+    if any(
+        type(value) is bool or not isinstance(value, value_type)
+        for value, value_type in zip(key, types)
+    ):
+        return None
+    return tuple(key)
+
+
 def generate_qrcode_png(string: str):
     stream = io.BytesIO()
     img = qrcode.make(string)
     img.save(stream, "PNG")
     return stream.getvalue()
+
+
+def generate_qrcode_svg(string: str):
+    """
+    Unlike `generate_qrcode_png`, does not need Pillow.
+    """
+    stream = io.BytesIO()
+    img = qrcode.make(string, image_factory=qrcode.image.svg.SvgPathImage)
+    img.save(stream)
+    return stream.getvalue()
+
+
+QRCODE_GENERATORS = {
+    "png": generate_qrcode_png,
+    "svg": generate_qrcode_svg,
+}
+
+
+@lru_cache(maxsize=256)
+def get_qrcode(string: str, image_format: str = "png"):
+    """
+    Generate the QR code of `string` once, then serve it from this process'
+    memory or from the shared Django cache.
+    :param image_format: one of `QRCODE_GENERATORS`
+    :return: the image, as bytes
+    """
+    cache_key = f"qrcode:{image_format}:{generate_sha256_hash(string.encode())}"
+    image = cache.get(cache_key)
+    if image is None:
+        image = QRCODE_GENERATORS[image_format](string)
+        cache.set(cache_key, image, settings.QRCODE_CACHE_TIMEOUT)
+    return image
@@ -2,7 +2,7 @@ import logging
 from secrets import token_urlsafe
 import jwt
 from jwt.api_jwt import ExpiredSignatureError
-import requests as python_request
+from requests import RequestException
 
 from django.conf import settings
 from django.contrib import messages as django_messages
@@ -10,6 +10,8 @@ from django.db import IntegrityError
 from django.http import HttpResponseForbidden
 from django.shortcuts import redirect, render
 
+from aidants_connect_web.connection_store import get_connection_store
+from aidants_connect_web.franceconnect import get_franceconnect_client
 from aidants_connect_web.models import Connection, Usager, Journal
 from aidants_connect_web.utilities import generate_sha256_hash
 
@@ -17,14 +19,19 @@ from aidants_connect_web.utilities import generate_sha256_hash
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger()
 
+FRANCECONNECT_UNAVAILABLE_MESSAGE = (
+    "FranceConnect ne répond pas pour le moment, veuillez réessayer plus tard."
+)
+
 
 def fc_authorize(request):
-    connection = Connection.objects.get(pk=request.session["connection"])
+    connection_store = get_connection_store()
+    connection = connection_store.get(request.session["connection"])
 
     connection.state = token_urlsafe(16)
     connection.nonce = token_urlsafe(16)
     connection.connection_type = "FS"
-    connection.save()
+    connection_store.save(connection)
 
     fc_base = settings.FC_AS_FS_BASE_URL
     fc_id = settings.FC_AS_FS_ID
@@ -56,14 +63,11 @@ def fc_authorize(request):
 
 def fc_callback(request):
     fc_base = settings.FC_AS_FS_BASE_URL
-    fc_callback_uri = f"{settings.FC_AS_FS_CALLBACK_URL}/callback"
     fc_callback_uri_logout = f"{settings.FC_AS_FS_CALLBACK_URL}/logout-callback"
-    fc_id = settings.FC_AS_FS_ID
-    fc_secret = settings.FC_AS_FS_SECRET
     state = request.GET.get("state")
 
     try:
-        connection = Connection.objects.get(state=state)
+        connection = get_connection_store().get_by_state(state)
     except Connection.DoesNotExist:
         log.info("FC as FS - This state does not seem to exist")
         log.info(state)
@@ -78,20 +82,14 @@ def fc_callback(request):
         log.info("403: No code has been provided.")
         return HttpResponseForbidden()
 
-    token_url = f"{fc_base}/token"
-    payload = {
-        "grant_type": "authorization_code",
-        "redirect_uri": fc_callback_uri,
-        "client_id": fc_id,
-        "client_secret": fc_secret,
-        "code": code,
-    }
-    headers = {"Accept": "application/json"}
-
-    request_for_token = python_request.post(token_url, data=payload, headers=headers)
-    content = request_for_token.json()
+    try:
+        content = get_franceconnect_client().request_token(code)
+    except RequestException:
+        django_messages.error(request, FRANCECONNECT_UNAVAILABLE_MESSAGE)
+        return redirect("espace_aidant_home")
+
     connection.access_token = content.get("access_token")
-    connection.save()
+    get_connection_store().save(connection)
     fc_id_token = content.get("id_token")
 
     try:
@@ -119,7 +117,7 @@ def fc_callback(request):
         return redirect("espace_aidant_home")
 
     connection.usager = usager
-    connection.save()
+    get_connection_store().save(connection)
 
     Journal.log_franceconnection_usager(
         aidant=connection.aidant, usager=connection.usager,
@@ -134,12 +132,12 @@ def fc_callback(request):
 
 
 def get_user_info(connection: Connection) -> tuple:
-    fc_base = settings.FC_AS_FS_BASE_URL
-    fc_user_info = python_request.get(
-        f"{fc_base}/userinfo?schema=openid",
-        headers={"Authorization": f"Bearer {connection.access_token}"},
-    )
-    user_info = fc_user_info.json()
+    try:
+        user_info = get_franceconnect_client().request_user_info(
+            connection.access_token
+        )
+    except RequestException:
+        return None, FRANCECONNECT_UNAVAILABLE_MESSAGE
 
     if user_info.get("birthplace") == "":
         user_info["birthplace"] = None
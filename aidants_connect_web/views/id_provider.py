@@ -6,7 +6,6 @@ import time
 from django.conf import settings
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.hashers import make_password
 from django.core.exceptions import ObjectDoesNotExist
 from django.forms.models import model_to_dict
 from django.http import (
@@ -22,12 +21,14 @@ from django.views.decorators.csrf import csrf_exempt
 
 import jwt
 
+from aidants_connect_web.connection_store import get_connection_store
 from aidants_connect_web.decorators import activity_required
 from aidants_connect_web.models import (
-    Connection,
     Journal,
     Usager,
 )
+from aidants_connect_web.utilities import generate_token_digest
+from aidants_connect_web.views.usagers import search_usagers
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger()
@@ -106,17 +107,20 @@ def authorize(request):
                 else HttpResponseForbidden()
             )
 
-        connection = Connection.objects.create(
+        connection = get_connection_store().create(
             state=parameters["state"], nonce=parameters["nonce"],
         )
         aidant = request.user
+        # The others are found through `authorize_usagers_search`.
+        usagers = aidant.get_usagers_with_active_autorisation().ordered_after()
 
         return render(
             request,
             "aidants_connect_web/id_provider/authorize.html",
             {
                 "connection_id": connection.id,
-                "usagers": aidant.get_usagers_with_active_autorisation(),
+                "usagers": usagers[: settings.USAGERS_PAGE_SIZE],
+                "usagers_limit": settings.USAGERS_PAGE_SIZE,
                 "aidant": aidant,
             },
         )
@@ -128,7 +132,7 @@ def authorize(request):
         }
 
         try:
-            connection = Connection.objects.get(pk=parameters["connection_id"])
+            connection = get_connection_store().get(parameters["connection_id"])
             if connection.is_expired:
                 log.info("connection has expired at authorize")
                 return render(request, "408.html", status=408)
@@ -140,7 +144,11 @@ def authorize(request):
 
         aidant = request.user
         chosen_usager = Usager.objects.get(pk=parameters["chosen_usager"])
-        if chosen_usager not in aidant.get_usagers_with_active_autorisation():
+        if (
+            not aidant.get_usagers_with_active_autorisation()
+            .filter(pk=chosen_usager.pk)
+            .exists()
+        ):
             log.info(
                 "This usager does not have a valid autorisation "
                 "with the aidant's organisation"
@@ -151,7 +159,7 @@ def authorize(request):
             return HttpResponseForbidden()
 
         connection.usager = chosen_usager
-        connection.save()
+        get_connection_store().save(connection)
 
         select_demarches_url = (
             f"{reverse('fi_select_demarche')}?connection_id={connection.id}"
@@ -159,6 +167,24 @@ def authorize(request):
         return redirect(select_demarches_url)
 
 
+@login_required
+@activity_required
+def authorize_usagers_search(request):
+    """
+    The usager tiles of the `authorize` page matching the `q` search, for the
+    typeahead of `usagers_search.js`.
+    """
+    usagers = search_usagers(
+        request.user.get_usagers_with_active_autorisation(), request.GET.get("q", "")
+    )
+
+    return render(
+        request,
+        "aidants_connect_web/id_provider/authorize_usagers.html",
+        {"usagers": usagers, "search": True},
+    )
+
+
 @login_required
 @activity_required()
 def fi_select_demarche(request):
@@ -168,7 +194,7 @@ def fi_select_demarche(request):
         }
 
         try:
-            connection = Connection.objects.get(pk=parameters["connection_id"])
+            connection = get_connection_store().get(parameters["connection_id"])
             if connection.is_expired:
                 log.info("Connection has expired at select_demarche")
                 return render(request, "408.html", status=408)
@@ -205,7 +231,7 @@ def fi_select_demarche(request):
         }
 
         try:
-            connection = Connection.objects.get(pk=parameters["connection_id"])
+            connection = get_connection_store().get(parameters["connection_id"])
             if connection.is_expired:
                 log.info("connection has expired at select_demarche")
                 return render(request, "408.html", status=408)
@@ -224,12 +250,12 @@ def fi_select_demarche(request):
             return HttpResponseForbidden()
 
         code = token_urlsafe(64)
-        connection.code = make_password(code, settings.FC_AS_FI_HASH_SALT)
+        connection.code = generate_token_digest(code)
         connection.demarche = parameters["chosen_demarche"]
         connection.autorisation = autorisation
         connection.complete = True
         connection.aidant = aidant
-        connection.save()
+        get_connection_store().save(connection)
 
         return redirect(
             f"{settings.FC_AS_FI_CALLBACK_URL}?code={code}&state={connection.state}"
@@ -267,9 +293,8 @@ def token(request):
             else HttpResponseForbidden()
         )
 
-    code_hash = make_password(parameters["code"], settings.FC_AS_FI_HASH_SALT)
     try:
-        connection = Connection.objects.get(code=code_hash)
+        connection = get_connection_store().get_by_code(parameters["code"])
         if connection.is_expired:
             log.info("connection has expired at token")
             return render(request, "408.html", status=408)
@@ -295,8 +320,8 @@ def token(request):
     encoded_id_token = jwt.encode(id_token, settings.FC_AS_FI_SECRET, algorithm="HS256")
 
     access_token = token_urlsafe(64)
-    connection.access_token = make_password(access_token, settings.FC_AS_FI_HASH_SALT)
-    connection.save()
+    connection.access_token = generate_token_digest(access_token)
+    get_connection_store().save(connection)
 
     response = {
         "access_token": access_token,
@@ -322,9 +347,8 @@ def user_info(request):
         return HttpResponseForbidden()
 
     auth_token = auth_header[7:]
-    auth_token_hash = make_password(auth_token, settings.FC_AS_FI_HASH_SALT)
     try:
-        connection = Connection.objects.get(access_token=auth_token_hash)
+        connection = get_connection_store().get_by_access_token(auth_token)
         if connection.is_expired:
             log.info("connection has expired at user_info")
             return render(request, "408.html", status=408)
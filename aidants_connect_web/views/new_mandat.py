@@ -6,25 +6,31 @@ from django.contrib.auth.decorators import login_required
 from django.db import IntegrityError
 from django.shortcuts import render, redirect
 from django.utils import timezone, formats
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.conf import settings
 
+from aidants_connect_web.connection_store import get_connection_store
 from aidants_connect_web.decorators import activity_required
 from aidants_connect_web.forms import MandatForm, RecapMandatForm
-from aidants_connect_web.models import Autorisation, Connection, Journal, Mandat
+from aidants_connect_web.mandat_creation import create_mandat
+from aidants_connect_web.mandat_templates import get_mandat_template_hash
 from aidants_connect_web.views.service import humanize_demarche_names
 from aidants_connect_web.utilities import (
-    generate_file_sha256_hash,
     generate_sha256_hash,
-    generate_qrcode_png,
+    get_qrcode,
 )
 
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger()
 
+QRCODE_CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
 
-def generate_attestation_hash(aidant, usager, demarches, expiration_date):
+
+def generate_attestation_hash(
+    aidant, usager, demarches, expiration_date, mandat_template_path=None
+):
     demarches.sort()
     attestation_data = {
         "aidant_id": aidant.id,
@@ -32,7 +38,7 @@ def generate_attestation_hash(aidant, usager, demarches, expiration_date):
         "demarches_list": ",".join(demarches),
         "expiration_date": expiration_date.date().isoformat(),
         "organisation_id": aidant.organisation.id,
-        "template_hash": generate_file_sha256_hash(settings.MANDAT_TEMPLATE_PATH),
+        "template_hash": get_mandat_template_hash(mandat_template_path),
         "usager_sub": usager.sub,
     }
     sorted_attestation_data = dict(sorted(attestation_data.items()))
@@ -61,7 +67,7 @@ def new_mandat(request):
 
         if form.is_valid():
             data = form.cleaned_data
-            connection = Connection.objects.create(
+            connection = get_connection_store().create(
                 aidant=request.user,
                 demarches=data["demarche"],
                 duree_keyword=data["duree"],
@@ -80,7 +86,7 @@ def new_mandat(request):
 @login_required
 @activity_required
 def new_mandat_recap(request):
-    connection = Connection.objects.get(pk=request.session["connection"])
+    connection = get_connection_store().get(request.session["connection"])
     aidant = request.user
     usager = connection.usager
     demarches_description = [
@@ -123,50 +129,22 @@ def new_mandat_recap(request):
             mandat_duree = days_before_expiration_date.get(connection.duree_keyword)
 
             try:
-                # Add a Journal 'create_attestation' action
-                connection.demarches.sort()
-                Journal.log_attestation_creation(
+                mandat_template_path = settings.MANDAT_TEMPLATE_PATH
+                create_mandat(
                     aidant=aidant,
-                    usager=usager,
-                    demarches=connection.demarches,
+                    connection=connection,
+                    expiration_date=mandat_expiration_date,
                     duree=mandat_duree,
-                    is_remote_mandat=connection.mandat_is_remote,
-                    access_token=connection.access_token,
                     attestation_hash=generate_attestation_hash(
-                        aidant, usager, connection.demarches, mandat_expiration_date
+                        aidant,
+                        usager,
+                        connection.demarches,
+                        mandat_expiration_date,
+                        mandat_template_path,
                     ),
+                    mandat_template_path=mandat_template_path,
                 )
 
-                # Create a mandat
-                mandat = Mandat.objects.create(
-                    organisation=aidant.organisation,
-                    usager=usager,
-                    duree_keyword=connection.duree_keyword,
-                    expiration_date=mandat_expiration_date,
-                    is_remote=connection.mandat_is_remote,
-                )
-
-                # This loop creates one `autorisation` object per `démarche` in the form
-                for demarche in connection.demarches:
-                    # Revoke existing demarche autorisation(s)
-                    similar_active_autorisations = Autorisation.objects.active().filter(
-                        mandat__organisation=aidant.organisation,
-                        mandat__usager=usager,
-                        demarche=demarche,
-                    )
-                    for similar_active_autorisation in similar_active_autorisations:
-                        similar_active_autorisation.revoke(
-                            aidant=aidant, revocation_date=now
-                        )
-
-                    # Create new demarche autorisation
-                    autorisation = Autorisation.objects.create(
-                        mandat=mandat,
-                        demarche=demarche,
-                        last_renewal_token=connection.access_token,
-                    )
-                    Journal.log_autorisation_creation(autorisation, aidant)
-
             except AttributeError as error:
                 log.error("Error happened in Recap")
                 log.error(error)
@@ -198,7 +176,7 @@ def new_mandat_recap(request):
 @login_required
 @activity_required
 def new_mandat_success(request):
-    connection = Connection.objects.get(pk=request.session["connection"])
+    connection = get_connection_store().get(request.session["connection"])
     aidant = request.user
     usager = connection.usager
 
@@ -212,7 +190,7 @@ def new_mandat_success(request):
 @login_required
 @activity_required
 def attestation_projet(request):
-    connection = Connection.objects.get(pk=request.session["connection"])
+    connection = get_connection_store().get(request.session["connection"])
     aidant = request.user
     usager = connection.usager
     demarches = connection.demarches
@@ -237,7 +215,7 @@ def attestation_projet(request):
 @login_required
 @activity_required
 def attestation_final(request):
-    connection = Connection.objects.get(pk=request.session["connection"])
+    connection = get_connection_store().get(request.session["connection"])
     aidant = request.user
     usager = connection.usager
     demarches = connection.demarches
@@ -263,14 +241,26 @@ def attestation_final(request):
 @login_required
 @activity_required
 def attestation_qrcode(request):
-    connection = Connection.objects.get(pk=request.session["connection"])
+    connection = get_connection_store().get(request.session["connection"])
     aidant = request.user
+    image_format = request.GET.get("format", "png")
+    if image_format not in QRCODE_CONTENT_TYPES:
+        return HttpResponseBadRequest()
 
     journal_create_attestation = aidant.get_journal_create_attestation(
         connection.access_token
     )
-    journal_create_attestation_qrcode_png = generate_qrcode_png(
-        journal_create_attestation.attestation_hash
-    )
-
-    return HttpResponse(journal_create_attestation_qrcode_png, "image/png")
+    attestation_hash = journal_create_attestation.attestation_hash
+
+    # The image only depends on the attestation hash, so the browser can keep it
+    # as long as it checks that the attestation did not change.
+    etag = f'"{image_format}-{attestation_hash}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(
+            get_qrcode(attestation_hash, image_format),
+            QRCODE_CONTENT_TYPES[image_format],
+        )
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -1,4 +1,3 @@
-from datetime import timedelta
 import logging
 
 from django.conf import settings
@@ -7,11 +6,11 @@ from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseNotFound
 from django.shortcuts import render, redirect
-from django.utils import timezone
 from django.utils.http import url_has_allowed_host_and_scheme
 
 from aidants_connect_web.forms import OTPForm
-from aidants_connect_web.models import Aidant, Journal, Mandat, Organisation, Usager
+from aidants_connect_web.models import Journal
+from aidants_connect_web.statistiques import get_statistiques_snapshot
 
 
 logging.basicConfig(level=logging.INFO)
@@ -50,78 +49,14 @@ def guide_utilisation(request):
 
 
 def statistiques(request):
-    last_30_days = timezone.now() - timedelta(days=30)
-    stafforg = settings.STAFF_ORGANISATION_NAME
-
-    def get_usager_ids(query_set) -> list:
-        return [query_set_item.usager_id for query_set_item in query_set]
-
-    organisations_count = Organisation.objects.exclude(name=stafforg).count()
-    aidants_count = Aidant.objects.exclude(organisation__name=stafforg).count()
-
-    # mandats
-    # # mandats prep
-    mandats = Mandat.objects.exclude(organisation__name=stafforg)
-    active_mandats = mandats.active()
-
-    # # mandat results
-    mandat_count = mandats.count()
-    active_mandat_count = active_mandats.count()
-
-    # Usagers
-    usagers_with_mandat_count = Usager.objects.filter(
-        pk__in=get_usager_ids(mandats)
-    ).count()
-    usagers_with_active_mandat_count = Usager.objects.filter(
-        pk__in=get_usager_ids(active_mandats)
-    ).count()
-
-    # Autorisations
-    # # Autorisation prep
-    autorisation_use = Journal.objects.excluding_staff().filter(
-        action="use_autorisation"
-    )
-    autorisation_use_recent = autorisation_use.filter(creation_date__gte=last_30_days)
-
-    # # Autorisation results
-    autorisation_use_count = autorisation_use.count()
-    autorisation_use_recent_count = autorisation_use_recent.count()
-
-    usagers_helped_count = Usager.objects.filter(
-        pk__in=get_usager_ids(autorisation_use)
-    ).count()
-    usagers_helped_recent_count = Usager.objects.filter(
-        pk__in=get_usager_ids(autorisation_use_recent)
-    ).count()
-
-    # # Démarches
-    demarches_count = []
-    for demarche in settings.DEMARCHES.keys():
-        demarches_count.append(
-            {
-                "title": demarche,
-                "icon": settings.DEMARCHES[demarche]["icon"],
-                "value": autorisation_use.filter(demarche=demarche).count(),
-            }
-        )
-
-    demarches_count.sort(key=lambda x: x["value"], reverse=True)
+    statistiques_snapshot = get_statistiques_snapshot()
 
     return render(
         request,
         "public_website/statistiques.html",
         {
-            "organisations_count": organisations_count,
-            "aidants_count": aidants_count,
-            "mandats_count": mandat_count,
-            "active_mandats_count": active_mandat_count,
-            "usagers_with_mandat_count": usagers_with_mandat_count,
-            "usagers_with_active_mandat_count": usagers_with_active_mandat_count,
-            "autorisation_use_count": autorisation_use_count,
-            "autorisation_use_recent_count": autorisation_use_recent_count,
-            "usagers_helped_count": usagers_helped_count,
-            "usagers_helped_recent_count": usagers_helped_recent_count,
-            "demarches_count": demarches_count,
+            **statistiques_snapshot.values,
+            "statistiques_date": statistiques_snapshot.creation_date,
         },
     )
 
@@ -1,5 +1,6 @@
 import logging
 
+from django.conf import settings
 from django.contrib import messages as django_messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
@@ -7,22 +8,88 @@ from django.utils import timezone
 
 from aidants_connect_web.decorators import activity_required
 from aidants_connect_web.models import Mandat, Journal
+from aidants_connect_web.utilities import decode_keyset_cursor, encode_keyset_cursor
 
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger()
 
 
+def get_usagers_page(aidant, cursor: str) -> tuple:
+    """
+    :param cursor: the `next_cursor` of the previous page, if any
+    :return: the usagers of the page, and the cursor of the next page or `None`
+    on the last one. One more usager is fetched to know if there is a next
+    page, rather than counting them.
+    """
+    # The (family_name, given_name, id) of the last usager of the previous page
+    key = decode_keyset_cursor(cursor, (str, str, int))
+    page_size = settings.USAGERS_PAGE_SIZE
+    usagers = list(aidant.get_usagers().ordered_after(key)[: page_size + 1])
+
+    if len(usagers) <= page_size:
+        return usagers, None
+    last_usager = usagers[page_size - 1]
+    return (
+        usagers[:page_size],
+        encode_keyset_cursor(
+            (last_usager.family_name, last_usager.given_name, last_usager.id)
+        ),
+    )
+
+
 @login_required
 @activity_required
 def usagers_index(request):
     aidant = request.user
-    usagers = aidant.get_usagers()
+    usagers, next_cursor = get_usagers_page(aidant, request.GET.get("apres"))
 
     return render(
         request,
         "aidants_connect_web/usagers.html",
-        {"aidant": aidant, "usagers": usagers},
+        {"aidant": aidant, "usagers": usagers, "next_cursor": next_cursor},
+    )
+
+
+def search_usagers(usagers, terms: str) -> list:
+    """
+    :return: the first usagers, in alphabetical order, whose name contains the
+    words of `terms`, or none if `terms` is too short to narrow the list
+    """
+    if len(terms.strip()) < 2:
+        return []
+    return list(usagers.search(terms).ordered_after()[: settings.USAGERS_PAGE_SIZE])
+
+
+@login_required
+@activity_required
+def usagers_search(request):
+    """
+    The rows of the `usagers_index` table matching the `q` search, for the
+    typeahead of `usagers_search.js`.
+    """
+    usagers = search_usagers(request.user.get_usagers(), request.GET.get("q", ""))
+
+    return render(
+        request,
+        "aidants_connect_web/usagers_rows.html",
+        {"usagers": usagers, "search": True},
+    )
+
+
+@login_required
+@activity_required
+def usagers_page(request):
+    """
+    The rows of the next page of `usagers_index`, appended to its table by
+    `usagers.js`.
+    """
+    usagers, next_cursor = get_usagers_page(request.user, request.GET.get("apres"))
+
+    return render(
+        request,
+        "aidants_connect_web/usagers_rows.html",
+        {"usagers": usagers, "next_cursor": next_cursor},
     )
 
 
@@ -36,16 +103,9 @@ def usager_details(request, usager_id):
         django_messages.error(request, "Cet usager est introuvable ou inaccessible.")
         return redirect("espace_aidant_home")
 
-    active_mandats = (
-        Mandat.objects.prefetch_related("autorisations")
-        .filter(organisation=aidant.organisation, usager=usager)
-        .active()
-    )
-    inactive_mandats = (
-        Mandat.objects.prefetch_related("autorisations")
-        .filter(organisation=aidant.organisation, usager=usager)
-        .inactive()
-    )
+    active_mandats, inactive_mandats = Mandat.objects.filter(
+        organisation=aidant.organisation, usager=usager
+    ).split_by_activity()
 
     return render(
         request,